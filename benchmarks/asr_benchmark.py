@@ -0,0 +1,235 @@
+"""
+Задержка и пропускная способность движков распознавания.
+
+Прогоняет записи корпуса через voice_to_text_whisper, voice_to_text_vosk
+и весь конвейер recognize (скачанные байты -> декодирование -> VAD ->
+движки) при 1..N одновременных запросах. Для каждой цели и уровня
+параллельности считает коэффициент реального времени (время обработки /
+длительность записи), задержку p50/p95/p99, записи и секунды аудио в секунду
+и пиковый RSS процесса. Google заменяется локальной заглушкой с задержкой
+--google-latency, поэтому сеть не нужна.
+
+Корпус - .ogg/.oga/.wav из --audio или синтетические OGG/Opus. Результат
+пишется в JSON (--output), чтобы сравнивать прогоны между коммитами:
+например, --beam-size 1 против 5 или --compute-type int8 против float32.
+
+Запуск: python -m benchmarks.asr_benchmark --targets whisper,vosk,pipeline --concurrency 1,2,4
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+import numpy as np
+import soundfile as sf
+from core.config.settings import settings
+from core.backend import recognition
+from core.backend.audio_handler import (
+    decode_audio, voice_to_text_whisper, voice_to_text_vosk, whisper_batcher
+)
+from core.backend.engines import NETWORK, StubEngine, engine_registry
+from core.backend.inference import inference
+from core.backend.models import models
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[bytes]:
+    """OGG/Opus 48 кГц с речеподобным сигналом 1-4 с и тишиной по краям"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(count):
+        rate = 48000
+        seconds = rng.uniform(1, 4)
+        t = np.arange(int(seconds * rate)) / rate
+        syllables = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 5) * t)
+        voice = syllables * np.sin(2 * np.pi * rng.uniform(120, 220) * t)
+        silence = np.zeros(int(rng.uniform(0.2, 1.0) * rate))
+        signal = np.concatenate([silence, 0.3 * voice, silence])
+        signal += 0.003 * rng.standard_normal(len(signal))
+        buffer = io.BytesIO()
+        sf.write(buffer, signal.astype(np.float32), rate, format='OGG', subtype='OPUS')
+        corpus.append(buffer.getvalue())
+    return corpus
+
+
+def load_corpus(path: str, count: int) -> List[bytes]:
+    if not path:
+        return synthetic_corpus(count)
+    files = sorted(name for name in os.listdir(path) if name.endswith(('.ogg', '.oga', '.wav')))
+    if not files:
+        raise SystemExit(f"В {path} нет записей .ogg/.oga/.wav")
+    corpus = []
+    for name in files:
+        with open(os.path.join(path, name), 'rb') as file:
+            corpus.append(file.read())
+    return [corpus[i % len(corpus)] for i in range(count)]
+
+
+def peak_rss_mb() -> float:
+    """Пиковый объем памяти процесса с начала работы"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдает килобайты, macOS - байты
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+async def run_round(name: str, call: Callable[[int], Awaitable[Any]], durations: List[float],
+                    concurrency: int) -> Dict[str, Any]:
+    """Выполняет все запросы корпуса, не больше concurrency одновременно"""
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = [0.0] * len(durations)
+    errors = 0
+
+    async def request(index: int) -> None:
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await call(index)
+            except Exception as e:
+                errors += 1
+                print(f"{name}: {e}")
+            latencies[index] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(index) for index in range(len(durations))))
+    elapsed = time.perf_counter() - started
+
+    audio_seconds = sum(durations)
+    return {
+        "target": name,
+        "concurrency": concurrency,
+        "requests": len(durations),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "recordings_per_s": len(durations) / elapsed,
+        "audio_s_per_s": audio_seconds / elapsed,
+        # Среднее время обработки секунды аудио одним запросом
+        "rtf": float(np.mean([latency / duration for latency, duration in zip(latencies, durations)])),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default='whisper,vosk,pipeline')
+    parser.add_argument('--concurrency', default='1,2,4,8')
+    parser.add_argument('--audio', default='', help='Каталог с записями, по умолчанию синтетические')
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--engines', default='', help='Движки конвейера через запятую, по умолчанию из настроек')
+    parser.add_argument('--whisper-model', default=settings.models.whisper_size)
+    parser.add_argument('--compute-type', default=settings.models.whisper_compute_type)
+    parser.add_argument('--beam-size', type=int, default=settings.inference.whisper_beam_size)
+    parser.add_argument('--google-latency', type=float, default=0.3, help='Задержка заглушки Google, с')
+    parser.add_argument('--output', default='', help='Файл JSON с результатами')
+    args = parser.parse_args()
+
+    # Параметры моделей меняются до их первой загрузки
+    settings.models.whisper_size = args.whisper_model
+    settings.models.whisper_compute_type = args.compute_type
+    settings.inference.whisper_beam_size = whisper_batcher.beam_size = args.beam_size
+    engine_registry.register(StubEngine('google', text="заглушка google", latency=args.google_latency,
+                                        resource_class=NETWORK, label='Google Speech (заглушка)'))
+    engines = tuple(args.engines.split(',')) if args.engines else settings.recognition.engines
+    pipeline_models = {engine_registry.get(engine).model
+                       for engine in recognition.with_grammar(engines)} - {None}
+
+    corpus = load_corpus(args.audio, args.requests)
+    decoded = await asyncio.gather(*(decode_audio(data) for data in corpus))
+    if any(audio is None for audio in decoded):
+        raise SystemExit("Не удалось декодировать корпус")
+    durations = [audio.duration for audio in decoded]
+
+    async def pipeline(index: int) -> None:
+        # Конвейер не бросает исключений, ошибки движков приходят в результатах
+        results = await recognition.recognize(corpus[index], engines=engines)
+        errors = [f"{result.engine}: {result.error}" for result in results if result.error]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    targets = {
+        'whisper': lambda index: voice_to_text_whisper(decoded[index]),
+        'vosk': lambda index: voice_to_text_vosk(decoded[index]),
+        'pipeline': pipeline,
+    }
+    names = [name for name in args.targets.split(',') if name]
+    # Модели загружаются до замеров, время загрузки пишется отдельно
+    load_seconds = {}
+    needed = set().union(*({name} if name != 'pipeline' else pipeline_models for name in names))
+    for model in sorted(needed):
+        started = time.perf_counter()
+        await asyncio.to_thread(models.get, model)
+        load_seconds[model] = time.perf_counter() - started
+
+    print(f"CPU: {os.cpu_count()}, записей: {len(corpus)}, аудио: {sum(durations):.1f} с, "
+          f"загрузка моделей: {load_seconds}")
+    print(f"{'цель':>9} {'парал.':>6} {'rec/s':>7} {'RTF':>6} {'p50, с':>7} {'p95, с':>7} "
+          f"{'p99, с':>7} {'RSS, МБ':>8} {'ошибки':>6}")
+    results = []
+    for name in names:
+        # Прогрев: первая инференция включает инициализацию библиотек
+        await targets[name](0)
+        for concurrency in (int(value) for value in args.concurrency.split(',')):
+            result = await run_round(name, targets[name], durations, concurrency)
+            results.append(result)
+            print(f"{name:>9} {concurrency:>6} {result['recordings_per_s']:>7.2f} {result['rtf']:>6.3f} "
+                  f"{result['p50_s']:>7.2f} {result['p95_s']:>7.2f} {result['p99_s']:>7.2f} "
+                  f"{result['peak_rss_mb']:>8.0f} {result['errors']:>6}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "corpus": {"source": args.audio or "synthetic", "recordings": len(corpus),
+                   "audio_seconds": sum(durations)},
+        "config": {
+            "whisper_model": args.whisper_model,
+            "compute_type": args.compute_type,
+            "beam_size": args.beam_size,
+            "whisper_max_batch": settings.inference.whisper_max_batch,
+            "pipeline_engines": list(recognition.with_grammar(engines)),
+            "vad": settings.vad.enabled,
+            "google_latency_s": args.google_latency,
+        },
+        "model_load_s": load_seconds,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Результаты записаны в {args.output}")
+
+    await whisper_batcher.close()
+    inference.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Замер задержки цикла событий при конкурентных обновлениях.
+
+Сравнивает прямые вызовы синхронного Database внутри корутин и вызовы
+через AsyncDatabase. Пока обработчики выполняют запросы, фоновая задача
+просыпается каждые --tick мс и фиксирует, насколько позже она получила
+управление. Чем больше задержка, тем дольше остальные пользователи ждут
+ответа бота.
+
+Запуск: python -m benchmarks.event_loop_lag --updates 500 --rows 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from core.database.database import Database
+from core.database.async_database import AsyncDatabase
+
+
+def populate(db: Database, users: int, commands: int, rows: int) -> None:
+    """Заполняет базу синтетическими пользователями, командами и записями"""
+    with db.transaction() as cur:
+        cur.executemany(
+            "INSERT INTO users (telegram_id, username, display_name) VALUES (?, ?, ?)",
+            ((uid, f"user{uid}", f"User {uid}") for uid in range(1, users + 1))
+        )
+        cur.executemany(
+            "INSERT INTO commands (tag, description) VALUES (?, ?)",
+            ((f"cmd_{i}", f"команда номер {i}") for i in range(commands))
+        )
+        cur.executemany(
+            """INSERT INTO user_commands (user_id, command_id, voice_file_id, transcript, status)
+               VALUES (?, ?, ?, ?, ?)""",
+            (
+                (random.randint(1, users), random.randint(1, commands), f"file{i}", "текст",
+                 random.choice(('pending', 'approved', 'rejected')))
+                for i in range(rows)
+            )
+        )
+
+
+async def monitor_lag(tick: float, samples: list, stop: asyncio.Event) -> None:
+    """Измеряет опоздание пробуждений относительно запланированного интервала"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        samples.append(time.perf_counter() - started - tick)
+
+
+async def handle_update_sync(db: Database, user_id: int) -> None:
+    # Так вызывали базу обработчики до появления AsyncDatabase
+    db.get_user(user_id)
+    db.get_pending_commands(user_id)
+    db.get_user_commands(user_id)
+
+
+async def handle_update_async(db: AsyncDatabase, user_id: int) -> None:
+    await db.get_user(user_id)
+    await db.get_pending_commands(user_id)
+    await db.get_user_commands(user_id)
+
+
+async def run(handler, db, updates: int, users: int, tick: float) -> dict:
+    samples = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(tick, samples, stop))
+    await asyncio.sleep(tick * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(db, random.randint(1, users)) for _ in range(updates)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    samples.sort()
+    return {
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(samples) * 1000,
+        "lag_p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000 if len(samples) > 1 else samples[0] * 1000,
+        "lag_max_ms": samples[-1] * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=500, help='количество одновременных обновлений')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--commands', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=20000, help='строк в user_commands')
+    parser.add_argument('--tick', type=float, default=5.0, help='интервал монитора, мс')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        populate(db, args.users, args.commands, args.rows)
+        tick = args.tick / 1000
+
+        before = await run(handle_update_sync, db, args.updates, args.users, tick)
+        async_db = AsyncDatabase(db)
+        after = await run(handle_update_async, async_db, args.updates, args.users, tick)
+        await async_db.close()
+
+    print(f"{'':14}{'время, с':>10}{'p50, мс':>10}{'p99, мс':>10}{'max, мс':>10}")
+    for title, result in (("Database", before), ("AsyncDatabase", after)):
+        print(
+            f"{title:14}{result['elapsed_s']:>10.2f}{result['lag_p50_ms']:>10.1f}"
+            f"{result['lag_p99_ms']:>10.1f}{result['lag_max_ms']:>10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
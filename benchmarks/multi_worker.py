@@ -0,0 +1,182 @@
+"""
+Локальный стенд для нескольких рабочих распознавания.
+
+Поднимает в этом процессе очередь на временной базе SQLite, JobService с
+поддельным ботом и HTTP-сервер заданий, ставит --jobs заданий и запускает
+рабочих в отдельных процессах, как python worker.py на разных машинах.
+Вместо моделей рабочие используют движок-заглушку, который занимает
+процессор на --work-ms и возвращает описание первой команды, а вместо ffmpeg
+получают уже готовый PCM. Стенд проверяет, что все задания выполнены
+ровно один раз, и печатает пропускную способность и средний размер пакета
+групповой записи для каждого числа процессов из --workers.
+
+Запуск: python -m benchmarks.multi_worker --workers 1,2,4 --jobs 200 --work-ms 50
+"""
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from core.config.settings import settings
+from core.database.database import Database
+from core.database.async_database import AsyncDatabase
+from core.workers.http_transport import HttpJobClient, start_job_server
+from core.workers.jobs import JobService
+
+COMMANDS = ["включи свет", "выключи свет", "открой окно", "закрой дверь", "сделай громче"]
+
+
+class FakeBot:
+    """Бот без Telegram: отдает запись по file_id и считает уведомления"""
+
+    def __init__(self, voice: bytes):
+        self.voice = voice
+        self.messages = 0
+
+    async def get_file(self, file_id: str):
+        return SimpleNamespace(file_path=file_id, file_size=len(self.voice))
+
+    async def download_file(self, file_path: str, destination: io.BytesIO) -> None:
+        destination.write(self.voice)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.messages += 1
+
+
+def synthetic_pcm(seconds: float = 2.0) -> bytes:
+    """Речеподобный сигнал в формате, который выдает декодер"""
+    t = np.arange(int(seconds * 16000)) / 16000
+    signal = 0.3 * (np.sin(2 * np.pi * 3 * t) > 0) * np.sin(2 * np.pi * 180 * t)
+    return (signal * 32767).astype(np.int16).tobytes()
+
+
+def _install_stub_engine(work_ms: float) -> None:
+    """Подменяет движки и декодер рабочего заглушками"""
+    from core.backend import recognition
+    from core.backend.audio_handler import DecodedAudio
+    from core.backend.engines import StubEngine, engine_registry
+
+    async def decode(data: bytes):
+        return DecodedAudio(data)
+
+    recognition.decode_audio = decode
+    engine_registry.register(StubEngine('stub', text=COMMANDS[0], cpu_seconds=work_ms / 1000))
+    settings.recognition.engines = ('stub',)
+    settings.recognition.cascade = False
+    settings.recognition.cache = False
+    settings.recognition.vosk_grammar = 'off'
+    settings.jobs.poll_interval = 0.05
+
+
+async def _run_worker(url: str, work_ms: float) -> None:
+    from core.workers.recognition_worker import RecognitionWorker
+    _install_stub_engine(work_ms)
+    jobs = HttpJobClient(url)
+    try:
+        await RecognitionWorker(jobs).run()
+    finally:
+        await jobs.close()
+
+
+def _worker_main(url: str, work_ms: float) -> None:
+    try:
+        asyncio.run(_run_worker(url, work_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_round(processes: int, jobs_count: int, work_ms: float, timeout: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AsyncDatabase(Database(os.path.join(tmp, 'harness.db')))
+        bot = FakeBot(synthetic_pcm())
+        service = JobService(db, bot)
+        port = _free_port()
+        runner = await start_job_server(service, "127.0.0.1", port)
+
+        await db.create_user(1, "harness")
+        for index, description in enumerate(COMMANDS):
+            await db.add_command(f"cmd{index}", description)
+        commands = await db.get_active_commands()
+        # Записи приходят одновременно, как от многих пользователей сразу
+        await asyncio.gather(*(
+            db.enqueue_recognition_job(1, index, commands[index % len(commands)]['id'],
+                                       f"file{index}", f"unique{index}")
+            for index in range(jobs_count)
+        ))
+
+        started = time.perf_counter()
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(f"http://127.0.0.1:{port}", work_ms))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while await db.count_queued_recognition_jobs() and time.perf_counter() - started < timeout:
+                await asyncio.sleep(0.05)
+            # Последние задания могут еще выполняться
+            while time.perf_counter() - started < timeout:
+                jobs = [await db.get_recognition_job(job_id) for job_id in range(1, jobs_count + 1)]
+                if all(job['status'] in ('done', 'failed') for job in jobs):
+                    break
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
+            await runner.cleanup()
+
+        jobs = [await db.get_recognition_job(job_id) for job_id in range(1, jobs_count + 1)]
+        records = await db.get_user_commands(1)
+        writes = db.write_queue.stats()
+        await db.close()
+
+    done = sum(job['status'] == 'done' for job in jobs)
+    return {
+        "processes": processes,
+        "done": done,
+        "failed": sum(job['status'] == 'failed' for job in jobs),
+        "duplicates": len(records) - done,
+        "jobs_per_s": done / elapsed,
+        "messages": bot.messages,
+        # Сколько завершений и постановок в очередь фиксируется одной транзакцией
+        "avg_write_batch": writes['avg_batch'],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='Числа процессов-рабочих')
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--work-ms', type=float, default=50.0, help='Время заглушки на одну запись')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"CPU: {os.cpu_count()}, заданий: {args.jobs}, заглушка: {args.work_ms} мс")
+    print(f"{'процессы':>8} {'готово':>7} {'ошибки':>7} {'дубли':>6} {'заданий/с':>10} {'пакет записи':>13}")
+    failed = False
+    for processes in (int(value) for value in args.workers.split(',')):
+        result = await run_round(processes, args.jobs, args.work_ms, args.timeout)
+        print(f"{result['processes']:>8} {result['done']:>7} {result['failed']:>7} "
+              f"{result['duplicates']:>6} {result['jobs_per_s']:>10.1f} {result['avg_write_batch']:>13.1f}")
+        failed |= result['done'] != args.jobs or result['duplicates'] != 0
+    if failed:
+        raise SystemExit("Не все задания выполнены ровно один раз")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
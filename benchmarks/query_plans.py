@@ -0,0 +1,159 @@
+"""
+Проверка планов запросов Database на синтетической базе.
+
+Скрипт вызывает методы чтения Database, перехватывает выполненный SQL,
+заполняет базу миллионами строк и прогоняет каждый запрос через
+EXPLAIN QUERY PLAN. Если горячий запрос читает users или user_commands
+полным сканированием таблицы или индекса, скрипт печатает план и завершается с кодом 1.
+Те же проверки на небольшой базе выполняет tests/test_query_plans.py; скрипт
+нужен для прогонов на миллионах строк.
+
+Запуск: python -m benchmarks.query_plans --rows 2000000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from core.database.database import Database
+
+# Таблицы (и их псевдонимы в запросах Database), полное сканирование
+# которых, в том числе сканирование всего индекса, недопустимо в горячих запросах
+LARGE_TABLES = {'users', 'u', 'user_commands', 'uc', 'transcription_cache', 'recognition_jobs', 'j'}
+
+# Отчеты и выгрузки по определению читают все строки
+FULL_SCAN_ALLOWED = {
+    'get_all_users',
+    'get_all_commands',
+    'get_commands_data_for_export',
+}
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)')
+
+
+def hot_calls(user_id: int, command_id: int, tag: str) -> list:
+    """Методы Database и аргументы, с которыми они вызываются обработчиками"""
+    return [
+        ('get_user', (user_id,)),
+        ('is_admin', (user_id,)),
+        ('get_pending_commands', (user_id,)),
+        ('next_pending_command', (user_id,)),
+        ('get_user_commands', (user_id,)),
+        ('iter_user_commands', (user_id, 10, 1)),
+        ('get_command_by_id', (command_id,)),
+        ('get_command_by_tag', (tag,)),
+        ('get_command_description', (command_id,)),
+        ('get_pending_recordings', ()),
+        ('next_pending_recording', ()),
+        ('next_pending_recording', (1,)),
+        ('get_command_recordings', (tag,)),
+        ('get_command_recordings_count', (tag,)),
+        ('get_voice_file_id', (1,)),
+        ('get_all_users', ()),
+        ('get_all_commands', ()),
+        ('get_recordings_statistics', ()),
+        ('get_user_recording_stats', (user_id,)),
+        ('get_total_recordings_count', ()),
+        ('get_commands_data_for_export', ()),
+        ('get_cached_transcriptions', ('file1', {'whisper': 'small'})),
+        ('get_recognition_job', (1,)),
+        ('count_queued_recognition_jobs', ()),
+        ('get_undelivered_recognition_jobs', (60,)),
+    ]
+
+
+def capture_queries(db: Database, calls: list) -> list:
+    """Выполняет методы и возвращает пары (метод, SQL)"""
+    captured = []
+    current = [None]
+
+    def trace(sql: str) -> None:
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((current[0], sql))
+
+    db._writer.set_trace_callback(trace)
+    try:
+        for name, args in calls:
+            current[0] = name
+            getattr(db, name)(*args)
+    finally:
+        db._writer.set_trace_callback(None)
+    return captured
+
+
+def populate(db: Database, users: int, commands: int, rows: int) -> None:
+    """Заполняет базу синтетическими данными"""
+    with db.transaction() as cur:
+        cur.executemany(
+            "INSERT INTO users (telegram_id, username, display_name) VALUES (?, ?, ?)",
+            ((uid, f"user{uid}", f"User {uid}") for uid in range(1, users + 1))
+        )
+        cur.executemany(
+            "INSERT INTO commands (tag, description) VALUES (?, ?)",
+            ((f"cmd_{i}", f"команда номер {i}") for i in range(1, commands))
+        )
+        cur.executemany(
+            """INSERT INTO user_commands (user_id, command_id, voice_file_id, transcript, status, created_at)
+               VALUES (?, ?, ?, ?, ?, datetime('now', ?))""",
+            (
+                (random.randint(1, users), random.randint(1, commands), f"file{i}", "текст",
+                 random.choice(('pending', 'approved', 'rejected')), f"-{rows - i} seconds")
+                for i in range(rows)
+            )
+        )
+        cur.execute("ANALYZE")
+
+
+def full_scans(plan: list) -> list:
+    """Возвращает таблицы из LARGE_TABLES, читаемые целиком"""
+    scans = []
+    for row in plan:
+        match = FULL_SCAN.match(row[3])
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--commands', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=2000000, help='строк в user_commands')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Без пула читателей все запросы идут через одно соединение,
+        # на котором удобно перехватывать SQL
+        db = Database(os.path.join(tmp, 'plans.db'), readers=0)
+        db.add_command('cmd_0', 'команда номер 0')
+        command = db.get_command_by_tag('cmd_0')
+        queries = capture_queries(db, hot_calls(1, command['id'], command['tag']))
+
+        started = time.perf_counter()
+        populate(db, args.users, args.commands, args.rows)
+        print(f"Синтетическая база: {args.rows} записей за {time.perf_counter() - started:.1f} с\n")
+
+        failed = False
+        for name, sql in queries:
+            plan = db._writer.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            scans = full_scans(plan)
+            if scans and name not in FULL_SCAN_ALLOWED:
+                failed = True
+                status = "FAIL"
+            else:
+                status = "ok  " if not scans else "scan"
+            print(f"[{status}] {name}")
+            for row in plan:
+                print(f"         {row[3]}")
+        db.close()
+
+    if failed:
+        print("\nГорячие запросы используют полное сканирование таблиц")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Пропускная способность Whisper с микро-батчингом.
+
+Отправляет --requests одновременных записей в WhisperBatcher при разных
+max_batch и печатает записи в секунду и задержку p50/p95. max_batch=1
+соответствует прежнему поведению: каждая запись транскрибируется своим
+вызовом transcribe. Записи берутся из --audio (каталог с .ogg/.wav, читается
+через soundfile) или синтезируются.
+
+Запуск: python -m benchmarks.whisper_batching --model small --batches 1,2,4,8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from faster_whisper import WhisperModel
+from core.backend.whisper_batcher import SAMPLE_RATE, WhisperBatcher
+
+
+def load_corpus(path: str, count: int) -> List[np.ndarray]:
+    """Читает записи из каталога или синтезирует речеподобный сигнал 2-4 с"""
+    if path:
+        import soundfile as sf
+        from scipy.signal import resample_poly
+        corpus = []
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(('.ogg', '.wav')):
+                continue
+            data, rate = sf.read(os.path.join(path, name), dtype='float32', always_2d=True)
+            samples = data.mean(axis=1)
+            if rate != SAMPLE_RATE:
+                samples = resample_poly(samples, SAMPLE_RATE, rate).astype(np.float32)
+            corpus.append(samples)
+        return [corpus[i % len(corpus)] for i in range(count)]
+
+    rng = np.random.default_rng(0)
+    corpus = []
+    for _ in range(count):
+        seconds = rng.uniform(2, 4)
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        envelope = (np.sin(2 * np.pi * 3 * t) > 0).astype(np.float32)
+        tone = np.sin(2 * np.pi * rng.uniform(120, 220) * t)
+        corpus.append((0.3 * envelope * tone + 0.01 * rng.standard_normal(len(t))).astype(np.float32))
+    return corpus
+
+
+async def run_round(model: WhisperModel, executor: ThreadPoolExecutor, corpus: List[np.ndarray],
+                    max_batch: int, max_wait: float, concurrency: int, beam_size: int) -> dict:
+    loop = asyncio.get_running_loop()
+
+    async def run(func, *args):
+        return await loop.run_in_executor(executor, lambda: func(*args))
+
+    batcher = WhisperBatcher(lambda: model, run, max_batch=max_batch, max_wait=max_wait,
+                             concurrency=concurrency, beam_size=beam_size)
+    latencies = []
+
+    async def request(samples: np.ndarray) -> None:
+        started = time.perf_counter()
+        await batcher.transcribe(samples)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(samples) for samples in corpus))
+    elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    await batcher.close()
+
+    latencies.sort()
+    return {
+        "max_batch": max_batch,
+        "recordings_per_s": len(corpus) / elapsed,
+        "p50_s": statistics.median(latencies),
+        "p95_s": latencies[int(0.95 * (len(latencies) - 1))],
+        "avg_batch": stats["avg_batch"],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='small')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--cpu-threads', type=int, default=0, help='Потоки CTranslate2 на вызов, 0 - авто')
+    parser.add_argument('--audio', default='', help='Каталог с записями')
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--batches', default='1,2,4,8')
+    parser.add_argument('--max-wait', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=1, help='Пакетов одновременно')
+    parser.add_argument('--beam-size', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Загрузка модели {args.model} ({args.compute_type}), CPU: {os.cpu_count()}")
+    model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type,
+                         cpu_threads=args.cpu_threads, num_workers=args.concurrency)
+    corpus = load_corpus(args.audio, args.requests)
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    # Прогрев: первая инференция включает инициализацию CTranslate2
+    await run_round(model, executor, corpus[:1], 1, 0, 1, args.beam_size)
+
+    print(f"{'max_batch':>9} {'rec/s':>8} {'p50, с':>8} {'p95, с':>8} {'avg_batch':>10}")
+    for max_batch in (int(value) for value in args.batches.split(',')):
+        result = await run_round(model, executor, corpus, max_batch, args.max_wait,
+                                 args.concurrency, args.beam_size)
+        print(f"{result['max_batch']:>9} {result['recordings_per_s']:>8.2f} {result['p50_s']:>8.2f} "
+              f"{result['p95_s']:>8.2f} {result['avg_batch']:>10.1f}")
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,10 +1,21 @@
 import asyncio
+import contextlib
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from core.config.settings import settings
+from core.backend.audio_handler import whisper_batcher
+from core.backend.inference import inference
+from core.backend.models import models
+from core.backend.recognition import active_models
 from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 from core.handlers import profile, registration, info, markup, balance, basic
+from core.middlewares.database import DatabaseMiddleware
+from core.workers.http_transport import start_job_server
+from core.workers.jobs import JobService
+from core.workers.recognition_worker import RecognitionWorker
 from core.utils.notifications import notify_users_about_restart
+from core.utils.scratch import scratch
 import logging
 import sys
 
@@ -30,8 +41,11 @@ for handler in aiogram_logger.handlers:
 bot = Bot(token=settings.bots.bot_token)
 dp = Dispatcher(storage=MemoryStorage())
 
-# Инициализация базы данных
-db = Database('bot_database.db')
+# Инициализация базы данных: единственный экземпляр на процесс,
+# обработчики получают его через middleware как аргумент db
+db = AsyncDatabase(Database('bot_database.db',
+                             transcription_cache_size=settings.recognition.cache_size))
+dp.update.outer_middleware(DatabaseMiddleware(db))
 
 # Регистрация роутеров
 dp.include_router(basic.router)
@@ -43,15 +57,44 @@ dp.include_router(balance.router)
 
 # Запуск бота
 async def main():
+    workers = []
+    job_server = None
+    sweeper = None
+    redelivery = None
     try:
         print("Бот запущен")
         
         # Проверяем и обновляем роль админа при запуске
-        admin = db.get_user(settings.bots.admin_id)
+        admin = await db.get_user(settings.bots.admin_id)
         if admin and admin['role'] != 'admin':
-            db.set_admin_role(settings.bots.admin_id)
+            await db.set_admin_role(settings.bots.admin_id)
         
         await notify_users_about_restart(bot, db)
+        
+        # Временные каталоги, оставшиеся после прошлого запуска, удаляются до
+        # приема обновлений независимо от возраста, затем устаревшие - периодически
+        await asyncio.to_thread(scratch.sweep, 0)
+        sweeper = asyncio.create_task(scratch.run_sweeper(settings.scratch.sweep_interval))
+        
+        # Модели загружаются в фоне, бот отвечает на обновления сразу
+        if settings.models.preload:
+            models.warm_up(active_models())
+        
+        # Рабочие очереди распознавания внутри процесса бота, каждый выполняет
+        # несколько заданий одновременно; дополнительные запускаются отдельно:
+        # python worker.py
+        jobs = JobService(db, bot)
+        for _ in range(settings.jobs.bot_workers):
+            worker = RecognitionWorker(jobs)
+            workers.append((worker, asyncio.create_task(worker.run())))
+        # Результаты, которые не удалось отправить пользователю, отправляются повторно
+        redelivery = asyncio.create_task(jobs.run_redelivery(settings.jobs.notify_retry))
+        
+        # Сервер заданий для рабочих на других машинах
+        if settings.jobs.http_port:
+            job_server = await start_job_server(jobs, settings.jobs.http_host,
+                                                settings.jobs.http_port, settings.jobs.http_secret)
+        
         # Оптимизированный polling
         await dp.start_polling(
             bot,
@@ -61,7 +104,23 @@ async def main():
         )
     finally:
         print("Бот остановлен")
+        for worker, task in workers:
+            worker.stop()
+        await asyncio.gather(*(task for _, task in workers), return_exceptions=True)
+        if job_server is not None:
+            await job_server.cleanup()
+        if redelivery is not None:
+            redelivery.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await redelivery
+        if sweeper is not None:
+            sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await sweeper
         await bot.session.close()
+        await db.close()
+        await whisper_batcher.close()
+        inference.shutdown()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
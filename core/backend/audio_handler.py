@@ -1,140 +1,190 @@
-import os
+import io
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional
 
+import numpy as np
 import requests
 import soundfile as sf
 from aiogram import Bot
 from aiogram.types import Message
 from core.config.settings import settings
 from core.config.settings import Emoji
-import speech_recognition as sr
 import json
 import re
-from vosk import KaldiRecognizer
-import wave
-import subprocess
-from pydub import AudioSegment
-import asyncio
-
-# Указываем путь к ffmpeg для pydub
-AudioSegment.converter = r"C:\ProgramData\chocolatey\bin\ffmpeg.exe"
-
-async def save_voice_to_file(bot: Bot, message: Message, file_path: str) -> str:
-    """Скачивает голосовое сообщение и сохраняет в указанный путь"""
-    voice = message.voice
-    voice_file_info = await bot.get_file(voice.file_id)
-    await bot.download_file(voice_file_info.file_path, file_path)
-    return file_path
-
-
-async def voice_to_text_whisper(file_path: str) -> str:
-    """Принимает путь к аудио файлу, возвращает транскрибированный текст файла."""
-    if not settings.bots.whisper:
-        raise ValueError("Whisper model is not initialized")
-        
-    segments, _ = settings.bots.whisper.transcribe(file_path, language="ru", beam_size=5)
-    segments = list(segments)  # The transcription will actually run here.
-    result = []
-    for segment in segments:
-        result.append(segment.text)
-
-    return ' '.join(result)
-
-
-async def voice_to_text_google(file_path: str) -> str:
-    """Распознавание речи через Google Speech Recognition"""
-    try:
-        wav_path = file_path.replace('.ogg', '.wav')
-        
-        # Проверяем успешность конвертации
-        if not convert_to_wav(file_path, wav_path):
-            print("Failed to convert audio for Google recognition")
-            return ""
-        
-        # Распознаем текст
-        recognizer = settings.bots.google_model
-        with sr.AudioFile(wav_path) as source:
-            audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio, language='ru-RU')
-        
-        return text
-    except Exception as e:
-        print(f"Google recognition error: {e}")
-        return ""
+from core.backend.inference import inference
+from core.backend.decoder import decoder, SAMPLE_RATE
+from core.backend.models import models
+from core.backend.grammar import command_grammar, UNKNOWN
+from core.backend.whisper_batcher import WhisperBatcher
 
+if TYPE_CHECKING:
+    import speech_recognition as sr
 
-async def voice_to_text_vosk(file_path: str) -> str:
-    """Распознавание речи через Vosk"""
-    try:
-        wav_path = file_path.replace('.ogg', '.wav')
-        
-        # Проверяем успешность конвертации
-        if not convert_to_wav(file_path, wav_path):
-            print("Failed to convert audio for Vosk recognition")
-            return ""
-        
-        # Открываем аудиофайл
-        wf = wave.open(wav_path, "rb")
-        
-        # Создаем распознаватель
-        model = settings.bots.vosk_model
-        rec = KaldiRecognizer(model, wf.getframerate())
-        rec.SetWords(True)
-        
-        # Читаем и распознаем аудио
-        result = ""
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            if rec.AcceptWaveform(data):
-                result += json.loads(rec.Result())["text"] + " "
-        
-        # Получаем последний фрагмент
-        final_result = json.loads(rec.FinalResult())
-        result += final_result["text"]
-        
-        return result.strip()
-    except Exception as e:
-        print(f"Vosk recognition error: {e}")
-        return ""
+# Формат PCM, который выдает декодер
+SAMPLE_WIDTH = 2  # int16
+
+
+class DecodedAudio:
+    """
+    Голосовое сообщение, декодированное в PCM 16 кГц моно int16.
+    Сырые байты от декодера используются без копирования: Vosk и Google
+    получают их как есть, массив int16 - представление над теми же байтами,
+    а float32 для Whisper вычисляется один раз при первом обращении.
+    """
+
+    def __init__(self, raw: bytes, sample_rate: int = SAMPLE_RATE):
+        self.raw = raw
+        self.sample_rate = sample_rate
+
+    @cached_property
+    def pcm(self) -> np.ndarray:
+        return np.frombuffer(self.raw, dtype=np.int16)
+
+    @cached_property
+    def samples(self) -> np.ndarray:
+        """Отсчеты float32 в диапазоне [-1, 1], формат входа Whisper"""
+        return self.pcm.astype(np.float32) / 32768.0
+
+    @property
+    def audio_data(self) -> "sr.AudioData":
+        import speech_recognition as sr
+        return sr.AudioData(self.raw, self.sample_rate, SAMPLE_WIDTH)
+
+    @property
+    def duration(self) -> float:
+        return len(self.raw) / (self.sample_rate * SAMPLE_WIDTH)
+
+    def slice(self, start: int, end: int) -> "DecodedAudio":
+        """Фрагмент записи с отсчета start по end"""
+        return DecodedAudio(self.raw[start * SAMPLE_WIDTH:end * SAMPLE_WIDTH], self.sample_rate)
+
+
+class VoiceTooLargeError(ValueError):
+    """Запись больше settings.recognition.voice_max_bytes"""
+
+
+class _LimitedBuffer(io.BytesIO):
+    """Буфер в памяти, который прерывает потоковую загрузку при превышении лимита"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, data) -> int:
+        if self.tell() + len(data) > self.limit:
+            raise VoiceTooLargeError(f"Файл больше {self.limit} байт")
+        return super().write(data)
+
+
+async def download_file_id(bot: Bot, file_id: str) -> bytes:
+    """
+    Скачивает файл Telegram по file_id в память, не касаясь диска.
+    Файл читается по частям; если он больше voice_max_bytes, загрузка
+    прерывается, не дожидаясь конца
+    """
+    limit = settings.recognition.voice_max_bytes
+    voice_file_info = await bot.get_file(file_id)
+    if voice_file_info.file_size and voice_file_info.file_size > limit:
+        raise VoiceTooLargeError(f"Файл больше {limit} байт")
+    buffer = _LimitedBuffer(limit)
+    await bot.download_file(voice_file_info.file_path, buffer)
+    return buffer.getvalue()
+
+
+async def download_voice(bot: Bot, message: Message) -> bytes:
+    """Скачивает голосовое сообщение в память"""
+    return await download_file_id(bot, message.voice.file_id)
+
+
+async def decode_audio(data: bytes) -> Optional[DecodedAudio]:
+    """Декодирует голосовое сообщение (OGG/Opus) в память, при ошибке - None"""
+    raw = await decoder.decode(data)
+    if raw is None:
+        return None
+    return DecodedAudio(raw)
+
+
+def _whisper_model():
+    """
+    Модель Whisper текущего процесса. Функция уровня модуля, а не lambda:
+    с INFERENCE_PROCESS_ENGINES=whisper она передается в процесс пула
+    """
+    return models.get('whisper')
+
+
+# Одновременные запросы к Whisper объединяются в пакеты
+whisper_batcher = WhisperBatcher(
+    model=_whisper_model,
+    run=lambda func, *args: inference.run('whisper', func, *args),
+    max_batch=settings.inference.whisper_max_batch,
+    max_wait=settings.inference.whisper_max_wait,
+    concurrency=settings.inference.whisper_concurrency,
+    language="ru",
+    beam_size=settings.inference.whisper_beam_size
+)
 
 
-def convert_to_wav(input_path: str, output_path: str, sample_rate: int = 16000) -> bool:
+async def voice_to_text_whisper(audio: DecodedAudio) -> str:
+    """Принимает декодированное аудио, возвращает транскрибированный текст."""
+    return await whisper_batcher.transcribe(audio.samples)
+
+
+def _recognize_google(audio: DecodedAudio) -> str:
     """
-    Конвертация ogg в wav через pydub
+    Синхронное распознавание Google, выполняется в пуле inference.
+    Непонятая речь - пустой текст, сетевые ошибки поднимаются для предохранителя
     """
+    import speech_recognition as sr
     try:
-        if not os.path.exists(input_path):
-            print(f"Input file not found: {input_path}")
-            print(f"Current working directory: {os.getcwd()}")
-            print(f"Absolute path to input file: {os.path.abspath(input_path)}")
-            return False
-            
-        print(f"Converting {input_path} to {output_path}")
-        print(f"File exists: {os.path.exists(input_path)}")
-        print(f"File size: {os.path.getsize(input_path)} bytes")
-        
-        # Загружаем OGG файл
-        audio = AudioSegment.from_ogg(input_path)
-        
-        # Устанавливаем нужные параметры
-        audio = audio.set_frame_rate(sample_rate).set_channels(1)
-        
-        # Сохраняем в WAV
-        audio.export(output_path, format="wav")
-        
-        if os.path.exists(output_path):
-            print(f"Successfully converted {input_path} to {output_path}")
-            print(f"Output file size: {os.path.getsize(output_path)} bytes")
-            return True
-        return False
-        
-    except Exception as e:
-        print(f"Conversion error: {e}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        return False
+        recognizer = models.get('google')
+        return recognizer.recognize_google(audio.audio_data, language='ru-RU')
+    except sr.UnknownValueError:
+        return ""
+
+
+async def voice_to_text_google(audio: DecodedAudio) -> str:
+    """Распознавание речи через Google Speech Recognition"""
+    return await inference.run('google', _recognize_google, audio)
+
+
+def _recognize_vosk(audio: DecodedAudio, grammar: str = None) -> str:
+    """Синхронное распознавание Vosk, выполняется в пуле inference"""
+    from vosk import KaldiRecognizer
+    
+    # Создаем распознаватель, с грамматикой - ограниченный списком фраз
+    model = models.get('vosk')
+    if grammar:
+        rec = KaldiRecognizer(model, audio.sample_rate, grammar)
+    else:
+        rec = KaldiRecognizer(model, audio.sample_rate)
+    rec.SetWords(True)
+    
+    # Подаем аудио блоками по 4000 отсчетов
+    result = ""
+    chunk = 4000 * SAMPLE_WIDTH
+    for offset in range(0, len(audio.raw), chunk):
+        if rec.AcceptWaveform(audio.raw[offset:offset + chunk]):
+            result += json.loads(rec.Result())["text"] + " "
+    
+    # Получаем последний фрагмент
+    final_result = json.loads(rec.FinalResult())
+    result += final_result["text"]
+    
+    return result.strip()
+
+
+async def voice_to_text_vosk(audio: DecodedAudio) -> str:
+    """Распознавание речи через Vosk"""
+    return await inference.run('vosk', _recognize_vosk, audio)
+
+
+async def voice_to_text_vosk_grammar(audio: DecodedAudio) -> str:
+    """Распознавание Vosk, ограниченное описаниями активных команд"""
+    grammar = command_grammar.grammar
+    if not grammar:
+        return ""
+    text = await inference.run('vosk', _recognize_vosk, audio, grammar)
+    return ' '.join(word for word in text.split() if word != UNKNOWN)
 
 
 async def text_to_sentence(text: str) -> [str]:
@@ -148,66 +198,3 @@ def get_sentiment_emoji(sentiment):
 
 async def markup_text_emotional(text: str) -> str:
     """Функция для распознавания тональности сообщений и маркировки их смайликами"""
-
-
-async def convert_to_wav_pydub(input_path: str, output_path: str) -> bool:
-    """Конвертация ogg в wav через pydub"""
-    try:
-        audio = AudioSegment.from_ogg(input_path)
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        audio.export(output_path, format="wav")
-        return True
-    except Exception as e:
-        print(f"Pydub conversion error: {e}")
-        return False
-
-
-async def process_voice_recognition(temp_file: str):
-    """Асинхронная обработка голосового сообщения всеми системами распознавания"""
-    results = []
-    
-    # Конвертируем в wav для других систем
-    wav_file = temp_file.replace('.ogg', '.wav')
-    
-    # Используем ffmpeg напрямую вместо pydub
-    try:
-        process = subprocess.Popen([
-            'ffmpeg',
-            '-loglevel', 'quiet',
-            '-i', temp_file,
-            '-ar', '16000',
-            '-ac', '1',
-            '-f', 'wav',
-            wav_file
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        stdout, stderr = process.communicate()
-        conversion_success = process.returncode == 0 and os.path.exists(wav_file)
-        
-        if not conversion_success:
-            print(f"FFmpeg conversion failed: {stderr.decode() if stderr else 'No error output'}")
-    except Exception as e:
-        print(f"Conversion error: {e}")
-        conversion_success = False
-    
-    if conversion_success:
-        # Запускаем системы распознавания параллельно
-        tasks = [
-            voice_to_text_google(wav_file),
-            voice_to_text_vosk(wav_file)
-        ]
-        other_results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Добавляем результаты
-        for result, system in zip(other_results, ["🎯 Google Speech", "📝 Vosk"]):
-            if isinstance(result, Exception):
-                results.append((system, f"Ошибка: {str(result)}"))
-            else:
-                results.append((system, result))
-    else:
-        results.extend([
-            ("🎯 Google Speech", "Ошибка конвертации аудио"),
-            ("📝 Vosk", "Ошибка конвертации аудио")
-        ])
-    
-    return results
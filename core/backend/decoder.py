@@ -0,0 +1,109 @@
+import asyncio
+import io
+import logging
+import shutil
+from math import gcd
+from typing import Optional
+
+import numpy as np
+from core.config.settings import settings, Inference
+from core.backend.inference import inference
+
+logger = logging.getLogger(__name__)
+
+# Формат, в который декодируются все голосовые сообщения
+SAMPLE_RATE = 16000
+
+
+def resolve_ffmpeg(path: str = "") -> Optional[str]:
+    """Полный путь к ffmpeg из настроек или PATH, None - если не найден"""
+    return shutil.which(path or "ffmpeg")
+
+
+def decode_with_soundfile(data: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    Декодирование без ffmpeg: libsndfile читает OGG/Opus (с версии 1.0.29),
+    каналы сводятся в моно, частота приводится полифазной передискретизацией
+    """
+    import soundfile as sf
+    from scipy.signal import resample_poly
+
+    samples, rate = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    samples = samples.mean(axis=1)
+    if rate != sample_rate:
+        factor = gcd(rate, sample_rate)
+        samples = resample_poly(samples, sample_rate // factor, rate // factor)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+class AudioDecoder:
+    """
+    Декодирует голосовые сообщения в PCM s16le 16 кГц моно.
+    ffmpeg ищется один раз при создании и запускается асинхронно, данные идут
+    через stdin/stdout без временных файлов. Если ffmpeg не найден или упал,
+    используется декодер libsndfile в пуле inference. Число одновременных
+    декодирований ограничено, по умолчанию числом ядер.
+    """
+
+    def __init__(self, config: Inference, timeout: float = 30.0):
+        self.ffmpeg = resolve_ffmpeg(config.ffmpeg_path)
+        self.fallback = config.decode_fallback
+        self.concurrency = config.ffmpeg_concurrency
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        if self.ffmpeg:
+            logger.info(f"ffmpeg: {self.ffmpeg}")
+        else:
+            logger.warning("ffmpeg не найден, голосовые сообщения декодируются через libsndfile")
+
+    async def decode(self, data: bytes) -> Optional[bytes]:
+        """PCM голосового сообщения или None, если декодировать не удалось"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            if self.ffmpeg:
+                raw = await self._decode_ffmpeg(data)
+                if raw is not None or not self.fallback:
+                    return raw
+            elif not self.fallback:
+                return None
+            try:
+                return await inference.run('decoder', decode_with_soundfile, data)
+            except Exception as e:
+                logger.error(f"Ошибка декодирования аудио: {type(e).__name__}: {e}")
+                return None
+
+    async def _decode_ffmpeg(self, data: bytes) -> Optional[bytes]:
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg,
+            '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-ar', str(SAMPLE_RATE),
+            '-ac', '1',
+            '-f', 's16le',
+            'pipe:1',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(data), self.timeout)
+        except BaseException as e:
+            # Таймаут или отмена запроса: процесс не должен пережить запрос
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning(f"ffmpeg не декодировал аудио за {self.timeout:g} с")
+                return None
+            raise
+
+        if process.returncode != 0:
+            logger.warning(f"ffmpeg завершился с кодом {process.returncode}: "
+                           f"{stderr.decode(errors='replace').strip() if stderr else 'нет вывода'}")
+            return None
+        return stdout
+
+
+# Декодер процесса, ffmpeg ищется при запуске
+decoder = AudioDecoder(settings.inference)
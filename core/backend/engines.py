@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Optional
+from core.config.settings import settings, Settings
+from core.backend.audio_handler import (
+    DecodedAudio, voice_to_text_whisper, voice_to_text_google, voice_to_text_vosk,
+    voice_to_text_vosk_grammar
+)
+from core.backend.grammar import command_grammar
+from core.backend.inference import inference
+
+logger = logging.getLogger(__name__)
+
+# Класс ресурса движка: локальные вычисления или внешний сервис
+CPU = 'cpu'
+NETWORK = 'network'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class EngineUnavailableError(RuntimeError):
+    """Движок отключен предохранителем после серии ошибок"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель движка: после failures ошибок подряд движок отключается
+    на reset_after секунд, затем пропускается один пробный вызов. Успех
+    возвращает движок в работу, ошибка снова отключает его.
+    """
+
+    def __init__(self, failures: int = 3, reset_after: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._clock = clock
+        self._errors = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._clock() - self._opened_at >= self.reset_after:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def is_open(self) -> bool:
+        """Вызов сейчас не будет пропущен"""
+        state = self.state
+        return state == OPEN or (state == HALF_OPEN and self._probing)
+
+    def allow(self) -> bool:
+        """Разрешает вызов; в полуоткрытом состоянии - только один пробный"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self._errors = 0
+        self._opened_at = None
+        self._probing = False
+
+    def failure(self) -> bool:
+        """Учитывает ошибку; True, если предохранитель сработал"""
+        self._errors += 1
+        self._probing = False
+        if self._opened_at is not None or self._errors >= self.failures:
+            self._opened_at = self._clock()
+            return True
+        return False
+
+    def cancel(self) -> None:
+        """Вызов отменен без результата: пробный вызов можно повторить"""
+        self._probing = False
+
+
+class RecognitionEngine(ABC):
+    """
+    Движок распознавания: имя, версия модели для кэша расшифровок, класс
+    ресурса и модель реестра core.backend.models. Вызов transcribe ограничен
+    по числу одновременных вызовов и по времени, ошибки и таймауты считает
+    предохранитель, и пока он открыт, конвейер движок не запускает.
+    """
+    name: str = ''
+    label: str = ''
+    resource_class: str = CPU
+    model: Optional[str] = None
+
+    def __init__(self, concurrency: int, timeout: float, breaker: CircuitBreaker = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def model_version(self) -> str:
+        """Смена версии делает старые расшифровки в кэше недействительными"""
+        return self.name
+
+    @property
+    def available(self) -> bool:
+        return not self.breaker.is_open
+
+    @abstractmethod
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        """Текст записи; ошибки должны подниматься, а не подменяться пустой строкой"""
+
+    async def transcribe(self, audio: DecodedAudio, deadline: float = None) -> str:
+        """
+        Распознает PCM записи. Сам вызов ограничен self.timeout, а ожидание
+        слота и вызов вместе - deadline вызывающего (оставшимся временем
+        конвейера). Предохранитель учитывает только превышение self.timeout:
+        очередь за слотом под нагрузкой и исчерпанный бюджет каскада
+        не считаются ошибками движка
+        """
+        if not self.breaker.allow():
+            raise EngineUnavailableError("Движок временно отключен после серии ошибок")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        finish_at = None if deadline is None else loop.time() + deadline
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline)
+        except asyncio.TimeoutError:
+            self.breaker.cancel()
+            raise TimeoutError(f"Нет свободного слота за {deadline:g} с")
+        except asyncio.CancelledError:
+            self.breaker.cancel()
+            raise
+
+        # Слот занят до завершения самой работы, а не ожидания ее результата:
+        # вызов в пуле потоков нельзя прервать, и после таймаута он продолжает
+        # занимать модель или соединение, поэтому новый вызов ждет его
+        task = asyncio.ensure_future(self._transcribe(audio))
+        task.add_done_callback(self._release)
+        remaining = self.timeout if finish_at is None else max(finish_at - loop.time(), 0)
+        limit = min(self.timeout, remaining)
+        try:
+            text = await asyncio.wait_for(asyncio.shield(task), limit)
+        except asyncio.CancelledError:
+            self.breaker.cancel()
+            raise
+        except asyncio.TimeoutError:
+            if limit < self.timeout:
+                self.breaker.cancel()
+                raise TimeoutError(f"Превышено время ожидания ({deadline:g} с)")
+            self._failed()
+            raise TimeoutError(f"Нет ответа за {self.timeout:g} с")
+        except Exception:
+            self._failed()
+            raise
+        self.breaker.success()
+        return text
+
+    def _release(self, task: asyncio.Future) -> None:
+        self._slots.release()
+        # Результат брошенного по таймауту вызова никто не заберет
+        if not task.cancelled():
+            task.exception()
+
+    def _failed(self) -> None:
+        if self.breaker.failure():
+            logger.warning(f"Движок {self.name} отключен на {self.breaker.reset_after:.0f} с после ошибок")
+
+
+class WhisperEngine(RecognitionEngine):
+    name = 'whisper'
+    label = 'Whisper'
+    model = 'whisper'
+
+    @property
+    def model_version(self) -> str:
+        config = settings.models
+        return f"{config.whisper_size}/{config.whisper_compute_type}/beam{settings.inference.whisper_beam_size}"
+
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        return await voice_to_text_whisper(audio)
+
+
+class VoskEngine(RecognitionEngine):
+    name = 'vosk'
+    label = 'Vosk'
+    model = 'vosk'
+
+    @property
+    def model_version(self) -> str:
+        return os.path.basename(settings.models.vosk_path.rstrip('/\\'))
+
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        return await voice_to_text_vosk(audio)
+
+
+class VoskGrammarEngine(VoskEngine):
+    name = 'vosk_grammar'
+    label = 'Vosk (команды)'
+
+    @property
+    def model_version(self) -> str:
+        grammar = hashlib.sha1((command_grammar.grammar or '').encode()).hexdigest()[:12]
+        return f"{super().model_version}/{grammar}"
+
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        return await voice_to_text_vosk_grammar(audio)
+
+
+class GoogleEngine(RecognitionEngine):
+    name = 'google'
+    label = 'Google Speech'
+    resource_class = NETWORK
+    model = 'google'
+
+    @property
+    def model_version(self) -> str:
+        return 'ru-RU'
+
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        return await voice_to_text_google(audio)
+
+
+def _busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StubEngine(RecognitionEngine):
+    """
+    Движок без модели для стендов и бенчмарков: ждет latency секунд
+    (как сетевой сервис), занимает процессор на cpu_seconds и возвращает text
+    """
+
+    def __init__(self, name: str = 'stub', text: str = '', latency: float = 0.0,
+                 cpu_seconds: float = 0.0, resource_class: str = CPU, label: str = None,
+                 concurrency: int = 64, timeout: float = 30.0, breaker: CircuitBreaker = None):
+        super().__init__(concurrency, timeout, breaker)
+        self.name = name
+        self.label = label or name
+        self.resource_class = resource_class
+        self.text = text
+        self.latency = latency
+        self.cpu_seconds = cpu_seconds
+
+    async def _transcribe(self, audio: DecodedAudio) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.cpu_seconds:
+            await inference.run(self.name, _busy, self.cpu_seconds)
+        return self.text
+
+
+class EngineRegistry:
+    """Движки распознавания по именам из настроек"""
+
+    def __init__(self, engines: Iterable[RecognitionEngine] = ()):
+        self._engines: Dict[str, RecognitionEngine] = {}
+        for engine in engines:
+            self.register(engine)
+
+    def register(self, engine: RecognitionEngine) -> RecognitionEngine:
+        """Добавляет движок или заменяет движок с тем же именем"""
+        self._engines[engine.name] = engine
+        return engine
+
+    def get(self, name: str) -> RecognitionEngine:
+        if name not in self._engines:
+            raise LookupError(f"Неизвестный движок распознавания: {name}")
+        return self._engines[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._engines
+
+    def label(self, name: str) -> str:
+        return self._engines[name].label if name in self._engines else name
+
+    def available(self, name: str) -> bool:
+        """Неизвестный движок считается доступным: ошибку покажет его вызов"""
+        return name not in self._engines or self._engines[name].available
+
+    def states(self) -> Dict[str, str]:
+        """Состояние предохранителя каждого движка"""
+        return {name: engine.breaker.state for name, engine in self._engines.items()}
+
+
+def build_engines(config: Settings = None) -> EngineRegistry:
+    """Реестр встроенных движков с ограничениями из настроек"""
+    config = config or settings
+    inference_config, recognition = config.inference, config.recognition
+
+    def breaker() -> CircuitBreaker:
+        return CircuitBreaker(recognition.breaker_failures, recognition.breaker_reset)
+
+    return EngineRegistry([
+        # Одновременные запросы Whisper нужны микро-батчингу, поэтому лимит - на все пакеты
+        WhisperEngine(inference_config.whisper_concurrency * max(inference_config.whisper_max_batch, 1),
+                      recognition.engine_timeout, breaker()),
+        GoogleEngine(inference_config.google_concurrency, recognition.network_timeout, breaker()),
+        VoskEngine(inference_config.vosk_concurrency, recognition.engine_timeout, breaker()),
+        VoskGrammarEngine(inference_config.vosk_concurrency, recognition.engine_timeout, breaker()),
+    ])
+
+
+# Движки процесса
+engine_registry = build_engines()
@@ -0,0 +1,54 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+from core.database.async_database import AsyncDatabase
+
+# Слово вне грамматики: без него Vosk подгоняет любую речь под ближайшую фразу
+UNKNOWN = "[unk]"
+
+
+def normalize_phrase(text: str) -> str:
+    """Приводит текст к виду фраз грамматики: нижний регистр, только буквы, цифры и пробелы"""
+    text = ''.join(c.lower() if c.isalnum() else ' ' for c in text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class CommandGrammar:
+    """
+    Грамматика Vosk из описаний активных команд.
+    Перестраивается, только когда меняется версия каталога команд в Database,
+    поэтому обычная запись не обращается к базе. Ограниченный распознаватель
+    выбирает одну из известных фраз, что быстрее открытого словаря и сразу
+    отвечает, какая команда была произнесена.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.grammar: Optional[str] = None  # JSON-список фраз для KaldiRecognizer
+        self._commands: Dict[str, Dict[str, Any]] = {}  # Фраза -> команда
+
+    async def refresh(self, db: AsyncDatabase) -> None:
+        """Перестраивает грамматику, если каталог команд изменился"""
+        version = db.catalog_version
+        if version == self.version:
+            return
+        commands = await db.get_active_commands()
+        self.build(commands, version)
+
+    def build(self, commands: List[Dict[str, Any]], version: int = None) -> None:
+        phrases = {}
+        for command in commands:
+            phrase = normalize_phrase(command['description'])
+            if phrase:
+                phrases.setdefault(phrase, command)
+        self._commands = phrases
+        self.grammar = json.dumps(list(phrases) + [UNKNOWN], ensure_ascii=False) if phrases else None
+        self.version = version
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        """Команда, описание которой совпало с результатом распознавания"""
+        return self._commands.get(normalize_phrase(text.replace(UNKNOWN, '')))
+
+
+# Грамматика активных команд, общая для процесса
+command_grammar = CommandGrammar()
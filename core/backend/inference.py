@@ -0,0 +1,55 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from core.config.settings import settings, Inference
+
+
+class InferenceExecutor:
+    """
+    Выполняет блокирующие вызовы моделей распознавания вне цикла событий.
+    CTranslate2 (Whisper) и Kaldi (Vosk) отпускают GIL на время вычислений,
+    поэтому по умолчанию используется пул потоков. Движки из process_engines
+    отправляются в пул процессов: функция и аргументы должны сериализоваться,
+    а модели загружаются в каждом процессе заново.
+    Число одновременных вызовов ограничивается отдельно для каждого движка.
+    """
+
+    def __init__(self, config: Inference):
+        self.config = config
+        self._threads = ThreadPoolExecutor(
+            max_workers=config.threads, thread_name_prefix='inference'
+        )
+        self._processes = ProcessPoolExecutor(config.processes) if config.processes else None
+        self._limits = {
+            'whisper': config.whisper_concurrency,
+            'vosk': config.vosk_concurrency,
+            'google': config.google_concurrency,
+            'decoder': config.ffmpeg_concurrency,
+        }
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, engine: str) -> asyncio.Semaphore:
+        if engine not in self._semaphores:
+            self._semaphores[engine] = asyncio.Semaphore(self._limits.get(engine, self.config.threads))
+        return self._semaphores[engine]
+
+    async def run(self, engine: str, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет func в пуле с учетом ограничения параллельности движка"""
+        if self._processes and engine in self.config.process_engines:
+            executor = self._processes
+        else:
+            executor = self._threads
+        
+        async with self._semaphore(engine):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+# Общий пул выполнения моделей
+inference = InferenceExecutor(settings.inference)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable
+from core.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ModelRegistry:
+    """
+    Реестр моделей распознавания с ленивой загрузкой.
+    Модель создается при первом обращении через get() или заранее в фоне
+    через warm_up(), поэтому импорт настроек и обработчиков не ждет загрузки
+    сотен мегабайт. Обработчики проверяют is_ready() и отвечают пользователю,
+    пока модели еще загружаются, вместо того чтобы блокироваться.
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self._loaders = loaders
+        self._models: Dict[str, Any] = {}
+        self._states: Dict[str, str] = {name: NOT_LOADED for name in loaders}
+        self._errors: Dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in loaders}
+        self._task: asyncio.Task = None
+
+    def get(self, name: str) -> Any:
+        """Возвращает модель, при необходимости загружая ее в текущем потоке"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            self._states[name] = LOADING
+            started = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._states[name] = FAILED
+                self._errors[name] = str(e)
+                logger.error(f"Ошибка загрузки модели {name}: {e}")
+                raise
+            self._models[name] = model
+            self._states[name] = READY
+            self._errors.pop(name, None)
+            logger.info(f"Модель {name} загружена за {time.perf_counter() - started:.1f} с")
+            return model
+
+    def is_ready(self, names: Iterable[str] = None) -> bool:
+        """Загружены ли все указанные модели (по умолчанию - все)"""
+        names = self._loaders if names is None else names
+        return all(self._states.get(name) == READY for name in names if name in self._loaders)
+
+    def state(self) -> Dict[str, str]:
+        """Состояние каждой модели: not_loaded, loading, ready или failed"""
+        return dict(self._states)
+
+    def errors(self) -> Dict[str, str]:
+        return dict(self._errors)
+
+    async def _load_all(self, names: Iterable[str]) -> None:
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception:
+                pass  # Ошибка уже записана, остальные модели загружаем дальше
+
+    def warm_up(self, names: Iterable[str] = None) -> asyncio.Task:
+        """Запускает фоновую загрузку моделей, повторный вызов возвращает ту же задачу"""
+        if self._task is None or (self._task.done() and not self.is_ready(names)):
+            names = list(self._loaders if names is None else names)
+            self._task = asyncio.create_task(self._load_all(names))
+        return self._task
+
+
+def _load_whisper():
+    from faster_whisper import WhisperModel
+    config = settings.models
+    return WhisperModel(config.whisper_size, device=config.whisper_device,
+                        compute_type=config.whisper_compute_type)
+
+
+def _load_vosk():
+    from vosk import Model
+    return Model(settings.models.vosk_path)
+
+
+def _load_google():
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    # Без таймаута сокета зависший запрос держит поток пула до обрыва соединения
+    recognizer.operation_timeout = settings.recognition.network_timeout
+    return recognizer
+
+
+# Общий реестр моделей процесса
+models = ModelRegistry({
+    'whisper': _load_whisper,
+    'vosk': _load_vosk,
+    'google': _load_google,
+})
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from core.config.settings import settings
+from core.backend.inference import inference
+from core.backend.transcription_cache import TranscriptionCache
+from core.backend.vad import preprocess
+from core.backend.audio_handler import DecodedAudio, decode_audio
+from core.backend.engines import engine_registry
+
+logger = logging.getLogger(__name__)
+
+# Распознаватель с грамматикой всегда выдает одну из команд, поэтому его
+# схожесть с текстом команды не говорит о качестве записи: он только
+# подсказывает, какая команда произнесена
+GRAMMAR_ENGINES = {'vosk_grammar'}
+
+
+def with_grammar(engines: Iterable[str]) -> List[str]:
+    """Добавляет или подставляет Vosk с грамматикой команд согласно настройке vosk_grammar"""
+    mode = settings.recognition.vosk_grammar
+    result = []
+    for engine in engines:
+        if engine == 'vosk' and mode == 'instead':
+            result.append('vosk_grammar')
+        elif engine == 'vosk' and mode == 'alongside':
+            result.extend(('vosk', 'vosk_grammar'))
+        else:
+            result.append(engine)
+    return result
+
+
+def active_engines() -> List[str]:
+    """Движки, которые используют обычный режим и каскад"""
+    config = settings.recognition
+    engines = with_grammar(config.engines)
+    if config.cascade:
+        for stage in config.cascade_stages:
+            engines.extend(engine for engine in with_grammar(stage) if engine not in engines)
+    return engines
+
+
+def active_models() -> List[str]:
+    """Модели реестра, необходимые активным движкам"""
+    names = []
+    for engine in active_engines():
+        name = engine_registry.get(engine).model if engine in engine_registry else None
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+@dataclass
+class EngineResult:
+    """Результат одного движка распознавания"""
+    engine: str
+    text: str = ""
+    seconds: float = 0.0
+    error: Optional[str] = None
+    cached: bool = False  # Взят из кэша расшифровок, движок не запускался
+    rejected: bool = False  # Запись отклонена VAD, движок не запускался
+
+    @property
+    def label(self) -> str:
+        return engine_registry.label(self.engine)
+
+    @property
+    def timing(self) -> str:
+        """Время работы движка или отметка, что расшифровка взята из кэша"""
+        return "из кэша" if self.cached else f"{self.seconds:.1f} с"
+
+
+async def _run_engine(engine: str, audio: DecodedAudio, deadline: float) -> EngineResult:
+    """
+    Запускает движок и замеряет время его работы. Движок сам ждет не дольше
+    deadline, поэтому его таймаут учитывается предохранителем, а нехватка
+    времени конвейера - нет
+    """
+    start = time.perf_counter()
+    try:
+        text = await engine_registry.get(engine).transcribe(audio, deadline)
+        return EngineResult(engine, text or "", time.perf_counter() - start)
+    except Exception as e:
+        logger.error(f"Ошибка распознавания {engine}: {type(e).__name__}: {e}")
+        return EngineResult(engine, "", time.perf_counter() - start, str(e))
+
+
+# Голосовое сообщение или корутина, которая его скачает
+VoiceSource = Union[bytes, Callable[[], Awaitable[bytes]]]
+
+
+class _LazyAudio:
+    """
+    Скачивает, декодирует и обрезает по VAD голосовое сообщение один раз
+    при первом обращении. Если запись не годится, error объясняет почему
+    """
+
+    def __init__(self, voice: VoiceSource):
+        self._voice = voice
+        self._audio: Optional[DecodedAudio] = None
+        self._decoded = False
+        self.error: Optional[str] = None
+        self.rejected = False  # Ошибка - отказ VAD, а не сбой
+
+    async def get(self) -> Optional[DecodedAudio]:
+        if not self._decoded:
+            voice = self._voice if isinstance(self._voice, (bytes, bytearray)) else await self._voice()
+            self._audio = await decode_audio(voice)
+            self._decoded = True
+            if self._audio is None:
+                self.error = "Ошибка конвертации аудио"
+            elif settings.vad.enabled:
+                self._audio, vad = await inference.run('decoder', preprocess, self._audio)
+                self.error = vad.rejected
+                self.rejected = bool(vad.rejected)
+        return self._audio
+
+
+async def _recognize_engines(source: _LazyAudio, engines: List[str], deadline: float,
+                             cached: Dict[str, str],
+                             cache: Optional[TranscriptionCache]) -> List[EngineResult]:
+    """Берет готовые расшифровки из cached, остальные движки запускает и кэширует"""
+    results = {
+        engine: EngineResult(engine, cached[engine], cached=True)
+        for engine in engines if engine in cached
+    }
+    # Движки с открытым предохранителем не запускаются, пока он не остынет
+    for engine in engines:
+        if engine not in results and not engine_registry.available(engine):
+            results[engine] = EngineResult(engine, error="Временно отключен после серии ошибок")
+    missing = [engine for engine in engines if engine not in results]
+    if missing:
+        audio = await source.get()
+        if audio is None:
+            fresh = [EngineResult(engine, error=source.error, rejected=source.rejected) for engine in missing]
+        else:
+            fresh = await _run_engines(audio, missing, deadline)
+            if cache:
+                await cache.store([(result.engine, result.text) for result in fresh if not result.error])
+        results.update((result.engine, result) for result in fresh)
+    return [results[engine] for engine in engines]
+
+
+async def recognize(voice: VoiceSource, engines: Iterable[str] = None,
+                    deadline: float = None,
+                    cache: TranscriptionCache = None) -> List[EngineResult]:
+    """
+    Распознает голосовое сообщение всеми движками одновременно.
+    Аудио декодируется в память один раз и передается всем движкам. Возвращает
+    результаты в порядке engines, как только все движки завершились или
+    истек deadline; не успевшие движки отменяются и помечаются ошибкой.
+    Если передан cache, сохраненные расшифровки берутся из него до запуска
+    движков, а когда есть все - голосовое сообщение даже не скачивается.
+    """
+    engines = with_grammar(engines or settings.recognition.engines)
+    deadline = settings.recognition.deadline if deadline is None else deadline
+
+    cached = await cache.lookup(engines) if cache else {}
+    return await _recognize_engines(_LazyAudio(voice), engines, deadline, cached, cache)
+
+
+async def _run_engines(audio: DecodedAudio, engines: List[str], deadline: float) -> List[EngineResult]:
+    """Запускает движки одновременно и ждет их не дольше deadline секунд"""
+    if deadline <= 0:
+        # Время каскада вышло на предыдущих ступенях: движки не виноваты
+        return [EngineResult(engine, "", 0.0, "Превышено время ожидания") for engine in engines]
+    return list(await asyncio.gather(*(_run_engine(engine, audio, deadline) for engine in engines)))
+
+
+class CascadeStats:
+    """Счетчики каскада: на какой ступени принимается результат"""
+
+    def __init__(self):
+        self.total = 0
+        self.accepted: Dict[int, int] = {}  # Номер ступени -> принято на ней
+        self.exhausted = 0  # Ни одна ступень не набрала порог
+
+    def record(self, stage: Optional[int]) -> None:
+        self.total += 1
+        if stage is None:
+            self.exhausted += 1
+        else:
+            self.accepted[stage] = self.accepted.get(stage, 0) + 1
+
+    def hit_rates(self, stages: List[Tuple[str, ...]]) -> Dict[str, float]:
+        """Доля записей, принятых на каждой ступени, в процентах"""
+        rates = {}
+        for index, engines in enumerate(stages):
+            label = '+'.join(engine_registry.label(engine) for engine in engines)
+            rates[label] = self.accepted.get(index, 0) / self.total * 100 if self.total else 0.0
+        rates['ниже порога'] = self.exhausted / self.total * 100 if self.total else 0.0
+        return rates
+
+
+cascade_stats = CascadeStats()
+
+
+async def recognize_cascade(voice: VoiceSource, score: Callable[[str], float],
+                            stages: List[Tuple[str, ...]] = None,
+                            threshold: float = None,
+                            deadline: float = None,
+                            cache: TranscriptionCache = None) -> List[EngineResult]:
+    """
+    Каскадное распознавание команды с известным текстом.
+    Ступени выполняются по очереди, начиная с быстрой (по умолчанию Vosk);
+    если лучший результат ступени набирает score не ниже threshold, более
+    тяжелые движки не запускаются. Возвращает результаты всех выполненных
+    ступеней; deadline общий на весь каскад.
+    """
+    config = settings.recognition
+    stages = [tuple(with_grammar(stage)) for stage in (stages or config.cascade_stages)]
+    threshold = config.cascade_threshold if threshold is None else threshold
+    deadline = config.deadline if deadline is None else deadline
+
+    loop = asyncio.get_running_loop()
+    finish_at = loop.time() + deadline
+    source = _LazyAudio(voice)
+    cached = await cache.lookup({engine for stage in stages for engine in stage}) if cache else {}
+    results: List[EngineResult] = []
+    for index, engines in enumerate(stages):
+        stage_results = await _recognize_engines(source, list(engines), finish_at - loop.time(),
+                                                 cached, cache)
+        results.extend(stage_results)
+        scored = [result for result in stage_results if result.engine not in GRAMMAR_ENGINES]
+        if scored and best_result(scored, score)[1] >= threshold:
+            cascade_stats.record(index)
+            return results
+    cascade_stats.record(None)
+    return results
+
+
+def best_result(results: List[EngineResult],
+                score: Callable[[str], float]) -> Tuple[EngineResult, float]:
+    """
+    Возвращает результат с наибольшей оценкой и саму оценку. Движки
+    с грамматикой не участвуют, если есть результаты других движков
+    """
+    candidates = [result for result in results if result.engine not in GRAMMAR_ENGINES] or results
+    scored = [(result, score(result.text)) for result in candidates]
+    return max(scored, key=lambda item: item[1])
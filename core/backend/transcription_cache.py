@@ -0,0 +1,39 @@
+from typing import Dict, Iterable, List, Tuple
+from core.database.async_database import AsyncDatabase
+from core.backend.engines import engine_registry
+
+
+def engine_model_version(engine: str) -> str:
+    """
+    Версия модели движка для ключа кэша: смена модели, ее параметров
+    или грамматики команд делает старые расшифровки недействительными
+    """
+    return engine_registry.get(engine).model_version if engine in engine_registry else engine
+
+
+class TranscriptionCache:
+    """
+    Кэш расшифровок одного голосового сообщения.
+    Ключ - file_unique_id Telegram, одинаковый для пересланных и повторно
+    отправленных копий файла, плюс движок и версия его модели.
+    Вместо базы подходит любой объект с методами get_cached_transcriptions
+    и cache_transcriptions, например источник заданий рабочего
+    """
+
+    def __init__(self, db: AsyncDatabase, file_unique_id: str):
+        self.db = db
+        self.file_unique_id = file_unique_id
+
+    async def lookup(self, engines: Iterable[str]) -> Dict[str, str]:
+        """Сохраненные расшифровки для движков, одним запросом"""
+        versions = {engine: engine_model_version(engine) for engine in engines}
+        return await self.db.get_cached_transcriptions(self.file_unique_id, versions)
+
+    async def store(self, results: List[Tuple[str, str]]) -> None:
+        """Сохраняет пары (движок, текст); пустые результаты не кэшируются"""
+        rows = [
+            (engine, engine_model_version(engine), text)
+            for engine, text in results if text
+        ]
+        if rows:
+            await self.db.cache_transcriptions(self.file_unique_id, rows)
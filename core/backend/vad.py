@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from core.config.settings import settings, Vad
+from core.backend.audio_handler import DecodedAudio
+
+
+class SpeechRejectedError(ValueError):
+    """Запись отклонена VAD: повторное распознавание даст тот же результат"""
+
+
+@dataclass
+class VadResult:
+    """Границы речи в записи (в отсчетах) и длительности в секундах"""
+    start: int
+    end: int
+    speech_seconds: float
+    total_seconds: float
+    sample_rate: int
+    rejected: Optional[str] = None  # Причина, по которой запись не распознается
+
+    @property
+    def kept_seconds(self) -> float:
+        """Длительность, которая уходит в движки"""
+        return (self.end - self.start) / self.sample_rate
+
+
+def detect_speech(pcm: np.ndarray, sample_rate: int, config: Vad) -> VadResult:
+    """
+    Энергетический детектор речи, вычисляется сразу по всем кадрам.
+    Порог - уровень шума записи (10-й перцентиль энергии кадров) плюс
+    noise_margin_db, но не ниже min_level_db и не выше уровня самых громких
+    кадров минус тот же запас, чтобы запись без пауз не обрезалась по краям
+    """
+    total = len(pcm) / sample_rate
+    frame = max(int(sample_rate * config.frame_ms / 1000), 1)
+    count = len(pcm) // frame
+    if count == 0:
+        return VadResult(0, 0, 0.0, total, sample_rate)
+
+    frames = pcm[:count * frame].reshape(count, frame).astype(np.float32) / 32768.0
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_db = float(np.percentile(energy_db, 10))
+    threshold = max(config.min_level_db,
+                    min(noise_db + config.noise_margin_db, float(energy_db.max()) - config.noise_margin_db))
+    speech = np.flatnonzero(energy_db > threshold)
+    if len(speech) == 0:
+        return VadResult(0, 0, 0.0, total, sample_rate)
+
+    padding = int(config.padding * sample_rate)
+    start = max(int(speech[0]) * frame - padding, 0)
+    end = min((int(speech[-1]) + 1) * frame + padding, len(pcm))
+    return VadResult(start, end, len(speech) * frame / sample_rate, total, sample_rate)
+
+
+class VadStats:
+    """Длительности записей до и после обрезки тишины с запуска процесса"""
+
+    def __init__(self):
+        self.clips = 0
+        self.total_seconds = 0.0
+        self.speech_seconds = 0.0
+        self.kept_seconds = 0.0  # Отправлено в движки
+        self.rejected: Dict[str, int] = {}
+
+    def record(self, result: VadResult) -> None:
+        self.clips += 1
+        self.total_seconds += result.total_seconds
+        self.speech_seconds += result.speech_seconds
+        if result.rejected:
+            self.rejected[result.rejected] = self.rejected.get(result.rejected, 0) + 1
+        else:
+            self.kept_seconds += result.kept_seconds
+
+    def trimmed_share(self) -> float:
+        """Доля аудио, которую движки не обрабатывали, в процентах"""
+        return (1 - self.kept_seconds / self.total_seconds) * 100 if self.total_seconds else 0.0
+
+
+vad_stats = VadStats()
+
+
+def preprocess(audio: DecodedAudio, config: Vad = None) -> Tuple[Optional[DecodedAudio], VadResult]:
+    """
+    Обрезает тишину до и после речи. Возвращает запись для движков
+    или None, если речи нет или она длиннее max_duration
+    """
+    config = config or settings.vad
+    result = detect_speech(audio.pcm, audio.sample_rate, config)
+    if result.speech_seconds < config.min_speech:
+        result.rejected = "Речь не обнаружена"
+    elif result.kept_seconds > config.max_duration:
+        result.rejected = f"Запись длиннее {config.max_duration:.0f} с"
+    vad_stats.record(result)
+
+    if result.rejected:
+        return None, result
+    if result.start == 0 and result.end == len(audio.pcm):
+        return audio, result
+    return audio.slice(result.start, result.end), result
@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from faster_whisper import WhisperModel
+
+logger = logging.getLogger(__name__)
+
+# Whisper обрабатывает окна по 30 секунд: более длинные записи не батчуются
+MAX_BATCH_SECONDS = 30.0
+SAMPLE_RATE = 16000
+
+# (отсчеты float32, future вызывающего)
+WhisperItem = Tuple[np.ndarray, asyncio.Future]
+
+
+def transcribe_one(model: "WhisperModel", samples: np.ndarray,
+                   language: str = "ru", beam_size: int = 5) -> str:
+    """Обычная транскрибация одной записи"""
+    segments, _ = model.transcribe(samples, language=language, beam_size=beam_size)
+    return ' '.join(segment.text for segment in segments)
+
+
+def transcribe_batch(model: "WhisperModel", batch: List[np.ndarray],
+                     language: str = "ru", beam_size: int = 5) -> List[str]:
+    """
+    Транскрибирует несколько коротких записей одним вызовом через
+    BatchedInferencePipeline. Записи склеиваются, а clip_timestamps делает
+    каждую отдельным окном пакета, поэтому декодирование идет с теми же
+    параметрами, что у конвейера faster-whisper, без его внутренних функций.
+    Сегменты возвращаются по порядку и относятся к записи по своему началу
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    starts, clips, offset = [], [], 0.0
+    for samples in batch:
+        duration = len(samples) / SAMPLE_RATE
+        starts.append(offset)
+        clips.append({"start": offset, "end": offset + duration})
+        offset += duration
+
+    segments, _ = BatchedInferencePipeline(model).transcribe(
+        np.concatenate(batch), language=language, beam_size=beam_size,
+        clip_timestamps=clips, vad_filter=False, batch_size=len(batch)
+    )
+    texts: List[List[str]] = [[] for _ in batch]
+    for segment in segments:
+        # Небольшой запас на округление границ окна до кадров
+        index = max(bisect.bisect_right(starts, segment.start + 0.01) - 1, 0)
+        texts[index].append(segment.text.strip())
+    return [' '.join(parts) for parts in texts]
+
+
+def _with_model(get_model: Callable[[], "WhisperModel"], func: Callable, *args) -> Any:
+    """Получает модель в потоке пула: первая загрузка не блокирует цикл событий"""
+    return func(get_model(), *args)
+
+
+class WhisperBatcher:
+    """
+    Очередь запросов к Whisper с микро-батчингом.
+    Запросы, пришедшие в течение max_wait секунд (но не больше max_batch),
+    транскрибируются одним пакетом. Новый пакет собирается только когда
+    освободится один из concurrency слотов, поэтому под нагрузкой пакеты
+    растут сами, а одиночный запрос ждет не дольше max_wait.
+    При ошибке пакета записи транскрибируются по одной.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[], "WhisperModel"],
+        run: Callable[..., Awaitable[Any]],
+        max_batch: int = 8,
+        max_wait: float = 0.05,
+        concurrency: int = 1,
+        language: str = "ru",
+        beam_size: int = 5
+    ):
+        self._model = model  # Возвращает загруженную модель
+        self._run = run  # Выполняет синхронную функцию в пуле inference
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.language = language
+        self.beam_size = beam_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task = None
+        self._pending: set = set()
+
+        # Статистика пакетов
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.fallbacks = 0
+
+    async def transcribe(self, samples: np.ndarray) -> str:
+        """Ставит запись в очередь и ждет ее текст"""
+        if len(samples) > MAX_BATCH_SECONDS * SAMPLE_RATE or self.max_batch <= 1:
+            return await self._run(_with_model, self._model, transcribe_one, samples,
+                                   self.language, self.beam_size)
+        if self._task is None:
+            self._task = asyncio.create_task(self._batch_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((samples, future))
+        return await future
+
+    async def _collect(self, batch: List[WhisperItem]) -> None:
+        """
+        Дополняет пакет, пока не наберется max_batch или не истечет max_wait.
+        Пакет пополняется на месте, чтобы при остановке очереди его записи не потерялись
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+
+    async def _batch_loop(self) -> None:
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            try:
+                await self._collect(batch)
+            except asyncio.CancelledError:
+                self._fail(batch)
+                raise
+            task = asyncio.create_task(self._process(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _process(self, batch: List[WhisperItem]) -> None:
+        try:
+            items = [samples for samples, _ in batch]
+            try:
+                texts = await self._run(_with_model, self._model, transcribe_batch, items,
+                                        self.language, self.beam_size)
+            except Exception as e:
+                logger.error(f"Ошибка пакетной транскрибации, обрабатываю по одной: {e}")
+                self.fallbacks += 1
+                texts = []
+                for samples, future in batch:
+                    try:
+                        texts.append(await self._run(_with_model, self._model, transcribe_one,
+                                                     samples, self.language, self.beam_size))
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                        texts.append(None)
+
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _fail(batch: List[WhisperItem]) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Очередь Whisper остановлена"))
+
+    def stats(self) -> Dict[str, Any]:
+        """Достигнутые размеры пакетов"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": self.items / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "fallbacks": self.fallbacks
+        }
+
+    async def close(self) -> None:
+        """
+        Дожидается обработки текущих пакетов и останавливает очередь.
+        Записи, которые еще не попали в пакет, завершаются ошибкой,
+        чтобы ожидающие их вызовы не зависли
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        waiting = []
+        while not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        self._fail(waiting)
+        logger.info(f"Статистика пакетов Whisper: {self.stats()}")
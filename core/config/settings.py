@@ -1,33 +1,102 @@
-from typing import Optional
+import os
 from environs import Env
 from dataclasses import dataclass, field
-from vosk import Model
-import speech_recognition as sr
-from faster_whisper import WhisperModel
-import subprocess
-
-def get_ffmpeg_path() -> str:
-    """Получает путь к ffmpeg при запуске бота"""
-    try:
-        result = subprocess.run(['where', 'ffmpeg'], 
-                              capture_output=True, 
-                              text=True, 
-                              check=True)
-        ffmpeg_path = result.stdout.strip().split('\n')[0]  # Берем первый путь
-        print(f"Found ffmpeg at: {ffmpeg_path}")
-        return ffmpeg_path
-    except Exception as e:
-        print(f"Error finding ffmpeg: {e}")
-        return 'ffmpeg'  # Возвращаем просто 'ffmpeg' если не удалось найти путь
 
 @dataclass
 class Bots:
     bot_token: str
     admin_id: int
-    google_model: Optional[sr.Recognizer] = None
-    whisper: Optional[WhisperModel] = None
-    vosk_model: Optional[Model] = None
-    ffmpeg_path: str = r"C:\ProgramData\chocolatey\bin\ffmpeg.exe"  # Фиксированный путь
+
+@dataclass
+class Models:
+    """Параметры моделей распознавания, загружаются лениво через core.backend.models"""
+    whisper_size: str = "small"
+    whisper_device: str = "cpu"
+    whisper_compute_type: str = "int8"
+    vosk_path: str = "model/vosk-model-small-ru-0.22"
+    preload: bool = True  # Загружать модели в фоне сразу после запуска бота
+
+@dataclass
+class Inference:
+    """Параметры пула выполнения моделей распознавания"""
+    # Потоки для моделей, отпускающих GIL, и сетевых запросов Google
+    threads: int = min(32, (os.cpu_count() or 1) + 4)
+    processes: int = 0  # Размер пула процессов, 0 - не использовать
+    process_engines: tuple = ()  # Движки, выполняемые в пуле процессов
+    # Максимум одновременных вызовов каждого движка
+    whisper_concurrency: int = 2
+    vosk_concurrency: int = os.cpu_count() or 4
+    google_concurrency: int = 8
+    ffmpeg_concurrency: int = os.cpu_count() or 4  # Одновременных декодирований
+    ffmpeg_path: str = ""  # Пусто - ищется в PATH при запуске
+    decode_fallback: bool = True  # Без ffmpeg декодировать Opus через libsndfile
+    # Микро-батчинг Whisper: больше пакет - выше пропускная способность,
+    # больше ожидание - выше задержка одиночного запроса
+    whisper_max_batch: int = 8
+    whisper_max_wait: float = 0.05
+    whisper_beam_size: int = 5
+
+@dataclass
+class Recognition:
+    """Параметры конвейера распознавания"""
+    engines: tuple = ('whisper', 'google', 'vosk')  # Движки в порядке вывода
+    deadline: float = 30.0  # Секунды ожидания самого медленного движка
+    # Ограничение одного вызова движка; сетевые движки ждут меньше.
+    # Превышение считает предохранитель, поэтому значение меньше deadline,
+    # а нехватка времени конвейера ошибкой движка не считается
+    engine_timeout: float = 20.0
+    network_timeout: float = 10.0
+    # После breaker_failures ошибок подряд движок отключается на breaker_reset секунд
+    breaker_failures: int = 3
+    breaker_reset: float = 60.0
+    # Каскад для записи команд: ступени запускаются по очереди, пока
+    # схожесть с описанием команды не достигнет порога (в процентах)
+    cascade: bool = True
+    cascade_stages: tuple = (('vosk',), ('whisper', 'google'))
+    cascade_threshold: float = 80.0
+    # Vosk с грамматикой из описаний активных команд:
+    # off - не использовать, alongside - вместе с открытым Vosk, instead - вместо него
+    vosk_grammar: str = 'alongside'
+    # Кэш расшифровок по file_unique_id: повторная запись не запускает движки
+    cache: bool = True
+    cache_size: int = 100000  # Строк в таблице transcription_cache
+    voice_max_bytes: int = 20 * 1024 * 1024  # Больше Bot API все равно не отдает
+
+@dataclass
+class Vad:
+    """Обрезка тишины перед распознаванием по энергии кадров"""
+    enabled: bool = True
+    frame_ms: int = 30
+    min_level_db: float = -45.0  # Кадры тише этого уровня (dBFS) всегда считаются тишиной
+    noise_margin_db: float = 10.0  # Насколько речь громче фонового шума записи
+    padding: float = 0.25  # Секунды, оставляемые до и после речи
+    min_speech: float = 0.2  # Меньше речи - запись отклоняется
+    max_duration: float = 60.0  # Длиннее (после обрезки) - запись отклоняется
+
+@dataclass
+class Jobs:
+    """Параметры очереди заданий распознавания"""
+    lease_seconds: float = 120.0  # Аренда задания, продлевается пока рабочий жив
+    max_attempts: int = 3  # После стольких неудачных попыток задание помечается failed
+    retry_backoff: float = 5.0  # Пауза перед повтором после ошибки, удваивается с каждой попыткой
+    poll_interval: float = 1.0  # Пауза рабочего при пустой очереди
+    bot_workers: int = 1  # Рабочие внутри процесса бота, 0 - только отдельные процессы
+    # Заданий одновременно у одного рабочего; 0 - столько, чтобы заполнить
+    # пакеты Whisper: whisper_concurrency * whisper_max_batch
+    concurrency: int = 0
+    http_host: str = "127.0.0.1"  # Адрес HTTP-сервера заданий в процессе бота
+    http_port: int = 0  # 0 - сервер заданий выключен, рабочие работают с базой напрямую
+    http_secret: str = ""  # Общий токен рабочих, пустой - без проверки (только для loopback)
+    catalog_refresh: float = 30.0  # Как часто отдельный процесс перечитывает каталог команд
+    notify_retry: float = 60.0  # Пауза перед повторной отправкой недоставленного результата
+
+@dataclass
+class Scratch:
+    """Временные файлы, которым не хватает памяти (например, выгрузки)"""
+    root: str = ""  # Пусто - /dev/shm, если есть, иначе системный каталог временных файлов
+    max_bytes: int = 256 * 1024 * 1024  # Общий объем временных каталогов
+    max_age: float = 3600.0  # Каталоги старше этого удаляются чистильщиком
+    sweep_interval: float = 600.0
 
 @dataclass
 class Emoji:
@@ -65,6 +134,12 @@ class Emoji:
 @dataclass
 class Settings:
     bots: Bots
+    models: Models = field(default_factory=Models)
+    inference: Inference = field(default_factory=Inference)
+    recognition: Recognition = field(default_factory=Recognition)
+    vad: Vad = field(default_factory=Vad)
+    jobs: Jobs = field(default_factory=Jobs)
+    scratch: Scratch = field(default_factory=Scratch)
 
 def get_settings(path: str):
     env = Env()
@@ -72,12 +147,78 @@ def get_settings(path: str):
 
     return Settings(
         bots=Bots(
-            bot_token=env.str("BOT_TOKEN"),
-            admin_id=1175574901,
-            whisper=WhisperModel("small", device="cpu", compute_type="int8"),
-            google_model=sr.Recognizer(),
-            vosk_model=Model("model/vosk-model-small-ru-0.22")
-            # ffmpeg_path будет использовать значение по умолчанию
+            # Рабочим на других машинах токен не нужен: Telegram обслуживает бот
+            bot_token=env.str("BOT_TOKEN", ""),
+            admin_id=1175574901
+        ),
+        models=Models(
+            whisper_size=env.str("WHISPER_MODEL", Models.whisper_size),
+            whisper_device=env.str("WHISPER_DEVICE", Models.whisper_device),
+            whisper_compute_type=env.str("WHISPER_COMPUTE_TYPE", Models.whisper_compute_type),
+            vosk_path=env.str("VOSK_MODEL_PATH", Models.vosk_path),
+            preload=env.bool("PRELOAD_MODELS", Models.preload)
+        ),
+        inference=Inference(
+            threads=env.int("INFERENCE_THREADS", Inference.threads),
+            processes=env.int("INFERENCE_PROCESSES", Inference.processes),
+            process_engines=tuple(env.list("INFERENCE_PROCESS_ENGINES", [])),
+            whisper_concurrency=env.int("WHISPER_CONCURRENCY", Inference.whisper_concurrency),
+            vosk_concurrency=env.int("VOSK_CONCURRENCY", Inference.vosk_concurrency),
+            google_concurrency=env.int("GOOGLE_CONCURRENCY", Inference.google_concurrency),
+            ffmpeg_concurrency=env.int("FFMPEG_CONCURRENCY", Inference.ffmpeg_concurrency),
+            ffmpeg_path=env.str("FFMPEG_PATH", Inference.ffmpeg_path),
+            decode_fallback=env.bool("DECODE_FALLBACK", Inference.decode_fallback),
+            whisper_max_batch=env.int("WHISPER_MAX_BATCH", Inference.whisper_max_batch),
+            whisper_max_wait=env.float("WHISPER_MAX_WAIT", Inference.whisper_max_wait),
+            whisper_beam_size=env.int("WHISPER_BEAM_SIZE", Inference.whisper_beam_size)
+        ),
+        recognition=Recognition(
+            engines=tuple(env.list("RECOGNITION_ENGINES", list(Recognition.engines))),
+            deadline=env.float("RECOGNITION_DEADLINE", Recognition.deadline),
+            engine_timeout=env.float("RECOGNITION_ENGINE_TIMEOUT", Recognition.engine_timeout),
+            network_timeout=env.float("RECOGNITION_NETWORK_TIMEOUT", Recognition.network_timeout),
+            breaker_failures=env.int("ENGINE_BREAKER_FAILURES", Recognition.breaker_failures),
+            breaker_reset=env.float("ENGINE_BREAKER_RESET", Recognition.breaker_reset),
+            cascade=env.bool("RECOGNITION_CASCADE", Recognition.cascade),
+            # Ступени через ";", движки внутри ступени через ",": vosk;whisper,google
+            cascade_stages=tuple(
+                tuple(stage.split(','))
+                for stage in env.str("RECOGNITION_CASCADE_STAGES",
+                                       ';'.join(','.join(stage) for stage in Recognition.cascade_stages)).split(';')
+            ),
+            cascade_threshold=env.float("RECOGNITION_CASCADE_THRESHOLD", Recognition.cascade_threshold),
+            vosk_grammar=env.str("VOSK_GRAMMAR", Recognition.vosk_grammar),
+            cache=env.bool("TRANSCRIPTION_CACHE", Recognition.cache),
+            cache_size=env.int("TRANSCRIPTION_CACHE_SIZE", Recognition.cache_size),
+            voice_max_bytes=env.int("VOICE_MAX_BYTES", Recognition.voice_max_bytes)
+        ),
+        vad=Vad(
+            enabled=env.bool("VAD", Vad.enabled),
+            frame_ms=env.int("VAD_FRAME_MS", Vad.frame_ms),
+            min_level_db=env.float("VAD_MIN_LEVEL_DB", Vad.min_level_db),
+            noise_margin_db=env.float("VAD_NOISE_MARGIN_DB", Vad.noise_margin_db),
+            padding=env.float("VAD_PADDING", Vad.padding),
+            min_speech=env.float("VAD_MIN_SPEECH", Vad.min_speech),
+            max_duration=env.float("VAD_MAX_DURATION", Vad.max_duration)
+        ),
+        jobs=Jobs(
+            lease_seconds=env.float("JOB_LEASE_SECONDS", Jobs.lease_seconds),
+            max_attempts=env.int("JOB_MAX_ATTEMPTS", Jobs.max_attempts),
+            retry_backoff=env.float("JOB_RETRY_BACKOFF", Jobs.retry_backoff),
+            poll_interval=env.float("JOB_POLL_INTERVAL", Jobs.poll_interval),
+            bot_workers=env.int("BOT_RECOGNITION_WORKERS", Jobs.bot_workers),
+            concurrency=env.int("JOB_CONCURRENCY", Jobs.concurrency),
+            http_host=env.str("JOB_HTTP_HOST", Jobs.http_host),
+            http_port=env.int("JOB_HTTP_PORT", Jobs.http_port),
+            http_secret=env.str("JOB_HTTP_SECRET", Jobs.http_secret),
+            catalog_refresh=env.float("JOB_CATALOG_REFRESH", Jobs.catalog_refresh),
+            notify_retry=env.float("JOB_NOTIFY_RETRY", Jobs.notify_retry)
+        ),
+        scratch=Scratch(
+            root=env.str("SCRATCH_DIR", Scratch.root),
+            max_bytes=env.int("SCRATCH_MAX_BYTES", Scratch.max_bytes),
+            max_age=env.float("SCRATCH_MAX_AGE", Scratch.max_age),
+            sweep_interval=env.float("SCRATCH_SWEEP_INTERVAL", Scratch.sweep_interval)
         )
     )
 
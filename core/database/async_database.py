@@ -0,0 +1,96 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from core.database.database import Database
+from core.database.write_queue import WriteQueue
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад над Database.
+    Запросы выполняются в выделенном пуле потоков, поэтому обращение к SQLite
+    не блокирует цикл событий. Имена методов совпадают с Database:
+    await db.get_pending_commands(user_id)
+    """
+    # Методы, не обращающиеся к базе, вызываются напрямую
+    SYNC_METHODS = {'sorensen_dice_similarity', 'cache_stats', 'reload_catalog'}
+
+    def __init__(self, db: Database, max_workers: int = None,
+                 write_batch_size: int = 64, write_batch_delay: float = 0.005):
+        self.db = db
+        # Потоков столько же, сколько соединений: читатели плюс писатель
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or db._readers_count + 1,
+            thread_name_prefix='database'
+        )
+        # Частые одиночные записи фиксируются пакетами
+        self.write_queue = WriteQueue(
+            self.run,
+            {
+                'update_recording_status': db.update_recording_statuses,
+                'enqueue_recognition_job': db.enqueue_recognition_jobs,
+                'complete_recognition_job': db.complete_recognition_jobs,
+            },
+            max_batch=write_batch_size,
+            max_delay=write_batch_delay
+        )
+
+    async def run(self, func, *args, **kwargs) -> Any:
+        """Выполняет синхронную функцию в пуле потоков базы данных"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def update_recording_status(self, recording_id: int, status: str, points: int = 0) -> bool:
+        """Обновляет статус записи через очередь групповой записи"""
+        return await self.write_queue.submit('update_recording_status', recording_id, status, points)
+
+    async def enqueue_recognition_job(self, user_id: int, chat_id: int, command_id: int,
+                                      voice_file_id: str, voice_file_unique_id: str = None) -> Optional[int]:
+        """Ставит запись в очередь распознавания через очередь групповой записи"""
+        return await self.write_queue.submit(
+            'enqueue_recognition_job', user_id, chat_id, command_id, voice_file_id, voice_file_unique_id
+        )
+
+    async def complete_recognition_job(self, job_id: int, worker_id: str, transcript: str,
+                                       report: str = None) -> Optional[int]:
+        """Закрывает задание распознавания через очередь групповой записи"""
+        return await self.write_queue.submit('complete_recognition_job', job_id, worker_id, transcript, report)
+
+    async def run_in_transaction(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполняет func(cur, *args, **kwargs) в одной транзакции записи в пуле
+        потоков базы данных и возвращает ее результат
+        """
+        def call():
+            with self.db.transaction() as cur:
+                return func(cur, *args, **kwargs)
+
+        return await self.run(call)
+
+    def transaction(self):
+        """
+        Контекстный менеджер Database держит блокировку записи, пока открыт
+        блок, поэтому в асинхронном коде его заменяет run_in_transaction
+        """
+        raise TypeError("AsyncDatabase.transaction недоступен, используйте run_in_transaction")
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.db, name)
+        if name.startswith('_') or name in self.SYNC_METHODS or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        # Кэшируем обертку, чтобы не создавать ее при каждом вызове
+        setattr(self, name, method)
+        return method
+
+    async def close(self) -> None:
+        """Дожидается завершения запросов и закрывает соединения"""
+        await self.write_queue.close()
+        await self.run(self.db.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш с ограниченным временем жизни записей.
+    Ведет счетчики попаданий и промахов.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Растет при каждой инвалидации. Значение, прочитанное из базы до
+        # инвалидации, не должно попасть в кэш после нее
+        self._generation = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any, int]:
+        """
+        Возвращает (найдено, значение, поколение).
+        Поколение передается в set после чтения из базы
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value, self._generation
+                del self._data[key]
+            self.misses += 1
+            return False, None, self._generation
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        """Сохраняет значение, если с момента get не было инвалидаций"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,17 @@
+from typing import Any, Dict, List
+
+
+class CommandCatalog:
+    """
+    Снимок таблицы commands в памяти.
+    Таблица маленькая и меняется редко, поэтому загружается целиком;
+    version - номер изменения каталога, с которым снимок был загружен
+    """
+
+    def __init__(self, commands: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.commands = commands  # В порядке created_at DESC, как в get_all_commands
+        self.by_id = {cmd["id"]: cmd for cmd in commands}
+        self.by_tag = {cmd["tag"]: cmd for cmd in commands}
+        # Готовый список активных команд для построения клавиатур
+        self.active = [cmd for cmd in commands if cmd["is_active"]]
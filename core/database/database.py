@@ -1,125 +1,175 @@
 import sqlite3
-from typing import Optional, Dict, Any, List
+import threading
+import time
+from contextlib import contextmanager
+from queue import Queue
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 from core.config.settings import settings  # Добавим импорт настроек
+from core.database import migrations
+from core.database.cache import LRUCache
+from core.database.catalog import CommandCatalog
 
 class Database:
-    def __init__(self, db_file: str):
+    # Настройки, применяемые к каждому соединению
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",  # В режиме WAL fsync только на чекпоинтах
+        "PRAGMA cache_size = -32000",  # ~32 МБ страничного кэша на соединение
+        "PRAGMA mmap_size = 268435456",  # 256 МБ отображаемой в память БД
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA busy_timeout = 5000",
+    )
+
+    # Как часто (в записях) проверять размер кэша расшифровок
+    TRANSCRIPTION_EVICT_EVERY = 64
+
+    # Столбцы recognition_jobs в порядке выборки
+    JOB_FIELDS = (
+        'id', 'user_id', 'chat_id', 'command_id', 'voice_file_id',
+        'voice_file_unique_id', 'status', 'attempts', 'lease_owner',
+        'lease_expires_at', 'error', 'user_command_id', 'available_at', 'report',
+        'notified_at'
+    )
+
+    def __init__(self, db_file: str, readers: int = 4,
+                 user_cache_size: int = 4096, user_cache_ttl: float = 300.0,
+                 transcription_cache_size: int = 100000):
         self.db_file = db_file
         self.admin_id = settings.bots.admin_id  # Сохраним admin_id
+
+        # Кэш расшифровок ограничен по числу строк
+        self.transcription_cache_size = transcription_cache_size
+        self._transcription_writes = 0
+
+        # Кэш записей пользователей вместе с ролями. Запись сбрасывается
+        # при любом изменении пользователя через Database
+        self._user_cache = LRUCache(user_cache_size, user_cache_ttl)
+
+        # Каталог команд загружается при первом обращении и перечитывается,
+        # когда изменение команд увеличивает номер версии
+        self._catalog: Optional[CommandCatalog] = None
+        self._catalog_version = 0
+
+        # Одно соединение на запись и пул соединений на чтение.
+        # Для базы в памяти читатели не видят данных писателя, поэтому
+        # все запросы идут через соединение записи.
+        self._write_lock = threading.RLock()
+        self._tx_depth = 0
+        self._writer = self._connect()
+        self._readers_count = 0 if db_file == ':memory:' else readers
+        self._readers: Queue = Queue()
+        for _ in range(self._readers_count):
+            self._readers.put(self._connect())
+
         self.create_tables()
 
-    def create_tables(self):
-        conn = sqlite3.connect(self.db_file)
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает долгоживущее соединение с настроенными PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_file,
+            check_same_thread=False,
+            isolation_level=None  # Транзакциями управляем сами
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Транзакция на соединении записи.
+        Вложенные вызовы используют внешнюю транзакцию, фиксация
+        происходит при выходе из самого внешнего блока, откат - при исключении.
+        """
+        with self._write_lock:
+            cur = self._writer.cursor()
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield cur
+                finally:
+                    self._tx_depth -= 1
+                    cur.close()
+                return
+
+            cur.execute("BEGIN IMMEDIATE")
+            self._tx_depth = 1
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            else:
+                cur.execute("COMMIT")
+            finally:
+                self._tx_depth = 0
+                cur.close()
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Cursor]:
+        """Курсор на свободном соединении из пула чтения"""
+        if not self._readers_count:
+            with self._write_lock:
+                cur = self._writer.cursor()
+                try:
+                    yield cur
+                finally:
+                    cur.close()
+            return
+
+        conn = self._readers.get()
         cur = conn.cursor()
-        
-        # Проверяем существование таблиц
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-        users_exists = cur.fetchone() is not None
-        
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='roles'")
-        roles_exists = cur.fetchone() is not None
-
-        # Сохраняем данные пользователей если нужно
-        old_users = []
-        if users_exists:
-            cur.execute("""SELECT telegram_id, username, display_name, email, 
-                        organization, social_link, registration_date, points, role_id 
-                        FROM users""")
-            old_users = cur.fetchall()
-            cur.execute("DROP TABLE users")
-        
-        # Удаляем старую таблицу ролей
-        if roles_exists:
-            cur.execute("DROP TABLE roles")
+        try:
+            yield cur
+        finally:
+            cur.close()
+            self._readers.put(conn)
 
-        # Создаем таблицу ролей с display_name
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS roles (
-            id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL,
-            display_name TEXT NOT NULL
-        )
-        """)
-        
-        # Добавляем базовые роли с отображаемыми именами
-        cur.execute("""
-            INSERT OR IGNORE INTO roles (id, name, display_name) 
-            VALUES 
-                (1, 'user', 'Пользователь'),
-                (2, 'admin', 'Администратор')
-        """)
-        
-        # Создаем новую таблицу пользователей
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            telegram_id INTEGER PRIMARY KEY,
-            username TEXT,
-            display_name TEXT,
-            email TEXT,
-            organization TEXT,
-            social_link TEXT,
-            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            points INTEGER DEFAULT 0,
-            role_id INTEGER DEFAULT 1,
-            FOREIGN KEY (role_id) REFERENCES roles(id)
-        )
-        """)
+    def close(self) -> None:
+        """Закрывает все соединения с базой данных"""
+        with self._write_lock:
+            self._writer.close()
+        for _ in range(self._readers_count):
+            self._readers.get().close()
 
-        # Восстанавливаем данные пользователей
-        if old_users:
-            for user in old_users:
-                # Проверяем, является ли пользователь админом
-                role_id = user[8] if len(user) > 8 else (2 if user[0] == self.admin_id else 1)
-                cur.execute("""
-                    INSERT INTO users (
-                        telegram_id, username, display_name, email, 
-                        organization, social_link, registration_date, points, role_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (*user[:8], role_id))  # Используем сохраненный role_id или определяем по admin_id
-        
-        # Создаем таблицу команд
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS commands (
-            id INTEGER PRIMARY KEY,
-            tag TEXT UNIQUE NOT NULL,
-            description TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE
-        )
-        """)
-        
-        # Создаем таблицу выполненных команд пользователями (без удаления)
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_commands (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            command_id INTEGER,
-            voice_file_id TEXT,
-            transcript TEXT,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(telegram_id),
-            FOREIGN KEY (command_id) REFERENCES commands(id)
-        )
-        """)
-        
-        conn.commit()
-        conn.close()
+    def create_tables(self):
+        """
+        Приводит схему к актуальной версии.
+        Для новой или уже обновленной базы это одна проверка версии.
+        """
+        with self._read() as cur:
+            version = migrations.get_schema_version(cur)
+        if version >= migrations.LATEST_VERSION:
+            return
+
+        with self.transaction() as cur:
+            applied = migrations.apply_migrations(cur)
+        if applied:
+            print(f"Applied schema migrations: {applied}")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов кэшей"""
+        return {"users": self._user_cache.stats()}
 
     def get_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT users.*, COALESCE(roles.display_name, 'Пользователь') as role_display_name,
-                   roles.name as role_name
-            FROM users 
-            LEFT JOIN roles ON users.role_id = roles.id 
-            WHERE telegram_id = ?
-        """, (telegram_id,))
-        user = cur.fetchone()
+        found, user, generation = self._user_cache.get(telegram_id)
+        if found:
+            return dict(user) if user else None
         
-        conn.close()
+        user = self._fetch_user(telegram_id)
+        self._user_cache.set(telegram_id, user, generation)
+        return dict(user) if user else None
+
+    def _fetch_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        with self._read() as cur:
+            cur.execute("""
+                SELECT users.*, COALESCE(roles.display_name, 'Пользователь') as role_display_name,
+                       roles.name as role_name
+                FROM users 
+                LEFT JOIN roles ON users.role_id = roles.id 
+                WHERE telegram_id = ?
+            """, (telegram_id,))
+            user = cur.fetchone()
         
         if user:
             return {
@@ -141,63 +191,47 @@ class Database:
         Создает нового пользователя.
         Если telegram_id совпадает с admin_id из настроек, назначает роль админа
         """
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         # Определяем роль: 2 для админа, 1 для обычного пользователя
         role_id = 2 if telegram_id == self.admin_id else 1
         
-        # Проверяем, существует ли пользователь
-        cur.execute("SELECT role_id FROM users WHERE telegram_id = ?", (telegram_id,))
-        existing_user = cur.fetchone()
-        
-        if existing_user:
-            # Если пользователь существует, обновляем его роль
-            if telegram_id == self.admin_id and existing_user[0] != 2:
+        with self.transaction() as cur:
+            # Проверяем, существует ли пользователь
+            cur.execute("SELECT role_id FROM users WHERE telegram_id = ?", (telegram_id,))
+            existing_user = cur.fetchone()
+            
+            if existing_user:
+                # Если пользователь существует, обновляем его роль
+                if telegram_id == self.admin_id and existing_user[0] != 2:
+                    cur.execute(
+                        "UPDATE users SET role_id = 2 WHERE telegram_id = ?",
+                        (telegram_id,)
+                    )
+            else:
+                # Создаем нового пользователя
                 cur.execute(
-                    "UPDATE users SET role_id = 2 WHERE telegram_id = ?",
-                    (telegram_id,)
+                    "INSERT INTO users (telegram_id, username, role_id) VALUES (?, ?, ?)",
+                    (telegram_id, username, role_id)
                 )
-        else:
-            # Создаем нового пользователя
-            cur.execute(
-                "INSERT INTO users (telegram_id, username, role_id) VALUES (?, ?, ?)",
-                (telegram_id, username, role_id)
-            )
-        
-        conn.commit()
-        conn.close()
+        self._user_cache.invalidate(telegram_id)
 
     def update_user(self, telegram_id: int, **kwargs) -> None:
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         fields = ", ".join([f"{k} = ?" for k in kwargs.keys()])
         values = tuple(kwargs.values()) + (telegram_id,)
         
-        cur.execute(f"UPDATE users SET {fields} WHERE telegram_id = ?", values)
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cur:
+            cur.execute(f"UPDATE users SET {fields} WHERE telegram_id = ?", values)
+        self._user_cache.invalidate(telegram_id)
 
     def delete_user(self, telegram_id: int) -> None:
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("DELETE FROM users WHERE telegram_id = ?", (telegram_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cur:
+            cur.execute("DELETE FROM users WHERE telegram_id = ?", (telegram_id,))
+        self._user_cache.invalidate(telegram_id)
 
     def get_all_users(self) -> List[Dict[str, Any]]:
         """Получает список всех пользователей из базы данных"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("SELECT * FROM users")
-        users = cur.fetchall()
-        
-        conn.close()
+        with self._read() as cur:
+            cur.execute("SELECT * FROM users")
+            users = cur.fetchall()
         
         return [
             {
@@ -215,13 +249,9 @@ class Database:
 
     def set_admin_role(self, telegram_id: int) -> None:
         """Устанавливает роль администратора для пользователя"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("UPDATE users SET role_id = 2 WHERE telegram_id = ?", (telegram_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cur:
+            cur.execute("UPDATE users SET role_id = 2 WHERE telegram_id = ?", (telegram_id,))
+        self._user_cache.invalidate(telegram_id)
 
     def is_admin(self, telegram_id: int) -> bool:
         """Проверяет, является ли пользователь администратором"""
@@ -230,35 +260,52 @@ class Database:
 
     def add_command(self, tag: str, description: str) -> bool:
         """Добавляет новую команду"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "INSERT INTO commands (tag, description) VALUES (?, ?)",
-                (tag.lower(), description)
-            )
-            conn.commit()
+            with self.transaction() as cur:
+                cur.execute(
+                    "INSERT INTO commands (tag, description) VALUES (?, ?)",
+                    (tag.lower(), description)
+                )
+            self._bump_catalog_version()
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
 
-    def get_all_commands(self) -> List[Dict[str, Any]]:
-        """Получает список всех команд"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT id, tag, description, created_at, is_active 
-            FROM commands 
-            ORDER BY created_at DESC
-        """)
-        commands = cur.fetchall()
-        
-        conn.close()
+    def _bump_catalog_version(self) -> None:
+        """Помечает каталог команд устаревшим"""
+        with self._write_lock:
+            self._catalog_version += 1
+
+    def reload_catalog(self) -> None:
+        """
+        Перечитывает каталог при следующем обращении. Нужен процессам, которые
+        не видят изменений команд, сделанных через Database другого процесса
+        """
+        self._bump_catalog_version()
+
+    @property
+    def catalog_version(self) -> int:
+        """Номер версии каталога команд, растет при каждом изменении команд"""
+        return self._catalog_version
+
+    def _get_catalog(self) -> CommandCatalog:
+        """Возвращает актуальный каталог команд, при необходимости перечитывая таблицу"""
+        catalog = self._catalog
+        if catalog is not None and catalog.version == self._catalog_version:
+            return catalog
+        
+        # Версию запоминаем до чтения: если команды изменятся во время
+        # загрузки, снимок останется устаревшим и будет перечитан
+        version = self._catalog_version
+        with self._read() as cur:
+            cur.execute("""
+                SELECT id, tag, description, created_at, is_active 
+                FROM commands 
+                ORDER BY created_at DESC
+            """)
+            commands = cur.fetchall()
         
-        return [
+        catalog = CommandCatalog([
             {
                 "id": cmd[0],
                 "tag": cmd[1],
@@ -267,63 +314,54 @@ class Database:
                 "is_active": bool(cmd[4])
             }
             for cmd in commands
-        ]
+        ], version)
+        self._catalog = catalog
+        return catalog
+
+    def get_all_commands(self) -> List[Dict[str, Any]]:
+        """Получает список всех команд"""
+        return [dict(cmd) for cmd in self._get_catalog().commands]
+
+    def get_active_commands(self) -> List[Dict[str, Any]]:
+        """Получает список активных команд"""
+        return [dict(cmd) for cmd in self._get_catalog().active]
 
     def delete_command(self, command_id: int) -> bool:
         """Удаляет команду"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("DELETE FROM commands WHERE id = ?", (command_id,))
-        deleted = cur.rowcount > 0
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as cur:
+            cur.execute("DELETE FROM commands WHERE id = ?", (command_id,))
+            deleted = cur.rowcount > 0
+        self._bump_catalog_version()
         
         return deleted
 
     def get_command_by_tag(self, tag: str) -> Optional[Dict[str, Any]]:
         """Получает команду по тегу"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute(
-            "SELECT id, tag, description, created_at, is_active FROM commands WHERE tag = ?",
-            (tag.lower(),)
-        )
-        cmd = cur.fetchone()
-        
-        conn.close()
-        
-        if cmd:
-            return {
-                "id": cmd[0],
-                "tag": cmd[1],
-                "description": cmd[2],
-                "created_at": cmd[3],
-                "is_active": bool(cmd[4])
-            }
-        return None
+        cmd = self._get_catalog().by_tag.get(tag.lower())
+        return dict(cmd) if cmd else None
 
     def get_pending_commands(self, user_id: int) -> List[Dict[str, Any]]:
         """Получает список команд, которые пользователь еще не выполнил"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT c.id, c.tag, c.description 
-            FROM commands c
-            WHERE c.is_active = TRUE 
-            AND NOT EXISTS (
-                SELECT 1 FROM user_commands uc 
-                WHERE uc.command_id = c.id 
-                AND uc.user_id = ?
-            )
-            ORDER BY c.created_at DESC
-        """, (user_id,))
-        
-        commands = cur.fetchall()
-        conn.close()
+        with self._read() as cur:
+            cur.execute("""
+                SELECT c.id, c.tag, c.description 
+                FROM commands c
+                WHERE c.is_active = TRUE 
+                AND NOT EXISTS (
+                    SELECT 1 FROM user_commands uc 
+                    WHERE uc.command_id = c.id 
+                    AND uc.user_id = ?
+                )
+                AND NOT EXISTS (
+                    -- Запись уже отправлена и ждет распознавания
+                    SELECT 1 FROM recognition_jobs j
+                    WHERE j.command_id = c.id
+                    AND j.user_id = ?
+                    AND j.status IN ('queued', 'running')
+                )
+                ORDER BY c.created_at DESC
+            """, (user_id, user_id))
+            commands = cur.fetchall()
         
         return [
             {
@@ -334,48 +372,71 @@ class Database:
             for cmd in commands
         ]
 
+    def next_pending_command(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получает первую команду, которую пользователь еще не выполнил"""
+        with self._read() as cur:
+            cur.execute("""
+                SELECT c.id, c.tag, c.description 
+                FROM commands c
+                WHERE c.is_active = TRUE 
+                AND NOT EXISTS (
+                    SELECT 1 FROM user_commands uc 
+                    WHERE uc.command_id = c.id 
+                    AND uc.user_id = ?
+                )
+                AND NOT EXISTS (
+                    -- Запись уже отправлена и ждет распознавания
+                    SELECT 1 FROM recognition_jobs j
+                    WHERE j.command_id = c.id
+                    AND j.user_id = ?
+                    AND j.status IN ('queued', 'running')
+                )
+                ORDER BY c.created_at DESC
+                LIMIT 1
+            """, (user_id, user_id))
+            cmd = cur.fetchone()
+        
+        if cmd:
+            return {
+                "id": cmd[0],
+                "tag": cmd[1],
+                "description": cmd[2]
+            }
+        return None
+
     def add_user_command(self, user_id: int, command_id: int, voice_file_id: str, transcript: str) -> bool:
         """Добавляет выполненную пользователем команду"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         try:
-            cur.execute("""
-                INSERT INTO user_commands (
-                    user_id, command_id, voice_file_id, 
-                    transcript, status
-                )
-                VALUES (?, ?, ?, ?, 'pending')
-            """, (user_id, command_id, voice_file_id, transcript))
-            conn.commit()
+            with self.transaction() as cur:
+                cur.execute("""
+                    INSERT INTO user_commands (
+                        user_id, command_id, voice_file_id, 
+                        transcript, status
+                    )
+                    VALUES (?, ?, ?, ?, 'pending')
+                """, (user_id, command_id, voice_file_id, transcript))
             return True
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return False
-        finally:
-            conn.close()
 
     def get_user_commands(self, user_id: int) -> List[Dict[str, Any]]:
         """Получает список выполненных пользователем команд"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                c.tag, 
-                c.description, 
-                uc.voice_file_id, 
-                uc.created_at, 
-                uc.status,
-                uc.transcript
-            FROM user_commands uc
-            JOIN commands c ON c.id = uc.command_id
-            WHERE uc.user_id = ?
-            ORDER BY uc.created_at DESC
-        """, (user_id,))
-        
-        commands = cur.fetchall()
-        conn.close()
+        with self._read() as cur:
+            cur.execute("""
+                SELECT 
+                    c.tag, 
+                    c.description, 
+                    uc.voice_file_id, 
+                    uc.created_at, 
+                    uc.status,
+                    uc.transcript
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                WHERE uc.user_id = ?
+                ORDER BY uc.created_at DESC
+            """, (user_id,))
+            commands = cur.fetchall()
         
         return [
             {
@@ -389,123 +450,222 @@ class Database:
             for cmd in commands
         ]
 
-    def get_command_by_id(self, command_id: int) -> Optional[Dict[str, Any]]:
-        """Получает команду по ID"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute(
-            "SELECT id, tag, description, created_at, is_active FROM commands WHERE id = ?",
-            (command_id,)
-        )
-        cmd = cur.fetchone()
-        
-        conn.close()
-        
-        if cmd:
-            return {
+    def iter_user_commands(
+        self, user_id: int, page_size: int = 10, cursor: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Постранично получает записи пользователя, от новых к старым.
+        cursor - ID последней записи предыдущей страницы. Возвращает записи
+        страницы и курсор следующей страницы (None, если страница последняя)
+        """
+        after = ""
+        params: Tuple = (user_id,)
+        if cursor is not None:
+            after = """
+                AND (uc.created_at, uc.id) < (
+                    SELECT created_at, id FROM user_commands WHERE id = ?
+                )
+            """
+            params += (cursor,)
+        
+        with self._read() as cur:
+            # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+            cur.execute(f"""
+                SELECT 
+                    uc.id,
+                    c.tag, 
+                    c.description, 
+                    uc.voice_file_id, 
+                    uc.created_at, 
+                    uc.status,
+                    uc.transcript
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                WHERE uc.user_id = ? {after}
+                ORDER BY uc.created_at DESC, uc.id DESC
+                LIMIT ?
+            """, params + (page_size + 1,))
+            commands = cur.fetchall()
+        
+        page = [
+            {
                 "id": cmd[0],
                 "tag": cmd[1],
                 "description": cmd[2],
-                "created_at": cmd[3],
-                "is_active": bool(cmd[4])
+                "voice_file_id": cmd[3],
+                "created_at": cmd[4],
+                "status": cmd[5],
+                "transcript": cmd[6]
             }
-        return None
+            for cmd in commands[:page_size]
+        ]
+        next_cursor = page[-1]["id"] if len(commands) > page_size else None
+        return page, next_cursor
+
+    def get_command_by_id(self, command_id: int) -> Optional[Dict[str, Any]]:
+        """Получает команду по ID"""
+        cmd = self._get_catalog().by_id.get(command_id)
+        return dict(cmd) if cmd else None
 
     def get_pending_recordings(self) -> List[Dict[str, Any]]:
         """Получает список всех записей, ожидающих проверки"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                uc.id, uc.user_id, uc.voice_file_id, uc.voice_path,
-                uc.transcript, uc.created_at, c.tag, c.description,
-                u.username, u.display_name
-            FROM user_commands uc
-            JOIN commands c ON c.id = uc.command_id
-            JOIN users u ON u.telegram_id = uc.user_id
-            WHERE uc.status = 'pending'
-            ORDER BY uc.created_at ASC
-        """)
-        
-        recordings = cur.fetchall()
-        conn.close()
+        with self._read() as cur:
+            cur.execute("""
+                SELECT 
+                    uc.id, uc.user_id, uc.voice_file_id,
+                    uc.transcript, uc.created_at, c.tag, c.description,
+                    u.username, u.display_name
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                JOIN users u ON u.telegram_id = uc.user_id
+                WHERE uc.status = 'pending'
+                ORDER BY uc.created_at ASC
+            """)
+            recordings = cur.fetchall()
         
         return [
             {
                 "id": rec[0],
                 "user_id": rec[1],
                 "voice_file_id": rec[2],
-                "voice_path": rec[3],
-                "transcript": rec[4],
-                "created_at": rec[5],
-                "command_tag": rec[6],
-                "command_description": rec[7],
-                "username": rec[8],
-                "display_name": rec[9]
+                "transcript": rec[3],
+                "created_at": rec[4],
+                "command_tag": rec[5],
+                "command_description": rec[6],
+                "username": rec[7],
+                "display_name": rec[8]
             }
             for rec in recordings
         ]
 
+    def next_pending_recording(self, after_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Получает следующую запись, ожидающую проверки.
+        Записи идут в порядке поступления; after_id - ID записи, после которой
+        продолжить (например, пропущенной проверяющим)
+        """
+        after = ""
+        params: Tuple = ()
+        if after_id is not None:
+            after = """
+                AND (uc.created_at, uc.id) > (
+                    SELECT created_at, id FROM user_commands WHERE id = ?
+                )
+            """
+            params = (after_id,)
+        
+        with self._read() as cur:
+            cur.execute(f"""
+                SELECT 
+                    uc.id, uc.user_id, uc.voice_file_id,
+                    uc.transcript, uc.created_at, c.tag, c.description,
+                    u.username, u.display_name
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                JOIN users u ON u.telegram_id = uc.user_id
+                WHERE uc.status = 'pending' {after}
+                ORDER BY uc.created_at ASC, uc.id ASC
+                LIMIT 1
+            """, params)
+            rec = cur.fetchone()
+        
+        if rec:
+            return {
+                "id": rec[0],
+                "user_id": rec[1],
+                "voice_file_id": rec[2],
+                "transcript": rec[3],
+                "created_at": rec[4],
+                "command_tag": rec[5],
+                "command_description": rec[6],
+                "username": rec[7],
+                "display_name": rec[8]
+            }
+        return None
+
     def update_recording_status(self, recording_id: int, status: str, points: int = 0) -> bool:
         """Обновляет статус записи и начисляет баллы пользователю"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         try:
-            # Обновляем статус записи
-            cur.execute(
-                "UPDATE user_commands SET status = ? WHERE id = ?",
-                (status, recording_id)
-            )
-            
-            # Если запись одобрена, начисляем баллы
-            if status == 'approved':
-                cur.execute("""
+            with self.transaction() as cur:
+                # Обновляем статус записи
+                cur.execute(
+                    "UPDATE user_commands SET status = ? WHERE id = ?",
+                    (status, recording_id)
+                )
+                cur.execute("SELECT user_id FROM user_commands WHERE id = ?", (recording_id,))
+                row = cur.fetchone()
+                
+                # Если запись одобрена, начисляем баллы
+                if row and status == 'approved':
+                    cur.execute(
+                        "UPDATE users SET points = points + ? WHERE telegram_id = ?",
+                        (points, row[0])
+                    )
+            if row and status == 'approved':
+                self._user_cache.invalidate(row[0])
+            return True
+        except sqlite3.Error:
+            return False
+
+    def update_recording_statuses(self, updates: List[Tuple[int, str, int]]) -> List[bool]:
+        """
+        Обновляет статусы нескольких записей одной транзакцией.
+        updates - кортежи (recording_id, status, points).
+        Возвращает успех для каждого обновления
+        """
+        approved = [(points, recording_id) for recording_id, status, points in updates if status == 'approved']
+        try:
+            with self.transaction() as cur:
+                cur.executemany(
+                    "UPDATE user_commands SET status = ? WHERE id = ?",
+                    [(status, recording_id) for recording_id, status, _ in updates]
+                )
+                cur.executemany("""
                     UPDATE users 
                     SET points = points + ? 
                     WHERE telegram_id = (
                         SELECT user_id FROM user_commands WHERE id = ?
                     )
-                """, (points, recording_id))
-            
-            conn.commit()
-            return True
-        except sqlite3.Error:
-            return False
-        finally:
-            conn.close()
+                """, approved)
+                
+                user_ids = set()
+                for _, recording_id in approved:
+                    cur.execute("SELECT user_id FROM user_commands WHERE id = ?", (recording_id,))
+                    row = cur.fetchone()
+                    if row:
+                        user_ids.add(row[0])
+        except sqlite3.Error as e:
+            print(f"Database batch error: {e}")
+            return [self.update_recording_status(*update) for update in updates]
+        
+        for user_id in user_ids:
+            self._user_cache.invalidate(user_id)
+        return [True] * len(updates)
 
     def get_recordings_statistics(self) -> Dict[str, Any]:
-        """Получает статистику по записям"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        # Получаем общую статистику
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-                SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END) as approved,
-                SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) as rejected
-            FROM user_commands
-        """)
-        stats = cur.fetchone()
-        
-        # Получаем топ пользователей
-        cur.execute("""
-            SELECT u.username, u.display_name, COUNT(*) as count
-            FROM user_commands uc
-            JOIN users u ON u.telegram_id = uc.user_id
-            WHERE uc.status = 'approved'
-            GROUP BY uc.user_id
-            ORDER BY count DESC
-            LIMIT 5
-        """)
-        top_users = cur.fetchall()
-        
-        conn.close()
+        """Получает статистику по записям из счетчиков"""
+        with self._read() as cur:
+            # Получаем общую статистику
+            cur.execute("""
+                SELECT 
+                    COALESCE(SUM(count), 0) as total,
+                    COALESCE(SUM(CASE WHEN status = 'pending' THEN count END), 0) as pending,
+                    COALESCE(SUM(CASE WHEN status = 'approved' THEN count END), 0) as approved,
+                    COALESCE(SUM(CASE WHEN status = 'rejected' THEN count END), 0) as rejected
+                FROM recording_stats
+            """)
+            stats = cur.fetchone()
+            
+            # Получаем топ пользователей
+            cur.execute("""
+                SELECT u.username, u.display_name, s.count
+                FROM user_recording_stats s
+                JOIN users u ON u.telegram_id = s.user_id
+                WHERE s.status = 'approved' AND s.count > 0
+                ORDER BY s.count DESC
+                LIMIT 5
+            """)
+            top_users = cur.fetchall()
         
         # Форматируем топ пользователей
         top_users_text = "\n".join(
@@ -521,31 +681,329 @@ class Database:
             "top_users": top_users_text
         }
 
-    def get_command_recordings(self, command_tag: str) -> List[Dict[str, Any]]:
-        """Получает все записи для конкретной команды"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
+    def get_user_recording_stats(self, user_id: int) -> Dict[str, int]:
+        """Получает количество записей пользователя по статусам"""
+        with self._read() as cur:
+            cur.execute(
+                "SELECT status, count FROM user_recording_stats WHERE user_id = ?",
+                (user_id,)
+            )
+            return dict(cur.fetchall())
+
+    def rebuild_stats(self) -> None:
+        """Пересчитывает счетчики записей с нуля, например после ручной правки базы"""
+        with self.transaction() as cur:
+            migrations.rebuild_recording_stats(cur)
+
+    def get_cached_transcriptions(self, file_unique_id: str,
+                                  model_versions: Dict[str, str]) -> Dict[str, str]:
+        """
+        Возвращает сохраненные расшифровки файла для движков из model_versions
+        (движок -> версия модели) и отмечает их как недавно использованные
+        """
+        if not model_versions:
+            return {}
+        with self._read() as cur:
+            cur.execute("""
+                SELECT engine, model_version, transcript
+                FROM transcription_cache
+                WHERE file_unique_id = ?
+            """, (file_unique_id,))
+            rows = cur.fetchall()
+        
+        found = {
+            engine: transcript for engine, version, transcript in rows
+            if model_versions.get(engine) == version
+        }
+        if found:
+            try:
+                with self.transaction() as cur:
+                    cur.executemany("""
+                        UPDATE transcription_cache SET last_used = CURRENT_TIMESTAMP
+                        WHERE file_unique_id = ? AND engine = ? AND model_version = ?
+                    """, [(file_unique_id, engine, model_versions[engine]) for engine in found])
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+        return found
+
+    def cache_transcriptions(self, file_unique_id: str,
+                             rows: List[Tuple[str, str, str]]) -> bool:
+        """
+        Сохраняет расшифровки файла: rows - кортежи (engine, model_version, transcript).
+        При превышении transcription_cache_size удаляет давно не использованные
+        """
+        if not rows:
+            return True
+        try:
+            with self.transaction() as cur:
+                cur.executemany("""
+                    INSERT INTO transcription_cache (file_unique_id, engine, model_version, transcript)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (file_unique_id, engine, model_version) DO UPDATE SET
+                        transcript = excluded.transcript,
+                        last_used = CURRENT_TIMESTAMP
+                """, [(file_unique_id, *row) for row in rows])
+                
+                self._transcription_writes += 1
+                if self._transcription_writes % self.TRANSCRIPTION_EVICT_EVERY == 0:
+                    self._evict_transcriptions(cur)
+            return True
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
+
+    def _evict_transcriptions(self, cur: sqlite3.Cursor) -> None:
+        cur.execute("SELECT COUNT(*) FROM transcription_cache")
+        excess = cur.fetchone()[0] - self.transcription_cache_size
+        if excess > 0:
+            cur.execute("""
+                DELETE FROM transcription_cache
+                WHERE (file_unique_id, engine, model_version) IN (
+                    SELECT file_unique_id, engine, model_version
+                    FROM transcription_cache
+                    ORDER BY last_used
+                    LIMIT ?
+                )
+            """, (excess,))
+
+    def _job_from_row(self, row: tuple) -> Dict[str, Any]:
+        return dict(zip(self.JOB_FIELDS, row))
+
+    def enqueue_recognition_job(self, user_id: int, chat_id: int, command_id: int,
+                                voice_file_id: str, voice_file_unique_id: str = None) -> Optional[int]:
+        """Ставит голосовую запись в очередь распознавания, возвращает id задания"""
+        try:
+            with self.transaction() as cur:
+                cur.execute("""
+                    INSERT INTO recognition_jobs (
+                        user_id, chat_id, command_id, voice_file_id, voice_file_unique_id
+                    )
+                    VALUES (?, ?, ?, ?, ?)
+                """, (user_id, chat_id, command_id, voice_file_id, voice_file_unique_id))
+                return cur.lastrowid
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+
+    def enqueue_recognition_jobs(self, rows: List[Tuple[int, int, int, str, str]]) -> List[Optional[int]]:
+        """
+        Ставит несколько записей в очередь одной транзакцией.
+        rows - кортежи аргументов enqueue_recognition_job.
+        Возвращает id задания для каждой строки
+        """
+        try:
+            with self.transaction() as cur:
+                ids = []
+                for row in rows:
+                    cur.execute("""
+                        INSERT INTO recognition_jobs (
+                            user_id, chat_id, command_id, voice_file_id, voice_file_unique_id
+                        )
+                        VALUES (?, ?, ?, ?, ?)
+                    """, row)
+                    ids.append(cur.lastrowid)
+            return ids
+        except sqlite3.Error as e:
+            print(f"Database batch error: {e}")
+            return [self.enqueue_recognition_job(*row) for row in rows]
+
+    def claim_recognition_job(self, worker_id: str, lease_seconds: float,
+                              max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        Берет следующее задание в аренду на lease_seconds секунд.
+        Задания с истекшей арендой (рабочий процесс упал или завис) выдаются
+        повторно, пока число попыток не достигнет max_attempts, после чего
+        помечаются как failed. BEGIN IMMEDIATE сериализует выбор между
+        процессами, поэтому одно задание не достанется двум рабочим.
+        """
+        now = time.time()
+        fields = ', '.join(self.JOB_FIELDS)
+        with self.transaction() as cur:
+            cur.execute("""
+                UPDATE recognition_jobs
+                SET status = 'failed', error = 'Превышено число попыток',
+                    lease_owner = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?
+            """, (now, max_attempts))
+            
+            cur.execute("""
+                SELECT id FROM recognition_jobs
+                WHERE status = 'queued' AND available_at <= ?
+                ORDER BY id
+                LIMIT 1
+            """, (now,))
+            row = cur.fetchone()
+            if not row:
+                cur.execute("""
+                    SELECT id FROM recognition_jobs
+                    WHERE status = 'running' AND lease_expires_at < ?
+                    ORDER BY lease_expires_at
+                    LIMIT 1
+                """, (now,))
+                row = cur.fetchone()
+            if not row:
+                return None
+            
+            cur.execute("""
+                UPDATE recognition_jobs
+                SET status = 'running', attempts = attempts + 1,
+                    lease_owner = ?, lease_expires_at = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (worker_id, now + lease_seconds, row[0]))
+            cur.execute(f"SELECT {fields} FROM recognition_jobs WHERE id = ?", (row[0],))
+            return self._job_from_row(cur.fetchone())
+
+    def extend_recognition_job_lease(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Продлевает аренду, False - задание уже передано другому рабочему"""
+        with self.transaction() as cur:
+            cur.execute("""
+                UPDATE recognition_jobs SET lease_expires_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'running'
+            """, (time.time() + lease_seconds, job_id, worker_id))
+            return cur.rowcount > 0
+
+    def _complete_recognition_job(self, cur: sqlite3.Cursor, job_id: int, worker_id: str,
+                                  transcript: str, report: str = None) -> Optional[int]:
         cur.execute("""
-            SELECT 
-                uc.id,
-                u.username,
-                u.display_name,
-                uc.voice_file_id,
-                uc.transcript,
-                uc.status,
-                uc.created_at,
-                c.tag,
-                c.description
-            FROM user_commands uc
-            JOIN commands c ON c.id = uc.command_id
-            JOIN users u ON u.telegram_id = uc.user_id
-            WHERE c.tag = ?
-            ORDER BY uc.created_at DESC
-        """, (command_tag,))
+            SELECT user_id, command_id, voice_file_id FROM recognition_jobs
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """, (job_id, worker_id))
+        job = cur.fetchone()
+        if not job:
+            return None
         
-        recordings = cur.fetchall()
-        conn.close()
+        cur.execute("""
+            INSERT INTO user_commands (
+                user_id, command_id, voice_file_id, 
+                transcript, status
+            )
+            VALUES (?, ?, ?, ?, 'pending')
+        """, (*job, transcript))
+        user_command_id = cur.lastrowid
+        cur.execute("""
+            UPDATE recognition_jobs
+            SET status = 'done', user_command_id = ?, report = ?, lease_owner = NULL,
+                error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (user_command_id, report, job_id))
+        return user_command_id
+
+    def complete_recognition_job(self, job_id: int, worker_id: str, transcript: str,
+                                 report: str = None) -> Optional[int]:
+        """
+        Сохраняет результат задания в user_commands и закрывает задание одной
+        транзакцией; report - отчет для пользователя на случай повторной
+        отправки. Возвращает id записи или None, если аренда потеряна
+        и задание уже выполняет другой рабочий
+        """
+        try:
+            with self.transaction() as cur:
+                return self._complete_recognition_job(cur, job_id, worker_id, transcript, report)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+
+    def complete_recognition_jobs(self, rows: List[Tuple[int, str, str, str]]) -> List[Optional[int]]:
+        """
+        Закрывает несколько заданий одной транзакцией.
+        rows - кортежи (job_id, worker_id, transcript, report).
+        Возвращает id записи (или None) для каждой строки
+        """
+        try:
+            with self.transaction() as cur:
+                return [self._complete_recognition_job(cur, *row) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Database batch error: {e}")
+            return [self.complete_recognition_job(*row) for row in rows]
+
+    def fail_recognition_job(self, job_id: int, worker_id: str, error: str,
+                             max_attempts: int, backoff: float = 0.0,
+                             permanent: bool = False) -> Optional[str]:
+        """
+        Возвращает задание в очередь после ошибки или помечает failed,
+        если попытки исчерпаны. Повтор откладывается на backoff секунд,
+        удваиваясь с каждой попыткой, чтобы временный сбой (сеть, Telegram)
+        не сжигал все попытки за несколько секунд. permanent - ошибка не
+        исправится повтором: задание сразу помечается failed с исчерпанными
+        попытками. Возвращает новый статус задания
+        """
+        with self.transaction() as cur:
+            cur.execute("""
+                SELECT attempts FROM recognition_jobs
+                WHERE id = ? AND lease_owner = ? AND status = 'running'
+            """, (job_id, worker_id))
+            row = cur.fetchone()
+            if not row:
+                return None
+            
+            attempts = max(row[0], max_attempts) if permanent else row[0]
+            status = 'failed' if attempts >= max_attempts else 'queued'
+            available_at = time.time() + backoff * 2 ** max(attempts - 1, 0)
+            cur.execute("""
+                UPDATE recognition_jobs
+                SET status = ?, attempts = ?, error = ?, lease_owner = NULL,
+                    lease_expires_at = NULL, available_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, attempts, error, available_at, job_id))
+            return status
+
+    def mark_recognition_job_notified(self, job_id: int) -> None:
+        """Отмечает, что результат задания доставлен пользователю"""
+        with self.transaction() as cur:
+            cur.execute("UPDATE recognition_jobs SET notified_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def get_undelivered_recognition_jobs(self, older_than: float, max_age: float = 86400,
+                                         limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Выполненные задания, результат которых не доставлен пользователю.
+        Задания моложе older_than секунд еще может отправлять рабочий,
+        а старше max_age - больше не отправляются
+        """
+        with self._read() as cur:
+            cur.execute(f"""
+                SELECT {', '.join(self.JOB_FIELDS)} FROM recognition_jobs
+                WHERE status = 'done' AND notified_at IS NULL
+                  AND updated_at < datetime('now', ?) AND updated_at > datetime('now', ?)
+                ORDER BY id
+                LIMIT ?
+            """, (f"-{older_than:.0f} seconds", f"-{max_age:.0f} seconds", limit))
+            return [self._job_from_row(row) for row in cur.fetchall()]
+
+    def get_recognition_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Получает задание распознавания по id"""
+        with self._read() as cur:
+            cur.execute(f"SELECT {', '.join(self.JOB_FIELDS)} FROM recognition_jobs WHERE id = ?", (job_id,))
+            row = cur.fetchone()
+        return self._job_from_row(row) if row else None
+
+    def count_queued_recognition_jobs(self) -> int:
+        """Количество заданий, ожидающих рабочего"""
+        with self._read() as cur:
+            cur.execute("SELECT COUNT(*) FROM recognition_jobs WHERE status = 'queued'")
+            return cur.fetchone()[0]
+
+    def get_command_recordings(self, command_tag: str) -> List[Dict[str, Any]]:
+        """Получает все записи для конкретной команды"""
+        with self._read() as cur:
+            cur.execute("""
+                SELECT 
+                    uc.id,
+                    u.username,
+                    u.display_name,
+                    uc.voice_file_id,
+                    uc.transcript,
+                    uc.status,
+                    uc.created_at,
+                    c.tag,
+                    c.description
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                JOIN users u ON u.telegram_id = uc.user_id
+                WHERE c.tag = ?
+                ORDER BY uc.created_at DESC
+            """, (command_tag,))
+            recordings = cur.fetchall()
         
         return [
             {
@@ -564,190 +1022,111 @@ class Database:
 
     def get_voice_file_id(self, recording_id: int) -> Optional[str]:
         """Получает voice_file_id по ID записи"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("SELECT voice_file_id FROM user_commands WHERE id = ?", (recording_id,))
-        result = cur.fetchone()
-        conn.close()
+        with self._read() as cur:
+            cur.execute("SELECT voice_file_id FROM user_commands WHERE id = ?", (recording_id,))
+            result = cur.fetchone()
         
         return result[0] if result else None
 
     def get_command_recordings_count(self, command_tag: str) -> int:
         """Получает количество записей для команды"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT COUNT(*)
-            FROM user_commands uc
-            JOIN commands c ON c.id = uc.command_id
-            WHERE c.tag = ?
-        """, (command_tag,))
+        command = self._get_catalog().by_tag.get(command_tag)
+        if not command:
+            return 0
         
-        count = cur.fetchone()[0]
-        conn.close()
+        with self._read() as cur:
+            cur.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM command_recording_stats WHERE command_id = ?",
+                (command["id"],)
+            )
+            count = cur.fetchone()[0]
         
         return count
 
     def delete_command_by_tag(self, command_tag: str) -> bool:
         """Удаляет команду по тегу. Если тег 'all', удаляет все команды"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         try:
-            # Если тег 'all', вызываем удаление всех команд
-            if command_tag == 'all':
-                print("Detected 'all' tag, deleting all commands...")
-                # Отключаем внешние ключи временно
-                cur.execute("PRAGMA foreign_keys = OFF")
-                
-                try:
+            # Все удаления выполняются в одной транзакции на одном соединении
+            with self.transaction() as cur:
+                # Если тег 'all', вызываем удаление всех команд
+                if command_tag == 'all':
+                    print("Detected 'all' tag, deleting all commands...")
+                    
                     # Сначала удаляем все записи
                     print("Deleting all user_commands...")
                     cur.execute("DELETE FROM user_commands")
-                    recordings_deleted = cur.rowcount
-                    print(f"Deleted {recordings_deleted} recordings")
+                    print(f"Deleted {cur.rowcount} recordings")
                     
                     # Затем удаляем все команды
                     print("Deleting all commands...")
                     cur.execute("DELETE FROM commands")
-                    commands_deleted = cur.rowcount
-                    print(f"Deleted {commands_deleted} commands")
+                    print(f"Deleted {cur.rowcount} commands")
+                else:
+                    # Для конкретной команды - стандартное удаление
+                    # Получаем id команды
+                    cur.execute("SELECT id FROM commands WHERE tag = ?", (command_tag,))
+                    command_id = cur.fetchone()
                     
-                except sqlite3.Error as e:
-                    print(f"Error during deletion operations: {e}")
-                    raise
-                
-                # Включаем внешние ключи обратно
-                cur.execute("PRAGMA foreign_keys = ON")
-                
-                conn.commit()
-                return True
-            
-            # Для конкретной команды - стандартное удаление
-            # Отключаем внешние ключи временно
-            cur.execute("PRAGMA foreign_keys = OFF")
-            
-            # Получаем id команды
-            cur.execute("SELECT id FROM commands WHERE tag = ?", (command_tag,))
-            command_id = cur.fetchone()
-            
-            if not command_id:
-                print(f"Command with tag '{command_tag}' not found")
-                return False
-            
-            try:
-                # Сначала удаляем все записи этой команды
-                cur.execute("DELETE FROM user_commands WHERE command_id = ?", (command_id[0],))
-                print(f"Deleted {cur.rowcount} recordings for command {command_tag}")
-                
-                # Затем удаляем саму команду
-                cur.execute("DELETE FROM commands WHERE tag = ?", (command_tag,))
-                print(f"Deleted command {command_tag}")
-                
-            except sqlite3.Error as e:
-                print(f"Database operation error: {e}")
-                raise
-            
-            # Включаем внешние ключи обратно
-            cur.execute("PRAGMA foreign_keys = ON")
+                    if not command_id:
+                        print(f"Command with tag '{command_tag}' not found")
+                        return False
+                    
+                    # Сначала удаляем все записи этой команды
+                    cur.execute("DELETE FROM user_commands WHERE command_id = ?", (command_id[0],))
+                    print(f"Deleted {cur.rowcount} recordings for command {command_tag}")
+                    
+                    # Затем удаляем саму команду
+                    cur.execute("DELETE FROM commands WHERE id = ?", (command_id[0],))
+                    print(f"Deleted command {command_tag}")
             
-            conn.commit()
+            self._bump_catalog_version()
             return True
             
         except sqlite3.Error as e:
             print(f"Database error occurred: {e}")
-            print("Rolling back changes...")
-            conn.rollback()
+            print("Changes rolled back")
             return False
-        finally:
-            print("Closing database connection...")
-            conn.close()
 
     def get_total_recordings_count(self) -> int:
         """Получает общее количество записей"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("SELECT COUNT(*) FROM user_commands")
-        count = cur.fetchone()[0]
+        with self._read() as cur:
+            cur.execute("SELECT COALESCE(SUM(count), 0) FROM recording_stats")
+            count = cur.fetchone()[0]
         
-        conn.close()
         return count
 
     def delete_all_commands(self) -> bool:
         """Удаляет все команды и их записи"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
         try:
             print("Starting database deletion process...")
             
-            # Проверяем количество записей перед удалением
-            cur.execute("SELECT COUNT(*) FROM user_commands")
-            initial_recordings = cur.fetchone()[0]
-            cur.execute("SELECT COUNT(*) FROM commands")
-            initial_commands = cur.fetchone()[0]
-            print(f"Initial state: {initial_recordings} recordings, {initial_commands} commands")
-            
-            # Отключаем внешние ключи временно
-            print("Disabling foreign keys...")
-            cur.execute("PRAGMA foreign_keys = OFF")
-            
-            try:
+            with self.transaction() as cur:
                 # Сначала удаляем все записи
                 print("Deleting user_commands...")
                 cur.execute("DELETE FROM user_commands")
-                recordings_deleted = cur.rowcount
-                print(f"Deleted {recordings_deleted} recordings")
+                print(f"Deleted {cur.rowcount} recordings")
                 
                 # Затем удаляем все команды
                 print("Deleting commands...")
                 cur.execute("DELETE FROM commands")
-                commands_deleted = cur.rowcount
-                print(f"Deleted {commands_deleted} commands")
-                
-            except sqlite3.Error as e:
-                print(f"Error during deletion operations: {e}")
-                raise
+                print(f"Deleted {cur.rowcount} commands")
             
-            # Проверяем количество записей после удаления
-            cur.execute("SELECT COUNT(*) FROM user_commands")
-            remaining_recordings = cur.fetchone()[0]
-            cur.execute("SELECT COUNT(*) FROM commands")
-            remaining_commands = cur.fetchone()[0]
-            print(f"After deletion: {remaining_recordings} recordings, {remaining_commands} commands")
-            
-            # Включаем внешние ключи обратно
-            print("Enabling foreign keys...")
-            cur.execute("PRAGMA foreign_keys = ON")
-            
-            conn.commit()
+            self._bump_catalog_version()
             print("Changes committed successfully")
             return True
             
         except sqlite3.Error as e:
             print(f"Database error occurred: {e}")
-            print("Rolling back changes...")
-            conn.rollback()
+            print("Changes rolled back")
             return False
-        finally:
-            print("Closing database connection...")
-            conn.close()
 
     def get_command_description(self, command_id: int) -> Optional[str]:
         """Получает описание команды по ID"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("SELECT description FROM commands WHERE id = ?", (command_id,))
-        result = cur.fetchone()
-        conn.close()
-        
-        return result[0] if result else None
+        cmd = self._get_catalog().by_id.get(command_id)
+        return cmd["description"] if cmd else None
 
-    def sorensen_dice_similarity(self, str1: str, str2: str) -> float:
+    @staticmethod
+    def sorensen_dice_similarity(str1: str, str2: str) -> float:
         """Вычисляет схожесть двух строк по методу Соренсена-Дайса"""
         # Очищаем строки от знаков препинания и приводим к нижнему регистру
         str1 = ''.join(c.lower() for c in str1 if c.isalnum() or c.isspace())
@@ -762,30 +1141,27 @@ class Database:
 
     def get_commands_data_for_export(self) -> List[Dict[str, Any]]:
         """Получает данные о командах и их расшифровках для экспорта"""
-        conn = sqlite3.connect(self.db_file)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 
-                c.tag as command_tag,
-                c.description as command_text,
-                uc.voice_file_id,
-                uc.transcript as transcription,
-                u.username,
-                u.display_name,
-                uc.created_at,
-                uc.status
-            FROM user_commands uc
-            JOIN commands c ON c.id = uc.command_id
-            JOIN users u ON u.telegram_id = uc.user_id
-            ORDER BY c.tag, uc.created_at
-        """)
-        
-        columns = [description[0] for description in cur.description]
-        results = []
-        
-        for row in cur.fetchall():
-            results.append(dict(zip(columns, row)))
+        with self._read() as cur:
+            cur.execute("""
+                SELECT 
+                    c.tag as command_tag,
+                    c.description as command_text,
+                    uc.voice_file_id,
+                    uc.transcript as transcription,
+                    u.username,
+                    u.display_name,
+                    uc.created_at,
+                    uc.status
+                FROM user_commands uc
+                JOIN commands c ON c.id = uc.command_id
+                JOIN users u ON u.telegram_id = uc.user_id
+                ORDER BY c.tag, uc.created_at
+            """)
+            
+            columns = [description[0] for description in cur.description]
+            results = []
+            
+            for row in cur.fetchall():
+                results.append(dict(zip(columns, row)))
         
-        conn.close()
-        return results 
\ No newline at end of file
+        return results
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""
+Версионированные миграции схемы базы данных.
+
+Номер примененной версии хранится в таблице schema_version. Каждая миграция
+выполняется в транзакции вместе с записью своей версии, поэтому сбой
+посередине не оставляет схему в промежуточном состоянии и не теряет данные.
+Новые изменения схемы добавляются новой функцией в конец MIGRATIONS;
+примененные миграции не редактируются.
+"""
+import sqlite3
+from typing import Callable, List, Set, Tuple
+
+
+def _columns(cur: sqlite3.Cursor, table: str) -> Set[str]:
+    """Возвращает имена столбцов таблицы"""
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _initial_schema(cur: sqlite3.Cursor) -> None:
+    """Базовая схема: роли, пользователи, команды и записи пользователей"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS roles (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        display_name TEXT NOT NULL
+    )
+    """)
+    # В ранних версиях у ролей не было отображаемого имени
+    if 'display_name' not in _columns(cur, 'roles'):
+        cur.execute("ALTER TABLE roles ADD COLUMN display_name TEXT NOT NULL DEFAULT ''")
+
+    cur.execute("""
+        INSERT INTO roles (id, name, display_name)
+        VALUES
+            (1, 'user', 'Пользователь'),
+            (2, 'admin', 'Администратор')
+        ON CONFLICT(id) DO UPDATE SET display_name = excluded.display_name
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        telegram_id INTEGER PRIMARY KEY,
+        username TEXT,
+        display_name TEXT,
+        email TEXT,
+        organization TEXT,
+        social_link TEXT,
+        registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        points INTEGER DEFAULT 0,
+        role_id INTEGER DEFAULT 1,
+        FOREIGN KEY (role_id) REFERENCES roles(id)
+    )
+    """)
+    if 'role_id' not in _columns(cur, 'users'):
+        cur.execute("ALTER TABLE users ADD COLUMN role_id INTEGER DEFAULT 1 REFERENCES roles(id)")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS commands (
+        id INTEGER PRIMARY KEY,
+        tag TEXT UNIQUE NOT NULL,
+        description TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_commands (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        command_id INTEGER,
+        voice_file_id TEXT,
+        transcript TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(telegram_id),
+        FOREIGN KEY (command_id) REFERENCES commands(id)
+    )
+    """)
+
+
+def _user_commands_indexes(cur: sqlite3.Cursor) -> None:
+    """Индексы для горячих запросов к user_commands"""
+    # Проверка NOT EXISTS в get_pending_commands
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_commands_user_command
+        ON user_commands (user_id, command_id)
+    """)
+    # История пользователя, отсортированная по дате
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_commands_user_created
+        ON user_commands (user_id, created_at)
+    """)
+    # Очередь записей на проверку
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_commands_status_created
+        ON user_commands (status, created_at)
+    """)
+    # Записи команды, их количество и удаление команды
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_commands_command_created
+        ON user_commands (command_id, created_at)
+    """)
+
+
+def rebuild_recording_stats(cur: sqlite3.Cursor) -> None:
+    """Пересчитывает счетчики записей по таблице user_commands"""
+    cur.execute("DELETE FROM recording_stats")
+    cur.execute("DELETE FROM user_recording_stats")
+    cur.execute("DELETE FROM command_recording_stats")
+    cur.execute("""
+        INSERT INTO recording_stats (status, count)
+        SELECT status, COUNT(*) FROM user_commands GROUP BY status
+    """)
+    cur.execute("""
+        INSERT INTO user_recording_stats (user_id, status, count)
+        SELECT user_id, status, COUNT(*) FROM user_commands GROUP BY user_id, status
+    """)
+    cur.execute("""
+        INSERT INTO command_recording_stats (command_id, status, count)
+        SELECT command_id, status, COUNT(*) FROM user_commands GROUP BY command_id, status
+    """)
+
+
+def _recording_stats(cur: sqlite3.Cursor) -> None:
+    """
+    Счетчики записей по статусам: общие, по пользователям и по командам.
+    Поддерживаются триггерами на user_commands, поэтому их обновляют
+    все пути записи, включая пакетные вставки и удаление команд
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recording_stats (
+        status TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_recording_stats (
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, status)
+    )
+    """)
+    # Топ пользователей по одобренным записям
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_recording_stats_status_count
+        ON user_recording_stats (status, count)
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS command_recording_stats (
+        command_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (command_id, status)
+    )
+    """)
+
+    increment = """
+        INSERT INTO recording_stats (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        INSERT INTO user_recording_stats (user_id, status, count) VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+        INSERT INTO command_recording_stats (command_id, status, count) VALUES (NEW.command_id, NEW.status, 1)
+            ON CONFLICT (command_id, status) DO UPDATE SET count = count + 1;
+    """
+    decrement = """
+        UPDATE recording_stats SET count = count - 1
+            WHERE status = OLD.status;
+        UPDATE user_recording_stats SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        UPDATE command_recording_stats SET count = count - 1
+            WHERE command_id = OLD.command_id AND status = OLD.status;
+    """
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_commands_stats_insert
+        AFTER INSERT ON user_commands
+        BEGIN {increment} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_commands_stats_delete
+        AFTER DELETE ON user_commands
+        BEGIN {decrement} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_commands_stats_update
+        AFTER UPDATE OF status, user_id, command_id ON user_commands
+        WHEN OLD.status IS NOT NEW.status
+          OR OLD.user_id IS NOT NEW.user_id
+          OR OLD.command_id IS NOT NEW.command_id
+        BEGIN {decrement} {increment} END
+    """)
+
+    rebuild_recording_stats(cur)
+
+
+def _transcription_cache(cur: sqlite3.Cursor) -> None:
+    """Кэш расшифровок по file_unique_id Telegram, движку и версии модели"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS transcription_cache (
+        file_unique_id TEXT NOT NULL,
+        engine TEXT NOT NULL,
+        model_version TEXT NOT NULL,
+        transcript TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (file_unique_id, engine, model_version)
+    ) WITHOUT ROWID
+    """)
+    # Вытеснение давно не использованных записей
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transcription_cache_last_used
+    ON transcription_cache (last_used)
+    """)
+
+
+def _recognition_jobs(cur: sqlite3.Cursor) -> None:
+    """Очередь заданий распознавания с арендой для рабочих процессов"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recognition_jobs (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        command_id INTEGER NOT NULL,
+        voice_file_id TEXT NOT NULL,
+        voice_file_unique_id TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',  -- queued, running, done, failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires_at REAL,  -- Unix-время окончания аренды
+        error TEXT,
+        user_command_id INTEGER,  -- Запись в user_commands после выполнения
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(telegram_id),
+        FOREIGN KEY (command_id) REFERENCES commands(id)
+    )
+    """)
+    # Выбор следующего задания: очередь по id и просроченные аренды
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_recognition_jobs_status_lease
+    ON recognition_jobs (status, lease_expires_at)
+    """)
+    # Команды с записью в очереди не предлагаются пользователю повторно
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_recognition_jobs_user_command
+    ON recognition_jobs (user_id, command_id, status)
+    """)
+
+
+def _recognition_jobs_backoff(cur: sqlite3.Cursor) -> None:
+    """Время, раньше которого задание после ошибки не выдается повторно"""
+    if 'available_at' not in _columns(cur, 'recognition_jobs'):
+        cur.execute("ALTER TABLE recognition_jobs ADD COLUMN available_at REAL NOT NULL DEFAULT 0")
+    # Выбор следующего задания из очереди, готового к выдаче
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_recognition_jobs_status_available
+    ON recognition_jobs (status, available_at)
+    """)
+
+
+def _recognition_jobs_notifications(cur: sqlite3.Cursor) -> None:
+    """
+    Отчет выполненного задания и время его доставки пользователю: если
+    отправка не удалась, результат отправляется повторно
+    """
+    columns = _columns(cur, 'recognition_jobs')
+    if 'report' not in columns:
+        cur.execute("ALTER TABLE recognition_jobs ADD COLUMN report TEXT")
+    if 'notified_at' not in columns:
+        cur.execute("ALTER TABLE recognition_jobs ADD COLUMN notified_at REAL")
+    # Задания до миграции уже обработаны, повторно их не отправляем
+    cur.execute("UPDATE recognition_jobs SET notified_at = strftime('%s', 'now') WHERE notified_at IS NULL")
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_recognition_jobs_status_notified
+    ON recognition_jobs (status, notified_at)
+    """)
+
+
+# (версия, описание, функция миграции) в порядке применения
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "Базовая схема", _initial_schema),
+    (2, "Индексы user_commands", _user_commands_indexes),
+    (3, "Счетчики записей", _recording_stats),
+    (4, "Кэш расшифровок", _transcription_cache),
+    (5, "Очередь заданий распознавания", _recognition_jobs),
+    (6, "Отложенный повтор заданий распознавания", _recognition_jobs_backoff),
+    (7, "Повторная доставка результатов распознавания", _recognition_jobs_notifications),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cur: sqlite3.Cursor) -> int:
+    """Возвращает текущую версию схемы, 0 для новой базы"""
+    try:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+    except sqlite3.OperationalError:
+        return 0
+    return cur.fetchone()[0] or 0
+
+
+def apply_migrations(cur: sqlite3.Cursor) -> List[int]:
+    """
+    Применяет недостающие миграции.
+    Курсор должен находиться внутри транзакции записи: версия перечитывается
+    под блокировкой, чтобы параллельно стартующие процессы не применили
+    миграцию дважды. Возвращает номера примененных версий.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    current = get_schema_version(cur)
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(cur)
+        cur.execute(
+            "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+            (version, description)
+        )
+        applied.append(version)
+    return applied
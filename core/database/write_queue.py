@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (тип записи, аргументы, future вызывающего)
+WriteItem = Tuple[str, Tuple, asyncio.Future]
+
+
+class WriteQueue:
+    """
+    Очередь отложенной записи с групповой фиксацией.
+    Записи, пришедшие в течение max_delay секунд (но не больше max_batch),
+    фиксируются одной транзакцией через пакетный метод Database. Вызывающий
+    получает future, который завершается результатом своей строки после
+    фиксации, поэтому обработчик по-прежнему может подтвердить сохранение.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., Awaitable[Any]],
+        handlers: Dict[str, Callable[[List[Tuple]], List[Any]]],
+        max_batch: int = 64,
+        max_delay: float = 0.005
+    ):
+        self._run = run  # Выполняет синхронную функцию в пуле потоков базы
+        self._handlers = handlers  # Тип записи -> пакетный метод Database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task = None
+
+        # Статистика групповой фиксации
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.commit_time_total = 0.0
+        self.commit_time_max = 0.0
+
+    async def submit(self, kind: str, *args) -> Any:
+        """Ставит запись в очередь и ждет ее фиксации"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown write kind: {kind}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((kind, args, future))
+        return await future
+
+    async def _collect(self, first: WriteItem) -> Tuple[List[WriteItem], bool]:
+        """Собирает пакет, пока не наберется max_batch или не истечет max_delay"""
+        loop = asyncio.get_running_loop()
+        batch = [first]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch, stopping = await self._collect(first)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # Иначе задача завершится, и следующие submit() будут ждать вечно
+                logger.exception(f"Ошибка фиксации пакета: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _flush(self, batch: List[WriteItem]) -> None:
+        """Фиксирует пакет: по одной транзакции на каждый тип записи"""
+        groups: Dict[str, List[WriteItem]] = {}
+        for item in batch:
+            groups.setdefault(item[0], []).append(item)
+        
+        for kind, items in groups.items():
+            started = time.perf_counter()
+            try:
+                results = await self._run(self._handlers[kind], [args for _, args, _ in items])
+            except Exception as e:
+                logger.error(f"Ошибка групповой записи {kind}: {e}")
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+            
+            for (_, _, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+            
+            self.batches += 1
+            self.items += len(items)
+            self.max_batch_seen = max(self.max_batch_seen, len(items))
+            self.commit_time_total += elapsed
+            self.commit_time_max = max(self.commit_time_max, elapsed)
+            logger.debug(f"Зафиксирован пакет {kind}: {len(items)} записей за {elapsed * 1000:.1f} мс")
+
+    def stats(self) -> Dict[str, Any]:
+        """Достигнутые размеры пакетов и время фиксации"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": self.items / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "avg_commit_ms": self.commit_time_total / self.batches * 1000 if self.batches else 0.0,
+            "max_commit_ms": self.commit_time_max * 1000
+        }
+
+    async def close(self) -> None:
+        """Фиксирует оставшиеся записи и останавливает очередь"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info(f"Статистика групповой записи: {self.stats()}")
@@ -1,21 +1,21 @@
 from aiogram import Router, F
 from aiogram.types import Message
-from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 
 router = Router()
-db = Database('bot_database.db')
 
 @router.message(F.text == '💰 Мой баланс')
-async def show_balance(message: Message):
-    user = db.get_user(message.from_user.id)
+async def show_balance(message: Message, db: AsyncDatabase):
+    user = await db.get_user(message.from_user.id)
     if not user:
         await message.answer("Для просмотра баланса необходимо зарегистрироваться!")
         return
         
+    stats = await db.get_user_recording_stats(message.from_user.id)
     balance_text = (
         f"💰 <b>Ваш баланс:</b>\n\n"
         f"Баллы: {user['points']}\n"
-        f"Выполнено заданий: 0\n"  # Можно добавить в БД поле для подсчета заданий
+        f"Выполнено заданий: {stats.get('approved', 0)}\n"
         f"Штрафы: 0"  # Можно добавить в БД поле для штрафов
     )
     
@@ -1,7 +1,7 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.fsm.context import FSMContext
-from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 from core.states.states import CommandStates
 from core.keyboards.markup import (
     get_command_management_keyboard,
@@ -12,21 +12,30 @@ from core.keyboards.markup import (
     get_recording_review_keyboard
 )
 from core.keyboards.main import admin_keyboard, main_keyboard
-import os
 from datetime import datetime
-from core.backend.audio_handler import save_voice_to_file, voice_to_text_whisper, voice_to_text_google, voice_to_text_vosk, process_voice_recognition
+from core.backend.audio_handler import download_voice
+from core.backend.recognition import recognize, active_models, cascade_stats
+from core.backend.grammar import command_grammar
+from core.backend.transcription_cache import TranscriptionCache
+from core.backend.vad import vad_stats
+from core.backend.engines import engine_registry
+from functools import partial
+from core.backend.models import models
+from core.config.settings import settings
 from core.utils.export import export_commands_to_csv
+from core.utils.scratch import scratch
 import pandas as pd
 
 router = Router()
-db = Database('bot_database.db')
 
 # Добавим словарь для хранения ID последнего голосового сообщения для каждого чата
 last_voice_messages = {}
 
+MODELS_LOADING_TEXT = "⏳ Модели распознавания загружаются, отправьте запись еще раз через минуту."
+
 @router.message(F.text == '🎯 Перейти к разметке')
-async def start_markup(message: Message):
-    user = db.get_user(message.from_user.id)
+async def start_markup(message: Message, db: AsyncDatabase):
+    user = await db.get_user(message.from_user.id)
     if not user:
         await message.answer("Пожалуйста, сначала зарегистрируйтесь!")
         return
@@ -37,16 +46,15 @@ async def start_markup(message: Message):
     )
 
 @router.message(F.text == "🎯 Доступные команды")
-async def show_available_commands(message: Message):
-    commands = db.get_pending_commands(message.from_user.id)
-    if not commands:
+async def show_available_commands(message: Message, db: AsyncDatabase):
+    command = await db.next_pending_command(message.from_user.id)  # Первая невыполненная команда
+    if not command:
         await message.answer(
             "Поздравляем! Вы выполнили все доступные команды! 🎉\n"
             "Ожидайте новых заданий."
         )
         return
     
-    command = commands[0]  # Берем первую невыполненную команду
     await message.answer(
         f"📝 <b>Команда для записи:</b>\n\n"
         f"<b>Тег:</b> {command['tag']}\n"
@@ -56,15 +64,18 @@ async def show_available_commands(message: Message):
         parse_mode="HTML"
     )
 
-@router.message(F.text == "📊 Мои записи")
-async def show_user_commands(message: Message):
-    commands = db.get_user_commands(message.from_user.id)
+# Количество записей на одной странице "Мои записи"
+USER_COMMANDS_PAGE_SIZE = 10
+
+async def send_user_commands_page(message: Message, db: AsyncDatabase, user_id: int, cursor: int = None, offset: int = 0):
+    """Отправляет одну страницу записей пользователя с кнопкой перехода к следующей"""
+    commands, next_cursor = await db.iter_user_commands(user_id, USER_COMMANDS_PAGE_SIZE, cursor)
     if not commands:
         await message.answer("Вы еще не записали ни одной команды.")
         return
     
     text = "📊 <b>Ваши записи:</b>\n\n"
-    for i, cmd in enumerate(commands, 1):
+    for i, cmd in enumerate(commands, offset + 1):
         text += (
             f"{i}. <b>{cmd['tag']}</b>\n"
             f"Описание: {cmd['description']}\n"
@@ -74,7 +85,29 @@ async def show_user_commands(message: Message):
             f"Дата: {cmd['created_at']}\n\n"
         )
     
-    await message.answer(text, parse_mode="HTML")
+    keyboard = None
+    if next_cursor is not None:
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="➡️ Показать еще",
+                    callback_data=f"my_records_{next_cursor}_{offset + len(commands)}"
+                )
+            ]
+        ])
+    
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+@router.message(F.text == "📊 Мои записи")
+async def show_user_commands(message: Message, db: AsyncDatabase):
+    await send_user_commands_page(message, db, message.from_user.id)
+
+@router.callback_query(F.data.startswith("my_records_"))
+async def show_user_commands_next_page(callback: CallbackQuery, db: AsyncDatabase):
+    _, _, cursor, offset = callback.data.split("_")
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await send_user_commands_page(callback.message, db, callback.from_user.id, int(cursor), int(offset))
+    await callback.answer()
 
 @router.callback_query(F.data.startswith("record_cmd_"))
 async def start_recording(callback: CallbackQuery, state: FSMContext):
@@ -88,87 +121,46 @@ async def start_recording(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(CommandStates.waiting_for_voice, F.voice)
-async def process_voice_command(message: Message, state: FSMContext):
+async def process_voice_command(message: Message, state: FSMContext, db: AsyncDatabase):
     data = await state.get_data()
     command_id = data['recording_command_id']
     
-    command = db.get_command_by_id(command_id)
+    command = await db.get_command_by_id(command_id)
     if not command:
         await message.answer("Ошибка: команда не найдена!")
         await state.clear()
         return
-    
+
+    # Слишком большую запись рабочий все равно не скачает
+    if (message.voice.file_size or 0) > settings.recognition.voice_max_bytes:
+        await message.answer("❌ Запись слишком длинная, запишите команду еще раз покороче.")
+        return
+
     try:
-        voice_file_id = message.voice.file_id
-        processing_msg = await message.answer("🔄 Обрабатываю голосовое сообщение...")
-        
-        # Сохраняем файл
-        temp_file = f"temp_{message.from_user.id}.ogg"
-        await save_voice_to_file(message.bot, message, temp_file)
-        
-        # Распознаем текст разными моделями
-        whisper_text = await voice_to_text_whisper(temp_file)
-        google_text = await voice_to_text_google(temp_file)
-        vosk_text = await voice_to_text_vosk(temp_file)
-        
-        # Вычисляем схожесть для каждой модели
-        whisper_similarity = db.sorensen_dice_similarity(whisper_text, command['description'])
-        google_similarity = db.sorensen_dice_similarity(google_text, command['description'])
-        vosk_similarity = db.sorensen_dice_similarity(vosk_text, command['description'])
-        
-        # Выбираем лучший результат для сохранения
-        best_text = max(
-            [(whisper_text, whisper_similarity, "Whisper"),
-             (google_text, google_similarity, "Google"),
-             (vosk_text, vosk_similarity, "Vosk")],
-            key=lambda x: x[1]
+        # Запись распознается рабочим очереди: задание переживает перезапуск
+        # бота, а результат придет пользователю отдельным сообщением
+        job_id = await db.enqueue_recognition_job(
+            message.from_user.id,
+            message.chat.id,
+            command_id,
+            message.voice.file_id,
+            message.voice.file_unique_id
         )
+        if job_id is None:
+            await message.answer("❌ Ошибка при сохранении команды!")
+            return
         
-        # Отправляем результаты распознавания
+        queued = await db.count_queued_recognition_jobs()
         await message.answer(
-            f"📝 <b>Результаты распознавания:</b>\n\n"
-            f"1️⃣ <b>Whisper:</b>\n{whisper_text}\n"
-            f"Схожесть: {whisper_similarity:.1f}%\n\n"
-            f"2️⃣ <b>Google Speech:</b>\n{google_text}\n"
-            f"Схожесть: {google_similarity:.1f}%\n\n"
-            f"3️⃣ <b>Vosk:</b>\n{vosk_text}\n"
-            f"Схожесть: {vosk_similarity:.1f}%\n\n"
-            f"🎯 <b>Лучший результат ({best_text[2]}):</b> {best_text[1]:.1f}%",
-            parse_mode="HTML"
+            "📥 Запись принята и поставлена в очередь на распознавание.\n"
+            f"Заданий в очереди: {queued}. Результат придет отдельным сообщением."
         )
-        
-        # Сохраняем лучший результат в БД
-        if db.add_user_command(
-            message.from_user.id,
-            command_id,
-            voice_file_id,
-            best_text[0]  # Лучший текст
-        ):
-            await message.answer(
-                "✅ Голосовая команда успешно сохранена!\n\n"
-                f"🎯 <b>Команда:</b> {command['tag']}\n"
-                f"📋 <b>Описание:</b> {command['description']}\n"
-                f"🆔 <b>ID записи:</b> <code>{voice_file_id}</code>",
-                parse_mode="HTML",
-                reply_markup=get_user_markup_keyboard()
-            )
-            
-            await processing_msg.delete()
-            await show_available_commands(message)
-        else:
-            await message.answer("❌ Ошибка при сохранении команды!")
+        await show_available_commands(message, db)
             
     except Exception as e:
         await message.answer(f"❌ Ошибка при обработке: {str(e)}")
         print(f"Error processing voice message: {e}")
     finally:
-        # Удаляем временные файлы
-        import os
-        try:
-            os.remove(temp_file)
-            os.remove(temp_file.replace('.ogg', '.wav'))
-        except:
-            pass
         await state.clear()
 
 @router.message(F.text == '💰 Мой баланс')
@@ -177,8 +169,8 @@ async def my_balance(message: Message):
     await message.answer("Функционал баланса в разработке")
 
 @router.message(F.text == '⚙️ Редактор разметки')
-async def markup_editor(message: Message):
-    user = db.get_user(message.from_user.id)
+async def markup_editor(message: Message, db: AsyncDatabase):
+    user = await db.get_user(message.from_user.id)
     if not user or user['role'] != 'admin':
         await message.answer("У вас нет доступа к этой функции!")
         return
@@ -195,8 +187,8 @@ async def markup_editor(message: Message):
     )
 
 @router.message(F.text == "➕ Добавить команду")
-async def add_command_start(message: Message, state: FSMContext):
-    if not db.is_admin(message.from_user.id):
+async def add_command_start(message: Message, state: FSMContext, db: AsyncDatabase):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
@@ -216,19 +208,19 @@ async def process_command_description(message: Message, state: FSMContext):
     )
 
 @router.message(CommandStates.waiting_for_tag)
-async def process_command_tag(message: Message, state: FSMContext):
+async def process_command_tag(message: Message, state: FSMContext, db: AsyncDatabase):
     data = await state.get_data()
     description = data['description']
     tag = message.text.lower()
     
-    if db.get_command_by_tag(tag):
+    if await db.get_command_by_tag(tag):
         await message.answer(
             "Команда с таким тегом уже существует! "
             "Пожалуйста, выберите другой тег."
         )
         return
     
-    if db.add_command(tag, description):
+    if await db.add_command(tag, description):
         await message.answer(
             f"✅ Команда успешно добавлена!\n\n"
             f"Тег: {tag}\n"
@@ -262,12 +254,12 @@ def create_commands_keyboard(commands: list) -> InlineKeyboardMarkup:
     return keyboard
 
 @router.message(F.text == "📝 Список команд")
-async def list_commands(message: Message):
-    if not db.is_admin(message.from_user.id):
+async def list_commands(message: Message, db: AsyncDatabase):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
-    commands = db.get_all_commands()
+    commands = await db.get_all_commands()
     if not commands:
         await message.answer("Список команд пуст!")
         return
@@ -282,7 +274,7 @@ async def list_commands(message: Message):
     )
 
 @router.callback_query(F.data.startswith("view_cmd_"))
-async def view_command_recordings(callback: CallbackQuery):
+async def view_command_recordings(callback: CallbackQuery, db: AsyncDatabase):
     chat_id = callback.message.chat.id
     
     # Удаляем последнее голосовое сообщение при просмотре новой команды
@@ -298,7 +290,7 @@ async def view_command_recordings(callback: CallbackQuery):
     
     # Используем весь текст после view_cmd_ как тег команды
     command_tag = callback.data[9:]  # Убираем префикс "view_cmd_"
-    recordings = db.get_command_recordings(command_tag)
+    recordings = await db.get_command_recordings(command_tag)
     
     # Создаем клавиатуру
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
@@ -362,9 +354,9 @@ async def view_command_recordings(callback: CallbackQuery):
     )
 
 @router.callback_query(F.data.startswith("play_rec_"))
-async def play_recording(callback: CallbackQuery):
+async def play_recording(callback: CallbackQuery, db: AsyncDatabase):
     recording_id = int(callback.data.split("_")[2])
-    voice_file_id = db.get_voice_file_id(recording_id)
+    voice_file_id = await db.get_voice_file_id(recording_id)
     chat_id = callback.message.chat.id
     
     if voice_file_id:
@@ -389,15 +381,15 @@ async def play_recording(callback: CallbackQuery):
         await callback.answer("Ошибка: запись не найдена", show_alert=True)
 
 @router.callback_query(F.data.startswith("back_to_recordings_"))
-async def back_to_recordings(callback: CallbackQuery):
+async def back_to_recordings(callback: CallbackQuery, db: AsyncDatabase):
     command_tag = callback.data.split("_")[3]
     # Удаляем сообщение с голосовой записью
     await callback.message.delete()
     # Возвращаемся к списку записей для этой команды
-    await view_command_recordings(callback)
+    await view_command_recordings(callback, db)
 
 @router.callback_query(F.data == "back_to_commands")
-async def back_to_commands_list(callback: CallbackQuery):
+async def back_to_commands_list(callback: CallbackQuery, db: AsyncDatabase):
     chat_id = callback.message.chat.id
     
     # Удаляем последнее голосовое сообщение при возврате к списку команд
@@ -411,7 +403,7 @@ async def back_to_commands_list(callback: CallbackQuery):
         except Exception as e:
             print(f"Error deleting voice message: {e}")
     
-    commands = db.get_all_commands()
+    commands = await db.get_all_commands()
     if not commands:
         await callback.message.edit_text("Список команд пуст!")
         return
@@ -432,23 +424,23 @@ async def command_details(callback: CallbackQuery):
     # ... код ...
 
 @router.callback_query(F.data.startswith("delete_cmd_"))
-async def confirm_delete_command(callback: CallbackQuery):
+async def confirm_delete_command(callback: CallbackQuery, db: AsyncDatabase):
     # Убираем префикс "delete_cmd_" без тире
     command_tag = callback.data.replace("delete_cmd_", "")
-    recordings_count = db.get_command_recordings_count(command_tag)
+    recordings_count = await db.get_command_recordings_count(command_tag)
     
     if recordings_count == 0:
-        if db.delete_command_by_tag(command_tag):
+        if await db.delete_command_by_tag(command_tag):
             await callback.answer("✅ Команда успешно удалена!")
             # Проверяем остались ли ещё команды
-            commands = db.get_all_commands()
+            commands = await db.get_all_commands()
             if not commands:
                 await callback.message.edit_text(
                     "📋 Список команд пуст!",
                     parse_mode="HTML"
                 )
             else:
-                await back_to_commands_list(callback)
+                await back_to_commands_list(callback, db)
         else:
             await callback.answer("❌ Ошибка при удалении команды!", show_alert=True)
     else:
@@ -478,19 +470,19 @@ async def confirm_delete_command(callback: CallbackQuery):
         )
 
 @router.callback_query(F.data.startswith("confirm-delete-"))
-async def execute_delete_command(callback: CallbackQuery):
+async def execute_delete_command(callback: CallbackQuery, db: AsyncDatabase):
     # Убираем префикс "confirm-delete-" без тире
     command_tag = callback.data.replace("confirm-delete-", "")
     
-    if db.delete_command_by_tag(command_tag):
+    if await db.delete_command_by_tag(command_tag):
         await callback.answer("✅ Команда и все её записи удалены!")
-        await back_to_commands_list(callback)
+        await back_to_commands_list(callback, db)
     else:
         await callback.answer("❌ Ошибка при удалении команды!", show_alert=True)
 
 @router.message(F.text == "🔙 Назад в меню")
-async def back_to_main_menu(message: Message):
-    user = db.get_user(message.from_user.id)
+async def back_to_main_menu(message: Message, db: AsyncDatabase):
+    user = await db.get_user(message.from_user.id)
     if not user:
         await message.answer("Пожалуйста, сначала зарегистрируйтесь!")
         return
@@ -502,17 +494,16 @@ async def back_to_main_menu(message: Message):
     )
 
 @router.message(F.text == "✅ Проверить записи")
-async def check_recordings(message: Message):
-    if not db.is_admin(message.from_user.id):
+async def check_recordings(message: Message, db: AsyncDatabase):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
-    recordings = db.get_pending_recordings()
-    if not recordings:
+    recording = await db.next_pending_recording()  # Берем первую запись
+    if not recording:
         await message.answer("Нет записей, ожидающих проверки!")
         return
     
-    recording = recordings[0]  # Берем первую запись
     
     # Отправляем информацию о записи
     await message.answer(
@@ -534,33 +525,33 @@ async def check_recordings(message: Message):
     )
 
 @router.callback_query(F.data.startswith("approve_rec_"))
-async def approve_recording(callback: CallbackQuery):
+async def approve_recording(callback: CallbackQuery, db: AsyncDatabase):
     recording_id = int(callback.data.split("_")[2])
     points = 10  # Количество баллов за одобренную запись
     
-    if db.update_recording_status(recording_id, 'approved', points):
+    if await db.update_recording_status(recording_id, 'approved', points):
         await callback.answer("Запись одобрена! Пользователю начислено 10 баллов.")
-        await check_recordings(callback.message)  # Показываем следующую запись
+        await check_recordings(callback.message, db)  # Показываем следующую запись
     else:
         await callback.answer("Ошибка при обновлении статуса записи!")
 
 @router.callback_query(F.data.startswith("reject_rec_"))
-async def reject_recording(callback: CallbackQuery):
+async def reject_recording(callback: CallbackQuery, db: AsyncDatabase):
     recording_id = int(callback.data.split("_")[2])
     
-    if db.update_recording_status(recording_id, 'rejected'):
+    if await db.update_recording_status(recording_id, 'rejected'):
         await callback.answer("Запись отклонена!")
-        await check_recordings(callback.message)  # Показываем следующую запись
+        await check_recordings(callback.message, db)  # Показываем следующую запись
     else:
         await callback.answer("Ошибка при обновлении статуса записи!")
 
 @router.message(F.text == "📊 Статистика записей")
-async def recordings_statistics(message: Message):
-    if not db.is_admin(message.from_user.id):
+async def recordings_statistics(message: Message, db: AsyncDatabase):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
-    stats = db.get_recordings_statistics()  # Нужно реализовать этот метод
+    stats = await db.get_recordings_statistics()  # Нужно реализовать этот метод
     
     await message.answer(
         "📊 <b>Статистика записей:</b>\n\n"
@@ -572,12 +563,45 @@ async def recordings_statistics(message: Message):
         f"{stats['top_users']}",
         parse_mode="HTML"
     )
+    
+    if settings.recognition.cascade and cascade_stats.total:
+        rates = cascade_stats.hit_rates(settings.recognition.cascade_stages)
+        await message.answer(
+            f"🪜 <b>Каскад распознавания</b> (порог {settings.recognition.cascade_threshold:.0f}%, "
+            f"записей с запуска: {cascade_stats.total}):\n"
+            + "\n".join(f"{stage}: {rate:.1f}%" for stage, rate in rates.items()),
+            parse_mode="HTML"
+        )
+    
+    disabled = [engine_registry.label(name) for name, state in engine_registry.states().items() if state != 'closed']
+    if disabled:
+        await message.answer(f"⛔ Движки, отключенные после серии ошибок: {', '.join(disabled)}")
+    
+    if settings.vad.enabled and vad_stats.clips:
+        rejected = ", ".join(f"{reason} - {count}" for reason, count in vad_stats.rejected.items()) or "нет"
+        await message.answer(
+            f"✂️ <b>Обрезка тишины</b> (записей с запуска: {vad_stats.clips}):\n"
+            f"Длительность записей: {vad_stats.total_seconds:.0f} с, из них речи: {vad_stats.speech_seconds:.0f} с\n"
+            f"Не отправлено в движки: {vad_stats.trimmed_share():.1f}%\n"
+            f"Отклонено: {rejected}",
+            parse_mode="HTML"
+        )
+    
+    writes = db.write_queue.stats()
+    if writes['batches']:
+        await message.answer(
+            f"💾 <b>Групповая запись</b> (с запуска):\n"
+            f"Пакетов: {writes['batches']}, записей: {writes['items']}\n"
+            f"Средний пакет: {writes['avg_batch']:.1f}, наибольший: {writes['max_batch']}\n"
+            f"Фиксация: в среднем {writes['avg_commit_ms']:.1f} мс, максимум {writes['max_commit_ms']:.1f} мс",
+            parse_mode="HTML"
+        )
 
 @router.callback_query(F.data == "delete-all-commands")
-async def confirm_delete_all_commands(callback: CallbackQuery):
+async def confirm_delete_all_commands(callback: CallbackQuery, db: AsyncDatabase):
     # Получаем общее количество команд и записей
-    total_commands = len(db.get_all_commands())
-    total_recordings = db.get_total_recordings_count()  # Нужно добавить этот метод в Database
+    total_commands = len(await db.get_all_commands())
+    total_recordings = await db.get_total_recordings_count()  # Нужно добавить этот метод в Database
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -607,11 +631,11 @@ async def confirm_delete_all_commands(callback: CallbackQuery):
     )
 
 @router.callback_query(F.data == "confirm-delete-all")
-async def execute_delete_all_commands(callback: CallbackQuery):
+async def execute_delete_all_commands(callback: CallbackQuery, db: AsyncDatabase):
     print(f"Starting delete all commands process...")
     
     # Получаем все команды перед удалением для проверки
-    commands = db.get_all_commands()
+    commands = await db.get_all_commands()
     print(f"Current commands before deletion: {commands}")
     
     if not commands:
@@ -621,12 +645,12 @@ async def execute_delete_all_commands(callback: CallbackQuery):
     
     # Удаляем все команды
     print("Attempting to delete all commands...")
-    deletion_result = db.delete_all_commands()
+    deletion_result = await db.delete_all_commands()
     print(f"Deletion result: {deletion_result}")
     
     if deletion_result:
         # Проверяем, что все команды действительно удалены
-        remaining_commands = db.get_all_commands()
+        remaining_commands = await db.get_all_commands()
         print(f"Remaining commands after deletion: {remaining_commands}")
         
         if not remaining_commands:
@@ -639,16 +663,16 @@ async def execute_delete_all_commands(callback: CallbackQuery):
         else:
             print(f"Warning: {len(remaining_commands)} commands still remain")
             await callback.answer("⚠️ Удалены не все команды!", show_alert=True)
-            await back_to_commands_list(callback)
+            await back_to_commands_list(callback, db)
     else:
         print("Error occurred during deletion")
         await callback.answer("❌ Ошибка при удалении команд!", show_alert=True)
-        await back_to_commands_list(callback)
+        await back_to_commands_list(callback, db)
 
 @router.message(F.text == "🎤 Тест распознавания")
-async def start_recognition_test(message: Message):
+async def start_recognition_test(message: Message, db: AsyncDatabase):
     """Начало тестирования распознавания речи"""
-    if not db.is_admin(message.from_user.id):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
@@ -674,54 +698,45 @@ async def start_recognition_test(message: Message):
     await message.answer("Отправьте голосовое сообщение...")
 
 @router.message(F.voice)
-async def process_test_voice(message: Message):
+async def process_test_voice(message: Message, db: AsyncDatabase):
     """Обработка тестового голосового сообщения"""
-    if not db.is_admin(message.from_user.id):
+    if not await db.is_admin(message.from_user.id):
+        return
+    
+    if not models.is_ready(active_models()):
+        failed = {name: error for name, error in models.errors().items() if name in active_models()}
+        models.warm_up(active_models())
+        if failed:
+            # Ошибка загрузки не исправится сама, поэтому сообщаем ее, а не просим подождать
+            await message.answer(
+                "❌ Не удалось загрузить модели распознавания:\n"
+                + "\n".join(f"{name}: {error}" for name, error in failed.items())
+                + "\n\nЗапущена повторная загрузка."
+            )
+        else:
+            await message.answer(MODELS_LOADING_TEXT)
         return
     
     try:
         processing_msg = await message.answer("🔄 Обрабатываю голосовое сообщение...")
         
-        # Сохраняем файл
-        temp_file = f"temp_test_{message.from_user.id}.ogg"
-        await save_voice_to_file(message.bot, message, temp_file)
+        voice = partial(download_voice, message.bot, message)
+        cache = TranscriptionCache(db, message.voice.file_unique_id) if settings.recognition.cache else None
+        await command_grammar.refresh(db)
         
-        # Сначала показываем результат Whisper
-        whisper_text = await voice_to_text_whisper(temp_file)
-        await message.answer(
-            "🤖 <b>Whisper распознавание:</b>\n\n"
-            f"{whisper_text}",
-            parse_mode="HTML"
-        )
-        
-        # Показываем, что идет обработка другими системами
-        status_msg = await message.answer(
-            "⏳ Обработка другими системами распознавания...\n"
-            "• Google Speech Recognition\n"
-            "• Vosk"
-        )
-        
-        # Получаем результаты только от Google и Vosk
-        results = await process_voice_recognition(temp_file)
+        # Распознаем всеми системами одновременно
+        results = await recognize(voice, cache=cache)
         
-        # Формируем и отправляем сообщение только с Google и Vosk
-        response = "📊 <b>Дополнительные результаты распознавания:</b>\n\n"
-        for system, text in results:
-            response += f"{system}:\n{text or 'Нет результата'}\n\n"
+        response = "📊 <b>Результаты распознавания:</b>\n\n"
+        for result in results:
+            text = result.text or (f"Ошибка: {result.error}" if result.error else 'Нет результата')
+            response += f"<b>{result.label}</b> ({result.timing}):\n{text}\n\n"
         
-        await status_msg.edit_text(response, parse_mode="HTML")
-        await processing_msg.delete()
+        await processing_msg.edit_text(response, parse_mode="HTML")
         
     except Exception as e:
         await message.answer(f"❌ Ошибка при обработке: {str(e)}")
         print(f"Error processing test voice message: {e}")
-    finally:
-        # Удаляем временные файлы
-        try:
-            os.remove(temp_file)
-            os.remove(temp_file.replace('.ogg', '.wav'))
-        except:
-            pass
 
 @router.callback_query(F.data == "back_to_admin")
 async def back_to_admin_menu(callback: CallbackQuery):
@@ -759,9 +774,9 @@ async def start_recognition_test_callback(callback: CallbackQuery):
     )
 
 @router.message(F.text == "📊 Экспорт данных из БД")
-async def export_data(message: Message):
+async def export_data(message: Message, db: AsyncDatabase):
     """Обработчик экспорта данных в CSV"""
-    if not db.is_admin(message.from_user.id):
+    if not await db.is_admin(message.from_user.id):
         await message.answer("У вас нет доступа к этой функции!")
         return
     
@@ -773,7 +788,7 @@ async def export_data(message: Message):
         )
         
         # Получаем данные из БД
-        data = db.get_commands_data_for_export()
+        data = await db.get_commands_data_for_export()
         
         if not data:
             await status_msg.edit_text("❌ Нет данных для экспорта!")
@@ -784,34 +799,33 @@ async def export_data(message: Message):
             "💾 Создание CSV файла..."
         )
         
-        # Создаем CSV файл
-        file_path = export_commands_to_csv(data)
-        
-        await status_msg.edit_text(
-            f"✅ CSV файл создан\n"
-            f"📤 Отправка файла..."
-        )
-        
-        # Отправляем файл
-        await message.answer_document(
-            document=FSInputFile(file_path),
-            caption=(
-                "📊 <b>Экспорт данных из базы данных</b>\n\n"
-                f"📝 Количество записей: {len(data)}\n"
-                f"📅 Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n\n"
-                "В файле содержится:\n"
-                "• Теги команд\n"
-                "• Тексты команд\n"
-                "• ID голосовых сообщений\n"
-                "• Транскрипции\n"
-                "• Информация о пользователях\n"
-                "• Даты создания записей"
-            ),
-            parse_mode="HTML"
-        )
-        
-        # Удаляем временный файл
-        os.remove(file_path)
+        # Создаем CSV файл во временном каталоге запроса, каталог
+        # удаляется после отправки, даже если отправка не удалась
+        with scratch.directory() as directory:
+            file_path = export_commands_to_csv(data, directory)
+            
+            await status_msg.edit_text(
+                f"✅ CSV файл создан\n"
+                f"📤 Отправка файла..."
+            )
+            
+            # Отправляем файл
+            await message.answer_document(
+                document=FSInputFile(file_path),
+                caption=(
+                    "📊 <b>Экспорт данных из базы данных</b>\n\n"
+                    f"📝 Количество записей: {len(data)}\n"
+                    f"📅 Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n\n"
+                    "В файле содержится:\n"
+                    "• Теги команд\n"
+                    "• Тексты команд\n"
+                    "• ID голосовых сообщений\n"
+                    "• Транскрипции\n"
+                    "• Информация о пользователях\n"
+                    "• Даты создания записей"
+                ),
+                parse_mode="HTML"
+            )
         await status_msg.edit_text("✅ Экспорт успешно завершен!")
         
     except Exception as e:
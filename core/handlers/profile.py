@@ -1,7 +1,7 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 from core.keyboards.profile import profile_keyboard, confirm_delete_keyboard, cancel_keyboard
 from core.keyboards.main import main_keyboard, admin_keyboard
 from core.states.states import ProfileStates
@@ -10,17 +10,16 @@ from core.utils.logger import bot_logger
 from core.config.settings import settings
 
 router = Router()
-db = Database('bot_database.db')
 
 @router.message(F.text == '👤 Личный кабинет')
-async def profile(message: Message, telegram_id: int = None):
+async def profile(message: Message, db: AsyncDatabase, telegram_id: int = None):
     user_id = telegram_id or message.from_user.id
     bot_logger.log_action(user_id, "Открыт личный кабинет")
     
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     if not user:
-        db.create_user(user_id, message.from_user.username)
-        user = db.get_user(user_id)
+        await db.create_user(user_id, message.from_user.username)
+        user = await db.get_user(user_id)
 
     registration_date = datetime.strptime(user['registration_date'], '%Y-%m-%d %H:%M:%S')
     registration_date = registration_date + timedelta(hours=3)
@@ -65,11 +64,11 @@ async def change_name(message: Message, state: FSMContext):
     await message.answer("Введите ваше новое имя:", reply_markup=cancel_keyboard)
 
 @router.message(ProfileStates.waiting_for_name)
-async def process_name(message: Message, state: FSMContext):
+async def process_name(message: Message, state: FSMContext, db: AsyncDatabase):
     if message.text == '🔙 Отмена':
         bot_logger.log_action(message.from_user.id, "Отменено изменение имени")
         await state.clear()
-        await profile(message)
+        await profile(message, db)
         return
 
     bot_logger.log_action(
@@ -77,10 +76,10 @@ async def process_name(message: Message, state: FSMContext):
         "Изменено имя",
         {"new_name": message.text}
     )
-    db.update_user(message.from_user.id, display_name=message.text)
+    await db.update_user(message.from_user.id, display_name=message.text)
     await state.clear()
     await message.answer("Имя успешно обновлено!")
-    await profile(message)
+    await profile(message, db)
 
 @router.message(F.text == '📧 Изменить почту')
 async def change_email(message: Message, state: FSMContext):
@@ -88,16 +87,16 @@ async def change_email(message: Message, state: FSMContext):
     await message.answer("Введите вашу новую почту:", reply_markup=cancel_keyboard)
 
 @router.message(ProfileStates.waiting_for_email)
-async def process_email(message: Message, state: FSMContext):
+async def process_email(message: Message, state: FSMContext, db: AsyncDatabase):
     if message.text == '🔙 Отмена':
         await state.clear()
-        await profile(message)
+        await profile(message, db)
         return
 
-    db.update_user(message.from_user.id, email=message.text)
+    await db.update_user(message.from_user.id, email=message.text)
     await state.clear()
     await message.answer("Почта успешно обновлена!")
-    await profile(message)
+    await profile(message, db)
 
 @router.message(F.text == '🏢 Изменить организацию')
 async def change_organization(message: Message, state: FSMContext):
@@ -105,16 +104,16 @@ async def change_organization(message: Message, state: FSMContext):
     await message.answer("Введите название вашей организации:", reply_markup=cancel_keyboard)
 
 @router.message(ProfileStates.waiting_for_organization)
-async def process_organization(message: Message, state: FSMContext):
+async def process_organization(message: Message, state: FSMContext, db: AsyncDatabase):
     if message.text == '🔙 Отмена':
         await state.clear()
-        await profile(message)
+        await profile(message, db)
         return
 
-    db.update_user(message.from_user.id, organization=message.text)
+    await db.update_user(message.from_user.id, organization=message.text)
     await state.clear()
     await message.answer("Организация успешно обновлена!")
-    await profile(message)
+    await profile(message, db)
 
 @router.message(F.text == '🔗 Изменить соц. сеть')
 async def change_social(message: Message, state: FSMContext):
@@ -125,16 +124,16 @@ async def change_social(message: Message, state: FSMContext):
     )
 
 @router.message(ProfileStates.waiting_for_social)
-async def process_social(message: Message, state: FSMContext):
+async def process_social(message: Message, state: FSMContext, db: AsyncDatabase):
     if message.text == '🔙 Отмена':
         await state.clear()
-        await profile(message)
+        await profile(message, db)
         return
 
-    db.update_user(message.from_user.id, social_link=message.text)
+    await db.update_user(message.from_user.id, social_link=message.text)
     await state.clear()
     await message.answer("Ссылка на социальную сеть успешно обновлена!")
-    await profile(message)
+    await profile(message, db)
 
 @router.message(F.text == '❌ Удалить аккаунт')
 async def delete_account(message: Message):
@@ -144,8 +143,8 @@ async def delete_account(message: Message):
     )
 
 @router.callback_query(F.data == 'confirm_delete')
-async def confirm_delete_account(callback: CallbackQuery):
-    db.delete_user(callback.from_user.id)
+async def confirm_delete_account(callback: CallbackQuery, db: AsyncDatabase):
+    await db.delete_user(callback.from_user.id)
     
     # Проверяем, является ли пользователь админом
     if callback.from_user.id == settings.bots.admin_id:
@@ -159,18 +158,18 @@ async def confirm_delete_account(callback: CallbackQuery):
         )
 
 @router.callback_query(F.data == 'cancel_delete')
-async def cancel_delete_account(callback: CallbackQuery):
+async def cancel_delete_account(callback: CallbackQuery, db: AsyncDatabase):
     await callback.message.delete()
     temp_message = await callback.message.answer("Отмена удаления аккаунта")
-    await profile(temp_message, callback.from_user.id)
+    await profile(temp_message, db, callback.from_user.id)
 
 @router.message(F.text == '🔙 Назад в меню')
-async def back_to_menu(message: Message):
-    user = db.get_user(message.from_user.id)
+async def back_to_menu(message: Message, db: AsyncDatabase):
+    user = await db.get_user(message.from_user.id)
     if not user:
         # Если пользователь не найден, проверяем является ли он админом
         role_id = 2 if message.from_user.id == settings.bots.admin_id else 1
-        db.create_user(message.from_user.id, message.from_user.username)
+        await db.create_user(message.from_user.id, message.from_user.username)
         keyboard = admin_keyboard if role_id == 2 else main_keyboard
     else:
         keyboard = admin_keyboard if user['role'] == 'admin' else main_keyboard
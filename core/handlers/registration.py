@@ -1,13 +1,12 @@
 from aiogram import Router, F
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
-from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 from core.keyboards.profile import cancel_registration_keyboard
 from core.keyboards.main import main_keyboard
 from core.states.states import RegistrationStates
 
 router = Router()
-db = Database('bot_database.db')
 
 @router.message(RegistrationStates.waiting_for_name)
 async def process_reg_name(message: Message, state: FSMContext):
@@ -34,18 +33,18 @@ async def process_reg_organization(message: Message, state: FSMContext):
     await state.set_state(RegistrationStates.waiting_for_social)
 
 @router.message(RegistrationStates.waiting_for_social)
-async def process_reg_social(message: Message, state: FSMContext):
+async def process_reg_social(message: Message, state: FSMContext, db: AsyncDatabase):
     user_data = await state.get_data()
     social_link = None if message.text == 'Указать позже' else message.text
     
     # Создаем пользователя в базе данных
-    db.create_user(
+    await db.create_user(
         telegram_id=message.from_user.id,
         username=message.from_user.username
     )
     
     # Обновляем информацию о пользователе
-    db.update_user(
+    await db.update_user(
         message.from_user.id,
         display_name=user_data['name'],
         organization=user_data['organization'],
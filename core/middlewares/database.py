@@ -0,0 +1,20 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from core.database.async_database import AsyncDatabase
+
+
+class DatabaseMiddleware(BaseMiddleware):
+    """Передает общий экземпляр базы данных в обработчики как аргумент db"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["db"] = self.db
+        return await handler(event, data)
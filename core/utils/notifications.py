@@ -1,11 +1,11 @@
 from aiogram import Bot
-from core.database.database import Database
+from core.database.async_database import AsyncDatabase
 import logging
 
-async def notify_users_about_restart(bot: Bot, db: Database):
+async def notify_users_about_restart(bot: Bot, db: AsyncDatabase):
     """Уведомляет всех пользователей о перезапуске бота"""
     try:
-        users = db.get_all_users()
+        users = await db.get_all_users()
         for user in users:
             try:
                 await bot.send_message(
@@ -0,0 +1,97 @@
+"""
+Временные каталоги для данных, которые не помещаются в память.
+
+Голосовые сообщения скачиваются в BytesIO и на диск не попадают; каталоги
+нужны только для файлов вроде выгрузок CSV. Каждый запрос получает свой
+каталог с уникальным именем, поэтому одновременные запросы не перезаписывают
+файлы друг друга, а контекстный менеджер удаляет каталог при любом исходе.
+Каталоги, оставшиеся после падения процесса, удаляет периодическая очистка.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from core.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "req-"
+
+
+class ScratchFullError(RuntimeError):
+    """Временные каталоги заняли больше разрешенного объема"""
+
+
+def _default_root() -> str:
+    # /dev/shm - tmpfs в памяти, временные файлы не изнашивают диск
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, "data_markup_bot")
+
+
+class ScratchSpace:
+    """Временные каталоги запросов с ограничением объема и очисткой"""
+
+    def __init__(self, root: str = "", max_bytes: int = 256 * 1024 * 1024, max_age: float = 3600.0):
+        self.root = root or _default_root()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def usage(self) -> int:
+        """Объем всех временных каталогов в байтах"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass  # Файл удален, пока мы считали
+        return total
+
+    @contextmanager
+    def directory(self) -> Iterator[str]:
+        """Каталог для одного запроса; удаляется при выходе из блока"""
+        os.makedirs(self.root, exist_ok=True)
+        if self.usage() >= self.max_bytes:
+            self.sweep()
+            if self.usage() >= self.max_bytes:
+                raise ScratchFullError(f"Временные файлы заняли больше {self.max_bytes} байт")
+        path = tempfile.mkdtemp(prefix=PREFIX, dir=self.root)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def sweep(self, max_age: Optional[float] = None) -> int:
+        """Удаляет каталоги старше max_age (по умолчанию из настроек) и возвращает их число"""
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+        threshold = time.time() - (self.max_age if max_age is None else max_age)
+        removed = 0
+        for entry in entries:
+            if not entry.name.startswith(PREFIX):
+                continue
+            try:
+                if entry.stat().st_mtime < threshold:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info(f"Удалено временных каталогов: {removed}")
+        return removed
+
+    async def run_sweeper(self, interval: float) -> None:
+        """Периодическая очистка, работает до отмены задачи"""
+        while True:
+            await asyncio.to_thread(self.sweep)
+            await asyncio.sleep(interval)
+
+
+# Общее временное пространство процесса
+scratch = ScratchSpace(settings.scratch.root, settings.scratch.max_bytes, settings.scratch.max_age)
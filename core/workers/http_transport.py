@@ -0,0 +1,169 @@
+"""
+HTTP-транспорт очереди распознавания для рабочих на других машинах.
+
+Процесс бота поднимает небольшой aiohttp-сервер поверх JobService, а рабочий
+использует HttpJobClient с теми же методами, что у JobService. Рабочему нужен
+только адрес бота и общий токен: записи он скачивает через бота, результаты
+отправляет обратно, а базу и Telegram не трогает.
+"""
+import hmac
+import ipaddress
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from aiohttp import ClientSession, ClientTimeout, web
+from core.workers.jobs import JobService
+
+logger = logging.getLogger(__name__)
+
+
+def _authorized(request: web.Request, secret: str) -> bool:
+    if not secret:
+        return True
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(token, secret)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Имя хоста или пустая строка (все интерфейсы)
+
+
+def create_job_app(service: JobService, secret: str = "") -> web.Application:
+    """Приложение aiohttp с методами JobService"""
+
+    @web.middleware
+    async def auth(request: web.Request, handler):
+        if not _authorized(request, secret):
+            raise web.HTTPUnauthorized()
+        return await handler(request)
+
+    async def claim(request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"job": await service.claim(body["worker_id"])})
+
+    async def extend(request: web.Request) -> web.Response:
+        body = await request.json()
+        ok = await service.extend(int(request.match_info["job_id"]), body["worker_id"])
+        return web.json_response({"ok": ok})
+
+    async def complete(request: web.Request) -> web.Response:
+        body = await request.json()
+        ok = await service.complete(int(request.match_info["job_id"]), body["worker_id"],
+                                    body["transcript"], body["report"])
+        return web.json_response({"ok": ok})
+
+    async def fail(request: web.Request) -> web.Response:
+        body = await request.json()
+        status = await service.fail(int(request.match_info["job_id"]), body["worker_id"], body["error"],
+                                    body.get("permanent", False))
+        return web.json_response({"status": status})
+
+    async def voice(request: web.Request) -> web.Response:
+        data = await service.fetch_voice(request.match_info["file_id"])
+        return web.Response(body=data, content_type="application/octet-stream")
+
+    async def commands(request: web.Request) -> web.Response:
+        version, active = await service.active_commands()
+        return web.json_response({"version": version, "commands": active})
+
+    async def lookup_transcriptions(request: web.Request) -> web.Response:
+        body = await request.json()
+        cached = await service.get_cached_transcriptions(body["file_unique_id"], body["model_versions"])
+        return web.json_response({"transcriptions": cached})
+
+    async def store_transcriptions(request: web.Request) -> web.Response:
+        body = await request.json()
+        await service.cache_transcriptions(body["file_unique_id"], [tuple(row) for row in body["rows"]])
+        return web.json_response({"ok": True})
+
+    app = web.Application(middlewares=[auth])
+    app.router.add_post("/jobs/claim", claim)
+    app.router.add_post("/jobs/{job_id}/extend", extend)
+    app.router.add_post("/jobs/{job_id}/complete", complete)
+    app.router.add_post("/jobs/{job_id}/fail", fail)
+    app.router.add_get("/voices/{file_id}", voice)
+    app.router.add_get("/commands", commands)
+    app.router.add_post("/transcriptions/lookup", lookup_transcriptions)
+    app.router.add_post("/transcriptions/store", store_transcriptions)
+    return app
+
+
+async def start_job_server(service: JobService, host: str, port: int, secret: str = "") -> web.AppRunner:
+    """
+    Запускает сервер заданий; остановка - await runner.cleanup().
+    Без токена сервер слушает только loopback: иначе любой в сети мог бы
+    забирать задания, скачивать записи и сохранять расшифровки
+    """
+    if not secret and not _is_loopback(host):
+        raise ValueError(f"Сервер заданий на {host} требует JOB_HTTP_SECRET")
+    runner = web.AppRunner(create_job_app(service, secret), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Сервер заданий распознавания слушает {host}:{port}")
+    return runner
+
+
+class HttpJobClient:
+    """Источник заданий рабочего поверх HTTP-сервера бота"""
+
+    def __init__(self, base_url: str, secret: str = "", timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"Authorization": f"Bearer {secret}"} if secret else {}
+        self._timeout = ClientTimeout(total=timeout)
+        self._session: Optional[ClientSession] = None
+
+    def _client(self) -> ClientSession:
+        # Сессия создается внутри цикла событий рабочего
+        if self._session is None:
+            self._session = ClientSession(headers=self._headers, timeout=self._timeout)
+        return self._session
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._client().post(self.base_url + path, json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def _get(self, path: str) -> Dict[str, Any]:
+        async with self._client().get(self.base_url + path) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        return (await self._post("/jobs/claim", {"worker_id": worker_id}))["job"]
+
+    async def extend(self, job_id: int, worker_id: str) -> bool:
+        return (await self._post(f"/jobs/{job_id}/extend", {"worker_id": worker_id}))["ok"]
+
+    async def complete(self, job_id: int, worker_id: str, transcript: str, report: str) -> bool:
+        payload = {"worker_id": worker_id, "transcript": transcript, "report": report}
+        return (await self._post(f"/jobs/{job_id}/complete", payload))["ok"]
+
+    async def fail(self, job_id: int, worker_id: str, error: str, permanent: bool = False) -> Optional[str]:
+        payload = {"worker_id": worker_id, "error": error, "permanent": permanent}
+        return (await self._post(f"/jobs/{job_id}/fail", payload))["status"]
+
+    async def fetch_voice(self, file_id: str) -> bytes:
+        async with self._client().get(f"{self.base_url}/voices/{file_id}") as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def active_commands(self) -> Tuple[int, List[Dict[str, Any]]]:
+        body = await self._get("/commands")
+        return body["version"], body["commands"]
+
+    async def get_cached_transcriptions(self, file_unique_id: str,
+                                        model_versions: Dict[str, str]) -> Dict[str, str]:
+        payload = {"file_unique_id": file_unique_id, "model_versions": model_versions}
+        return (await self._post("/transcriptions/lookup", payload))["transcriptions"]
+
+    async def cache_transcriptions(self, file_unique_id: str, rows: List[Tuple[str, str, str]]) -> None:
+        await self._post("/transcriptions/store", {"file_unique_id": file_unique_id, "rows": rows})
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
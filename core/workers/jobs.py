@@ -0,0 +1,148 @@
+"""
+Сторона очереди распознавания, которая остается в процессе бота.
+
+JobService выдает задания рабочим, принимает от них результаты, сохраняет
+их в базу и сообщает пользователю итог. Рабочему нужны только методы этого
+класса: в процессе бота и в отдельном процессе на той же машине он вызывает
+их напрямую, а на других машинах - через HTTP (core.workers.http_transport),
+поэтому Telegram и база остаются за одним процессом.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from aiogram import Bot
+from core.config.settings import settings
+from core.database.async_database import AsyncDatabase
+from core.backend.audio_handler import download_file_id
+from core.keyboards.markup import get_user_markup_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """Выдача заданий и прием результатов поверх Database и Bot"""
+
+    def __init__(self, db: AsyncDatabase, bot: Bot, catalog_refresh: float = None):
+        self.db = db
+        self.bot = bot
+        self.config = settings.jobs
+        # Отдельный процесс не видит изменений каталога, сделанных ботом,
+        # поэтому периодически перечитывает его; боту это не нужно
+        self.catalog_refresh = catalog_refresh
+        self._catalog_loaded = time.monotonic()
+
+    async def _refresh_catalog(self) -> None:
+        if self.catalog_refresh is None or time.monotonic() - self._catalog_loaded < self.catalog_refresh:
+            return
+        await self.db.reload_catalog()
+        self._catalog_loaded = time.monotonic()
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Следующее задание с командой и версией каталога или None"""
+        await self._refresh_catalog()
+        job = await self.db.claim_recognition_job(
+            worker_id, self.config.lease_seconds, self.config.max_attempts
+        )
+        if job is None:
+            return None
+
+        command = await self.db.get_command_by_id(job['command_id'])
+        if not command:
+            # Команду могли добавить через другой процесс
+            await self.db.reload_catalog()
+            self._catalog_loaded = time.monotonic()
+            command = await self.db.get_command_by_id(job['command_id'])
+        job['command'] = command
+        job['catalog_version'] = self.db.catalog_version
+        return job
+
+    async def extend(self, job_id: int, worker_id: str) -> bool:
+        return await self.db.extend_recognition_job_lease(job_id, worker_id, self.config.lease_seconds)
+
+    async def complete(self, job_id: int, worker_id: str, transcript: str, report: str) -> bool:
+        """Сохраняет результат и отправляет пользователю отчет; False, если задание уже не наше"""
+        record_id = await self.db.complete_recognition_job(job_id, worker_id, transcript, report)
+        if record_id is None:
+            logger.warning(f"Задание {job_id} уже выполнено другим рабочим")
+            return False
+        await self._deliver(await self.db.get_recognition_job(job_id))
+        return True
+
+    async def _deliver(self, job: Dict[str, Any]) -> bool:
+        """
+        Отправляет пользователю отчет и подтверждение сохранения. Результат
+        уже в базе, поэтому при ошибке задание остается недоставленным
+        и отправляется повторно (run_redelivery)
+        """
+        command = await self.db.get_command_by_id(job['command_id']) or {}
+        delivered = await self.notify(job['chat_id'], job['report'] or "", parse_mode="HTML")
+        delivered = delivered and await self.notify(
+            job['chat_id'],
+            "✅ Голосовая команда успешно сохранена!\n\n"
+            f"🎯 <b>Команда:</b> {command.get('tag', '')}\n"
+            f"📋 <b>Описание:</b> {command.get('description', '')}\n"
+            f"🆔 <b>ID записи:</b> <code>{job['voice_file_id']}</code>",
+            parse_mode="HTML",
+            reply_markup=get_user_markup_keyboard()
+        )
+        if not delivered:
+            logger.error(f"Результат задания {job['id']} не доставлен, будет отправлен повторно")
+            return False
+        await self.db.mark_recognition_job_notified(job['id'])
+        return True
+
+    async def redeliver(self) -> int:
+        """Повторно отправляет недоставленные результаты, возвращает число доставленных"""
+        jobs = await self.db.get_undelivered_recognition_jobs(self.config.notify_retry)
+        delivered = 0
+        for job in jobs:
+            delivered += await self._deliver(job)
+        return delivered
+
+    async def run_redelivery(self, interval: float) -> None:
+        """Периодическая повторная отправка, работает до отмены задачи"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.redeliver()
+            except Exception as e:
+                logger.error(f"Ошибка повторной отправки результатов: {e}")
+
+    async def fail(self, job_id: int, worker_id: str, error: str, permanent: bool = False) -> Optional[str]:
+        """
+        Возвращает задание в очередь или помечает failed и сообщает пользователю.
+        permanent - повтор не поможет (например, в записи нет речи): задание
+        закрывается сразу, а пользователь узнает причину
+        """
+        status = await self.db.fail_recognition_job(
+            job_id, worker_id, error, self.config.max_attempts, self.config.retry_backoff, permanent
+        )
+        if status == 'failed':
+            job = await self.db.get_recognition_job(job_id)
+            reason = f"{error}." if permanent else "Не удалось распознать запись."
+            await self.notify(job['chat_id'], f"❌ {reason} Пожалуйста, запишите команду еще раз.")
+        return status
+
+    async def fetch_voice(self, file_id: str) -> bytes:
+        """Скачивает запись из Telegram: рабочим не нужен токен бота"""
+        return await download_file_id(self.bot, file_id)
+
+    async def active_commands(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """Версия каталога и активные команды для грамматики Vosk"""
+        return self.db.catalog_version, await self.db.get_active_commands()
+
+    async def get_cached_transcriptions(self, file_unique_id: str,
+                                        model_versions: Dict[str, str]) -> Dict[str, str]:
+        return await self.db.get_cached_transcriptions(file_unique_id, model_versions)
+
+    async def cache_transcriptions(self, file_unique_id: str, rows: List[Tuple[str, str, str]]) -> None:
+        await self.db.cache_transcriptions(file_unique_id, rows)
+
+    async def notify(self, chat_id: int, text: str, **kwargs) -> bool:
+        try:
+            await self.bot.send_message(chat_id, text, **kwargs)
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление {chat_id}: {e}")
+            return False
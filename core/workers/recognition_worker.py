@@ -0,0 +1,169 @@
+"""
+Рабочий очереди распознавания.
+
+Берет задания в аренду у источника заданий, распознает голосовое сообщение
+и отдает лучший результат обратно; сохранение и уведомление пользователя
+выполняет источник (JobService в процессе бота или HttpJobClient на другой
+машине). Пока задание выполняется, аренда продлевается; если рабочий упал,
+аренда истекает и задание достается другому рабочему, поэтому записи
+не теряются при перезапуске.
+
+Отдельные процессы и машины: python worker.py --help
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from functools import partial
+from typing import Any, Dict, List, Tuple
+from core.config.settings import settings
+from core.database.database import Database
+from core.backend.grammar import command_grammar
+from core.backend.recognition import (
+    GRAMMAR_ENGINES, EngineResult, recognize, recognize_cascade, best_result
+)
+from core.backend.transcription_cache import TranscriptionCache
+from core.backend.vad import SpeechRejectedError
+from core.workers.jobs import JobService
+
+logger = logging.getLogger(__name__)
+
+
+def format_report(results: List[EngineResult], similarity, best: EngineResult,
+                  best_similarity: float, command: Dict[str, Any]) -> str:
+    """Сообщение пользователю с результатами всех выполненных движков"""
+    response = "📝 <b>Результаты распознавания:</b>\n\n"
+    for index, result in enumerate(results, 1):
+        response += (
+            f"{index}️⃣ <b>{result.label}:</b>\n{result.text or result.error or ''}\n"
+            f"Схожесть: {similarity(result.text):.1f}% ({result.timing})\n\n"
+        )
+    response += f"🎯 <b>Лучший результат ({best.label}):</b> {best_similarity:.1f}%"
+
+    # Ограниченный распознаватель сразу говорит, какая команда произнесена
+    for result in results:
+        if result.engine in GRAMMAR_ENGINES and result.text:
+            spoken = command_grammar.match(result.text)
+            if spoken:
+                mark = "✅" if spoken['id'] == command['id'] else "⚠️"
+                response += f"\n{mark} <b>Произнесена команда:</b> {spoken['tag']}"
+    return response
+
+
+class RecognitionWorker:
+    """
+    Цикл выборки и выполнения заданий распознавания.
+    jobs - JobService или HttpJobClient: у них одинаковые методы.
+    Рабочий держит до concurrency заданий одновременно: иначе записи
+    распознаются по одной и пакеты Whisper не набираются
+    """
+
+    def __init__(self, jobs: JobService, worker_id: str = None, concurrency: int = None):
+        self.jobs = jobs
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.config = settings.jobs
+        inference_config = settings.inference
+        self.concurrency = (concurrency or self.config.concurrency
+                            or inference_config.whisper_concurrency * max(inference_config.whisper_max_batch, 1))
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        """Выполняет задания, пока не вызван stop(); после остановки дожидается начатых"""
+        logger.info(f"Рабочий распознавания {self.worker_id} запущен, заданий одновременно: {self.concurrency}")
+        active = set()
+        while not self._stopping.is_set():
+            if len(active) >= self.concurrency:
+                await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                job = await self.jobs.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Ошибка выборки задания: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.config.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self.process(job))
+            active.add(task)
+            task.add_done_callback(active.discard)
+
+        if active:
+            await asyncio.gather(*active, return_exceptions=True)
+        logger.info(f"Рабочий распознавания {self.worker_id} остановлен")
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _keep_lease(self, job_id: int) -> None:
+        """Продлевает аренду, пока задание выполняется"""
+        while True:
+            await asyncio.sleep(self.config.lease_seconds / 3)
+            try:
+                extended = await self.jobs.extend(job_id, self.worker_id)
+            except Exception as e:
+                logger.error(f"Ошибка продления аренды задания {job_id}: {e}")
+                continue
+            if not extended:
+                logger.warning(f"Аренда задания {job_id} потеряна")
+                return
+
+    async def process(self, job: Dict[str, Any]) -> None:
+        heartbeat = asyncio.create_task(self._keep_lease(job['id']))
+        try:
+            transcript, report = await self.transcribe(job)
+        except SpeechRejectedError as e:
+            # Запись не изменится, поэтому задание не повторяется
+            logger.info(f"Задание {job['id']} отклонено: {e}")
+            await self._report(self.jobs.fail(job['id'], self.worker_id, str(e), permanent=True))
+            return
+        except Exception as e:
+            logger.error(f"Ошибка задания {job['id']} (попытка {job['attempts']}): {e}")
+            await self._report(self.jobs.fail(job['id'], self.worker_id, str(e)))
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._report(self.jobs.complete(job['id'], self.worker_id, transcript, report))
+
+    async def _report(self, call) -> None:
+        # Если источник недоступен, аренда истечет и задание выполнит другой рабочий
+        try:
+            await call
+        except Exception as e:
+            logger.error(f"Не удалось отправить результат задания: {e}")
+
+    async def transcribe(self, job: Dict[str, Any]) -> Tuple[str, str]:
+        """Распознает запись задания: (лучший текст, отчет для пользователя)"""
+        command = job['command']
+        if not command:
+            raise ValueError(f"Команда {job['command_id']} не найдена")
+        if job['catalog_version'] != command_grammar.version:
+            version, commands = await self.jobs.active_commands()
+            command_grammar.build(commands, version)
+
+        def similarity(text: str) -> float:
+            return Database.sorensen_dice_similarity(text, command['description'])
+
+        voice = partial(self.jobs.fetch_voice, job['voice_file_id'])
+        cache = None
+        if settings.recognition.cache and job['voice_file_unique_id']:
+            cache = TranscriptionCache(self.jobs, job['voice_file_unique_id'])
+
+        if settings.recognition.cascade:
+            results = await recognize_cascade(voice, similarity, cache=cache)
+        else:
+            results = await recognize(voice, cache=cache)
+
+        if all(result.error for result in results):
+            rejected = [result for result in results if result.rejected]
+            if rejected:
+                raise SpeechRejectedError(rejected[0].error)
+            raise RuntimeError("; ".join(f"{result.engine}: {result.error}" for result in results))
+
+        best, best_similarity = best_result(results, similarity)
+        return best.text, format_report(results, similarity, best, best_similarity, command)
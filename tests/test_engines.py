@@ -0,0 +1,249 @@
+import asyncio
+
+import numpy as np
+import pytest
+from core.backend import recognition
+from core.backend.audio_handler import DecodedAudio
+from core.backend.engines import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, EngineRegistry, EngineUnavailableError, StubEngine
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(failures: int = 2, reset_after: float = 10.0):
+    clock = FakeClock()
+    return CircuitBreaker(failures, reset_after, clock), clock
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker, _ = make_breaker(failures=2)
+    assert not breaker.failure()
+    assert breaker.state == CLOSED
+    assert breaker.failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker, _ = make_breaker(failures=2)
+    breaker.failure()
+    breaker.success()
+    assert not breaker.failure()
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_allows_single_probe():
+    breaker, clock = make_breaker(failures=1, reset_after=10)
+    breaker.failure()
+    clock.now = 9.9
+    assert breaker.state == OPEN
+    clock.now = 10.0
+    assert breaker.state == HALF_OPEN
+    assert not breaker.is_open
+    assert breaker.allow()
+    # Пока пробный вызов не завершился, остальные не пропускаются
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_breaker_probe_success_closes():
+    breaker, clock = make_breaker(failures=1, reset_after=10)
+    breaker.failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_probe_failure_reopens():
+    breaker, clock = make_breaker(failures=3, reset_after=10)
+    for _ in range(3):
+        breaker.failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    # Одной ошибки пробного вызова достаточно, отсчет начинается заново
+    assert breaker.failure()
+    assert breaker.state == OPEN
+    clock.now = 19.9
+    assert breaker.state == OPEN
+    clock.now = 20.0
+    assert breaker.state == HALF_OPEN
+
+
+def test_timeout_counts_as_failure():
+    breaker, _ = make_breaker(failures=2)
+    engine = StubEngine('slow', text='текст', latency=1.0, timeout=0.01, breaker=breaker)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await engine.transcribe(None)
+
+    asyncio.run(main())
+    assert breaker.state == OPEN
+    with pytest.raises(EngineUnavailableError):
+        asyncio.run(engine.transcribe(None))
+
+
+def test_success_returns_text_and_keeps_breaker_closed():
+    breaker, _ = make_breaker(failures=1)
+    engine = StubEngine('fast', text='текст', breaker=breaker)
+    assert asyncio.run(engine.transcribe(None)) == 'текст'
+    assert breaker.state == CLOSED
+
+
+def test_cancel_does_not_trip_breaker():
+    breaker, _ = make_breaker(failures=1)
+    engine = StubEngine('slow', text='текст', latency=1.0, breaker=breaker)
+
+    async def main():
+        task = asyncio.create_task(engine.transcribe(None))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_cancelled_probe_can_be_retried():
+    breaker, clock = make_breaker(failures=1, reset_after=10)
+    breaker.failure()
+    clock.now = 10.0
+    engine = StubEngine('slow', text='текст', latency=1.0, breaker=breaker)
+
+    async def main():
+        task = asyncio.create_task(engine.transcribe(None))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_caller_deadline_does_not_trip_breaker():
+    breaker, _ = make_breaker(failures=1)
+    engine = StubEngine('slow', text='текст', latency=1.0, timeout=20.0, breaker=breaker)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await engine.transcribe(None, deadline=0.01)
+
+    asyncio.run(main())
+    assert breaker.state == CLOSED
+
+
+def test_waiting_for_slot_does_not_trip_breaker():
+    breaker, _ = make_breaker(failures=1)
+    engine = StubEngine('busy', text='текст', latency=0.2, concurrency=1, timeout=5.0, breaker=breaker)
+
+    async def main():
+        first = asyncio.create_task(engine.transcribe(None))
+        await asyncio.sleep(0)
+        # Второй вызов стоит в очереди за слотом и упирается в срок вызывающего
+        with pytest.raises(TimeoutError):
+            await engine.transcribe(None, deadline=0.05)
+        assert await first == 'текст'
+
+    asyncio.run(main())
+    assert breaker.state == CLOSED
+
+
+def test_slot_held_until_abandoned_call_finishes():
+    breaker, _ = make_breaker(failures=5)
+    engine = StubEngine('slow', text='текст', latency=0.3, concurrency=1, timeout=0.01, breaker=breaker)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await engine.transcribe(None)
+        # Брошенный вызов еще выполняется и занимает единственный слот
+        assert engine._slots.locked()
+        engine.timeout = 1.0
+        with pytest.raises(TimeoutError):
+            await engine.transcribe(None, deadline=0.05)
+        assert await engine.transcribe(None, deadline=1.0) == 'текст'
+        assert not engine._slots.locked()
+
+    asyncio.run(main())
+    # Учтен только собственный таймаут движка
+    assert breaker._errors == 0
+
+
+def test_registry_available():
+    breaker, _ = make_breaker(failures=1)
+    registry = EngineRegistry([StubEngine('a'), StubEngine('b', breaker=breaker)])
+    breaker.failure()
+    assert registry.available('a')
+    assert not registry.available('b')
+    # Неизвестный движок не отключается, ошибку покажет его вызов
+    assert registry.available('missing')
+    assert registry.states() == {'a': CLOSED, 'b': OPEN}
+    with pytest.raises(LookupError):
+        registry.get('missing')
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Конвейер распознавания с реестром заглушек и без декодирования и VAD"""
+    registry = EngineRegistry()
+
+    async def decode(data: bytes) -> DecodedAudio:
+        return DecodedAudio(data)
+
+    monkeypatch.setattr(recognition, 'engine_registry', registry)
+    monkeypatch.setattr(recognition, 'decode_audio', decode)
+    monkeypatch.setattr(recognition.settings.vad, 'enabled', False)
+    monkeypatch.setattr(recognition.settings.recognition, 'vosk_grammar', 'off')
+    return registry
+
+
+def voice() -> bytes:
+    return (np.ones(16000) * 1000).astype(np.int16).tobytes()
+
+
+def test_recognize_skips_disabled_engine(pipeline):
+    breaker, _ = make_breaker(failures=1)
+    disabled = pipeline.register(StubEngine('disabled', text='текст', breaker=breaker))
+    pipeline.register(StubEngine('working', text='текст'))
+    breaker.failure()
+
+    results = asyncio.run(recognition.recognize(voice(), engines=('disabled', 'working')))
+    assert [result.engine for result in results] == ['disabled', 'working']
+    assert results[0].error == "Временно отключен после серии ошибок"
+    assert results[1].text == 'текст'
+    # Отключенный движок не вызывался, поэтому пробный вызов не израсходован
+    assert disabled.breaker.state == OPEN
+
+
+def test_recognize_counts_engine_timeout(pipeline):
+    breaker, _ = make_breaker(failures=1)
+    pipeline.register(StubEngine('hung', text='текст', latency=5.0, timeout=0.05, breaker=breaker))
+    pipeline.register(StubEngine('working', text='текст'))
+
+    results = asyncio.run(recognition.recognize(voice(), engines=('hung', 'working'), deadline=1.0))
+    assert results[0].error.startswith("Нет ответа")
+    assert results[1].text == 'текст'
+    assert breaker.state == OPEN
+
+
+def test_recognize_deadline_is_not_engine_failure(pipeline):
+    breaker, _ = make_breaker(failures=1)
+    pipeline.register(StubEngine('slow', text='текст', latency=5.0, timeout=20.0, breaker=breaker))
+
+    results = asyncio.run(recognition.recognize(voice(), engines=('slow',), deadline=0.05))
+    assert results[0].error.startswith("Превышено время ожидания")
+    assert breaker.state == CLOSED
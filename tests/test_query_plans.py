@@ -0,0 +1,54 @@
+import random
+
+import pytest
+from benchmarks.query_plans import FULL_SCAN_ALLOWED, capture_queries, full_scans, hot_calls, populate
+from core.database.database import Database
+
+# Индекс, который должен выбрать планировщик для горячих запросов к большим таблицам
+EXPECTED_INDEXES = {
+    'get_pending_commands': 'idx_user_commands_user_command',
+    'next_pending_command': 'idx_user_commands_user_command',
+    'get_user_commands': 'idx_user_commands_user_created',
+    'iter_user_commands': 'idx_user_commands_user_created',
+    'get_pending_recordings': 'idx_user_commands_status_created',
+    'next_pending_recording': 'idx_user_commands_status_created',
+    'get_command_recordings': 'idx_user_commands_command_created',
+    'count_queued_recognition_jobs': 'idx_recognition_jobs_status_',
+    'get_undelivered_recognition_jobs': 'idx_recognition_jobs_status_notified',
+}
+
+
+@pytest.fixture(scope='module')
+def plans(tmp_path_factory):
+    """Планы горячих запросов на небольшой синтетической базе со всеми миграциями"""
+    random.seed(0)
+    # Без пула читателей все запросы идут через одно соединение, на котором перехватывается SQL
+    db = Database(str(tmp_path_factory.mktemp('plans') / 'plans.db'), readers=0)
+    db.add_command('cmd_0', 'команда номер 0')
+    command = db.get_command_by_tag('cmd_0')
+    queries = capture_queries(db, hot_calls(1, command['id'], command['tag']))
+    populate(db, users=500, commands=50, rows=20000)
+
+    result = []
+    for name, sql in queries:
+        plan = db._writer.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        result.append((name, [row[3] for row in plan], plan))
+    db.close()
+    return result
+
+
+def test_hot_queries_avoid_full_scans(plans):
+    for name, details, plan in plans:
+        if name in FULL_SCAN_ALLOWED:
+            continue
+        assert not full_scans(plan), f"{name}: {details}"
+
+
+def test_hot_queries_use_intended_index(plans):
+    checked = set()
+    for name, details, _ in plans:
+        if name not in EXPECTED_INDEXES:
+            continue
+        assert any(EXPECTED_INDEXES[name] in detail for detail in details), f"{name}: {details}"
+        checked.add(name)
+    assert checked == set(EXPECTED_INDEXES)
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import faster_whisper
+import numpy as np
+
+from core.backend.whisper_batcher import SAMPLE_RATE, transcribe_batch
+
+
+class FakePipeline:
+    """Возвращает по сегменту на окно clip_timestamps, как пакетный конвейер faster-whisper"""
+
+    calls = []
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, **kwargs):
+        FakePipeline.calls.append((audio, kwargs))
+        segments = [SimpleNamespace(start=clip['start'], text=f" запись {i} ")
+                    for i, clip in enumerate(kwargs['clip_timestamps'])]
+        # Вторая запись распознана двумя сегментами
+        segments.insert(2, SimpleNamespace(start=kwargs['clip_timestamps'][1]['start'] + 0.5, text=" еще"))
+        return iter(segments), None
+
+
+def test_segments_are_mapped_to_their_recordings(monkeypatch):
+    monkeypatch.setattr(faster_whisper, 'BatchedInferencePipeline', FakePipeline)
+    batch = [np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32) for seconds in (1.0, 2.0, 0.5)]
+
+    texts = transcribe_batch(object(), batch, language='ru', beam_size=3)
+
+    assert texts == ['запись 0', 'запись 1 еще', 'запись 2']
+    audio, kwargs = FakePipeline.calls[-1]
+    assert len(audio) == sum(len(samples) for samples in batch)
+    assert kwargs['clip_timestamps'] == [{'start': 0.0, 'end': 1.0}, {'start': 1.0, 'end': 3.0},
+                                         {'start': 3.0, 'end': 3.5}]
+    assert kwargs['batch_size'] == 3 and kwargs['vad_filter'] is False
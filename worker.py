@@ -0,0 +1,94 @@
+"""
+Отдельные рабочие распознавания.
+
+Бот один обслуживает Telegram и ставит записи в очередь, а рабочие на любом
+числе машин загружают модели из core.config.settings, берут задания и
+возвращают результаты.
+
+На машине бота, через общую базу SQLite (нужен BOT_TOKEN):
+    python worker.py --db bot_database.db --processes 4
+
+На других машинах, через HTTP-сервер заданий бота (JOB_HTTP_PORT в .env бота):
+    python worker.py --url http://bot-host:8081 --secret <JOB_HTTP_SECRET> --processes 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+from aiogram import Bot
+from core.config.settings import settings
+from core.backend.audio_handler import whisper_batcher
+from core.backend.inference import inference
+from core.backend.models import models
+from core.backend.recognition import active_models
+from core.database.database import Database
+from core.database.async_database import AsyncDatabase
+from core.workers.http_transport import HttpJobClient
+from core.workers.jobs import JobService
+from core.workers.recognition_worker import RecognitionWorker
+
+logger = logging.getLogger(__name__)
+
+
+async def run_workers(args: argparse.Namespace) -> None:
+    """Запускает рабочего, который выполняет до args.concurrency заданий одновременно"""
+    models.warm_up(active_models())
+
+    if args.url:
+        jobs = HttpJobClient(args.url, args.secret)
+        close = [jobs.close]
+    else:
+        db = AsyncDatabase(Database(args.db, transcription_cache_size=settings.recognition.cache_size))
+        bot = Bot(token=settings.bots.bot_token)
+        jobs = JobService(db, bot, catalog_refresh=settings.jobs.catalog_refresh)
+        close = [bot.session.close, db.close]
+
+    worker = RecognitionWorker(jobs, concurrency=args.concurrency)
+    try:
+        await worker.run()
+    finally:
+        worker.stop()
+        for func in close:
+            await func()
+        await whisper_batcher.close()
+        inference.shutdown()
+
+
+def _process_main(args: argparse.Namespace) -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(run_workers(args))
+    except KeyboardInterrupt:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='', help='Адрес сервера заданий бота; без него - общая база')
+    parser.add_argument('--secret', default=settings.jobs.http_secret)
+    parser.add_argument('--db', default='bot_database.db')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=settings.jobs.concurrency,
+                        help='Заданий одновременно в процессе, 0 - по размеру пакетов Whisper')
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        _process_main(args)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_process_main, args=(args,), name=f"recognition-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()